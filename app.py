@@ -1,40 +1,129 @@
 # python lib imports
+import asyncio
+import logging
+import os
+import signal
+from utils.startup import StartupTimeline
+
+STARTUP = StartupTimeline()  # first, so imports are timed even where /proc is unavailable
 
 # third party imports
-from tkinter import ttk
 import tkinter as tk
+from tkinter import messagebox
 
 # local imports
 from managers.wifi_manager import WifiManager
 from managers.router_manager import RouterManager
 from managers.bluetooth_manager import BluetoothManager
+from managers.nm_state import NMStateCache
+from managers.scan_service import ScanService
+from managers.supervisor import Supervisor
+from managers.last_state import LastStateStore
+from managers.throughput import ThroughputSampler
+from managers.remote import connect_daemon, RemoteWifiManager, RemoteRouterManager, RemoteThroughput, RemoteScanService, DAEMON_ERRORS
+from utils.aio import TkAsyncBridge
+from utils.metrics import METRICS
+from utils.rpc import RemoteProxy, RpcError
+from ui.lazy import LazyNotebook, after_paint
 from ui.overview_frame import OverviewFrame
 from ui.wifi_frame import WifiManagerFrame
 from ui.router_frame import RouterSetupFrame
 from ui.bluetooth_frame import BluetoothManagerFrame
 # from ui.usb_frame import UsbManagerFrame
 
+METRICS_FILE = os.path.expanduser("~/.config/minicp/metrics.prom")
+NM_REFRESH_MS = 250  # coalesces a burst of device events into one Overview refresh
+
 class MainApp:
     def __init__(self):
-        self.wifi_mgr   = WifiManager(ifname="wlan0")  # Onboard for client
-        self.router_mgr = RouterManager(ifname="wlan1")  # PHREEZE for AP
-        self.bt_mgr     = BluetoothManager()
+        STARTUP.mark("imports")
+        # MINICP_METRICS=1 records command timings, MINICP_METRICS_PORT also serves them on localhost
+        if os.environ.get('MINICP_METRICS_PORT'):
+            METRICS.serve(int(os.environ['MINICP_METRICS_PORT']))
+        if METRICS.enabled:
+            signal.signal(signal.SIGUSR1, lambda *_: METRICS.dump(METRICS_FILE))  # kill -USR1 to dump
+
+        # With minicpd running the managers live there and this process is a thin client
+        self.daemon = connect_daemon()
+        if self.daemon is not None:
+            self.wifi_mgr   = RemoteWifiManager(self.daemon)
+            self.router_mgr = RemoteRouterManager(self.daemon)
+            self.bt_mgr     = RemoteProxy(self.daemon, 'bt')
+            self.throughput = RemoteThroughput(self.daemon)
+        else:
+            self.nm_state   = NMStateCache().start()  # fed by `nmcli monitor`
+            self.wifi_mgr   = WifiManager(ifname="wlan0", state=self.nm_state, backend="auto")  # Onboard for client
+            self.router_mgr = RouterManager(ifname="wlan1", state=self.nm_state, backend="auto", scans=self.wifi_mgr.scans)  # PHREEZE for AP
+            self.bt_mgr     = BluetoothManager(backend="auto")
+            self.throughput = ThroughputSampler().start()  # 1 Hz /proc/net/dev for the Overview sparklines
+            self.supervisor = Supervisor()\
+                .add("wifi:wlan0", "wlan0", self.wifi_mgr.reconcile)\
+                .add("ap:wlan1", "wlan1", self.router_mgr.reconcile)\
+                .watch(self.nm_state)
+        self.last_state = LastStateStore()  # painted at boot until live state arrives
+        STARTUP.mark("managers")
 
         self.root = tk.Tk()
         self.root.title("MiniCP - Raspberry Pi")
         self.root.geometry("480x320")
         self.root.attributes('-fullscreen', False)  # Fullscreen for 480x320 touch display
+        self.root.report_callback_exception = self._callback_failed
+        self.bridge = TkAsyncBridge(self.root)  # asyncio work off the Tk thread
+        self._nm_refresh = None
+        if self.daemon is not None:
+            self.scan_service = RemoteScanService(self.daemon, self.bridge)
+            self.daemon.subscribe('nm', lambda data: self.bridge.post(self._nm_changed))
+        else:
+            self.scan_service = ScanService(self.bridge, scans=self.wifi_mgr.scans)
 
-        nb = ttk.Notebook(self.root)
+        STARTUP.mark("tk init")
+
+        # Tabs are built on first selection; only the visible one is built now
+        nb = LazyNotebook(self.root)
         nb.pack(fill=tk.BOTH, expand=True)
 
-        nb.add(OverviewFrame(nb, self),        text="Overview")
-        nb.add(WifiManagerFrame(nb, self),     text="Wi‑Fi")
-        nb.add(RouterSetupFrame(nb, self),     text="Router")
-        nb.add(BluetoothManagerFrame(nb, self), text="Bluetooth")
-        # nb.add(UsbManagerFrame(nb, self),      text="USB")
+        nb.add_lazy(lambda m: OverviewFrame(m, self),        text="Overview")
+        nb.add_lazy(lambda m: WifiManagerFrame(m, self),     text="Wi‑Fi")
+        nb.add_lazy(lambda m: RouterSetupFrame(m, self),     text="Router")
+        nb.add_lazy(lambda m: BluetoothManagerFrame(m, self), text="Bluetooth")
+        # nb.add_lazy(lambda m: UsbManagerFrame(m, self),      text="USB")
+        self.overview = nb.build(nb.select())
+        last = self.last_state.load()
+        if last:
+            self.overview.show_last_known(last)
+        after_paint(self.overview, self._first_fetch)
 
         self.root.mainloop()
 
+    def _first_fetch(self):
+        STARTUP.mark("first paint")
+        # nmcli/bluetoothctl may still be starting after a reboot; keep the UI responsive meanwhile
+        self.bridge.submit(asyncio.to_thread(self.overview.fetch_status), self._first_data, self._first_fetch_failed)
+
+    def _first_data(self, status):
+        self.overview.apply_status(status)
+        STARTUP.mark("first data")
+
+    def _nm_changed(self):
+        """Refresh the Overview shortly after the daemon reports a device change, once per burst."""
+        if self._nm_refresh is None:
+            self._nm_refresh = self.root.after(NM_REFRESH_MS, self._refresh_overview)
+
+    def _refresh_overview(self):
+        self._nm_refresh = None
+        self.overview.update_status()
+
+    def _first_fetch_failed(self, exc):
+        logging.error(f"Initial status fetch failed: {exc!r}")
+        self.overview.fetch_failed(exc)
+
+    def _callback_failed(self, exc_type, exc, tb):
+        """A button whose daemon call failed shows an error instead of a traceback on stderr."""
+        if not isinstance(exc, DAEMON_ERRORS):
+            return tk.Tk.report_callback_exception(self.root, exc_type, exc, tb)
+        logging.warning(f"minicpd call failed: {exc}")
+        title = "Error" if isinstance(exc, RpcError) else "Daemon unavailable"
+        messagebox.showerror(title, str(exc))
+
 if __name__ == "__main__":
     MainApp()
@@ -0,0 +1,68 @@
+"""
+Open and layout-switch latency of the shared on-screen keyboard.
+
+    python3 -m benchmarks.bench_keyboard          # needs $DISPLAY (xvfb-run works)
+
+The "rebuild" column recreates the key buttons the way the keyboard used
+to on every shift/123/ABC tap, as a baseline for the prebuilt layouts.
+"""
+import argparse
+import statistics
+import time
+import tkinter as tk
+
+from ui.keyboard import LAYOUTS, shared_keyboard
+
+
+def timed(fn, iterations: int, root) -> float:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        root.update_idletasks()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def rebuild(keyboard, mode):
+    """Baseline: destroy and recreate every key button of one layout."""
+    frame = keyboard.layout_frames[mode]
+    for w in frame.winfo_children():
+        w.destroy()
+    for row in LAYOUTS[mode]:
+        rowf = tk.Frame(frame)
+        rowf.pack(fill=tk.X, pady=1)
+        for key in row:
+            tk.Button(rowf, text=key, font=("Arial", 10)).pack(side=tk.LEFT, expand=True, fill=tk.BOTH, padx=1, pady=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--iterations', type=int, default=100)
+    args = parser.parse_args()
+
+    root = tk.Tk()
+    entry = tk.Entry(root)
+    entry.pack()
+
+    start = time.perf_counter()
+    keyboard = shared_keyboard(root)
+    keyboard.open(entry)
+    root.update_idletasks()
+    first_open = (time.perf_counter() - start) * 1000
+
+    def reopen():
+        keyboard.close()
+        keyboard.open(entry)
+
+    modes = ['uppercase', 'symbols', 'lowercase']
+    cycle = iter(modes * args.iterations)
+    print(f"first open (build all layouts): {first_open:8.2f} ms")
+    print(f"re-open (retarget):             {timed(reopen, args.iterations, root):8.2f} ms")
+    print(f"layout switch (raise):          {timed(lambda: keyboard.show_layout(next(cycle)), args.iterations, root):8.2f} ms")
+    print(f"layout switch (rebuild):        {timed(lambda: rebuild(keyboard, next(cycle)), args.iterations, root):8.2f} ms")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
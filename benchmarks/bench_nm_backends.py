@@ -0,0 +1,86 @@
+"""
+Per-call latency of the nmcli and D-Bus NetworkManager backends.
+
+    python3 -m benchmarks.bench_nm_backends            # against the live daemon
+    python3 -m benchmarks.bench_nm_backends --mock     # python-dbusmock on a private bus
+
+--mock starts a private system bus (so nmcli talks to the mock as well),
+spawns dbusmock's networkmanager template and adds two Wi-Fi devices.
+"""
+import argparse
+import statistics
+import subprocess
+import time
+
+from managers.wifi_manager import WifiManager
+from managers.router_manager import RouterManager
+from utils.cache import QueryCache
+
+CALLS = {
+    'snapshot':              lambda w, r: w.snapshot(),
+    'list_adapters':         lambda w, r: w.list_adapters(),
+    'get_active_connection': lambda w, r: w.get_active_connection('wlan0'),
+    'get_status':            lambda w, r: w.get_status('wlan0'),
+    'is_running':            lambda w, r: r.is_running('wlan1'),
+}
+
+
+def start_mock():
+    import dbus
+    import dbusmock
+    from dbusmock.templates.networkmanager import MOCK_IFACE, DeviceState
+
+    dbusmock.DBusTestCase.start_system_bus()
+    proc, obj = dbusmock.DBusTestCase.spawn_server_template(
+        'networkmanager', {}, system_bus=True, stdout=subprocess.DEVNULL
+    )
+    mock = dbus.Interface(obj, MOCK_IFACE)
+    client = mock.AddWiFiDevice('mock_wlan0', 'wlan0', DeviceState.ACTIVATED)
+    mock.AddAccessPoint(client, 'Mock_AP0', 'Home', '00:23:F8:7E:12:BB', 2, 2412, 54000, 80, 1)
+    conn = mock.AddWiFiConnection(client, 'Home', 'Home', 'wpa-psk')
+    mock.AddActiveConnection([client], conn, '/', 'Home', 2)
+    mock.AddWiFiDevice('mock_wlan1', 'wlan1', DeviceState.DISCONNECTED)
+    return proc
+
+
+def bench(backend: str, iterations: int) -> dict:
+    # A cache that keeps nothing, so every call reaches the backend instead of timing cache hits
+    cache = QueryCache(maxsize=0)
+    wifi = WifiManager('wlan0', backend=backend, cache=cache)
+    router = RouterManager('wlan1', backend=backend, cache=cache)
+    results = {}
+    for name, call in CALLS.items():
+        call(wifi, router)  # warm up connections / caches of the bus proxy
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            call(wifi, router)
+            samples.append((time.perf_counter() - start) * 1000)
+        results[name] = {
+            'median_ms': statistics.median(samples),
+            'p95_ms': sorted(samples)[int(len(samples) * 0.95) - 1],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--iterations', type=int, default=50)
+    parser.add_argument('--mock', action='store_true', help="run against python-dbusmock instead of the live daemon")
+    args = parser.parse_args()
+
+    proc = start_mock() if args.mock else None
+    try:
+        table = {backend: bench(backend, args.iterations) for backend in ('nmcli', 'dbus')}
+    finally:
+        if proc:
+            proc.terminate()
+
+    print(f"{'call':24} {'nmcli med':>10} {'dbus med':>10} {'speedup':>8}")
+    for name in CALLS:
+        cli, bus = table['nmcli'][name]['median_ms'], table['dbus'][name]['median_ms']
+        print(f"{name:24} {cli:9.2f}ms {bus:9.2f}ms {cli / bus if bus else 0:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
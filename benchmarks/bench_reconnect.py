@@ -0,0 +1,69 @@
+"""
+Reconnect latency: the old cold path (con delete + con add + con up) against
+WifiManager.connect reusing the saved profile, with and without BSSID pinning.
+
+    python3 -m benchmarks.bench_reconnect --ssid MyNet --psk secret123    # on the Pi, real nmcli
+    python3 -m benchmarks.bench_reconnect --fake --latency-ms 30          # against benchmarks/fakebin
+
+Each iteration ends associated, so every sample is a full reconnect as the
+supervisor would trigger it. The cold path recreates the profile, exactly
+as connect() used to.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+FAKEBIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fakebin')
+
+
+def cold_connect(ifname: str, ssid: str, psk: str):
+    from utils.cmd import run_cmd
+    run_cmd(['nmcli', 'con', 'delete', ssid], timeout=5)
+    run_cmd(['nmcli', 'con', 'add', 'type', 'wifi', 'ifname', ifname, 'con-name', ssid, 'ssid', ssid,
+             'wifi-sec.key-mgmt', 'wpa-psk', 'wifi-sec.psk', psk], timeout=15)
+    run_cmd(['nmcli', 'con', 'up', 'id', ssid, 'ifname', ifname], timeout=15)
+
+
+def timed(fn, iterations: int) -> tuple[float, float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--iterations', type=int, default=10)
+    parser.add_argument('--ifname', default='wlan0')
+    parser.add_argument('--ssid', default='Net0')
+    parser.add_argument('--psk', default='password123')
+    parser.add_argument('--fake', action='store_true', help="use the stand-in nmcli from benchmarks/fakebin")
+    parser.add_argument('--latency-ms', type=float, default=0, help="latency of every fake nmcli call")
+    args = parser.parse_args()
+
+    if args.fake:
+        os.environ['PATH'] = FAKEBIN + os.pathsep + os.environ['PATH']
+        os.environ['HOME'] = tempfile.mkdtemp(prefix='minicp-bench-')
+        os.environ['FAKE_LATENCY_MS'] = str(args.latency_ms)
+
+    from managers.wifi_manager import WifiManager
+    pinned = WifiManager(args.ifname, pin_bssid=True)
+    unpinned = WifiManager(args.ifname, pin_bssid=False)
+    pinned.connect(args.ifname, args.ssid, args.psk)  # learn the BSSID
+
+    rows = [
+        ("cold (delete + add + up)", lambda: cold_connect(args.ifname, args.ssid, args.psk)),
+        ("profile reuse", lambda: unpinned.connect(args.ifname, args.ssid, args.psk)),
+        ("profile reuse, BSSID pinned", lambda: pinned.connect(args.ifname, args.ssid, args.psk)),
+    ]
+    for name, fn in rows:
+        median, worst = timed(fn, args.iterations)
+        print(f"{name:30} median {median:8.1f} ms   max {worst:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
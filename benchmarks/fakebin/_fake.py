@@ -0,0 +1,155 @@
+"""
+Scripted stand-ins for nmcli, bluetoothctl, arp, lsblk, iptables and
+friends, used by the benchmark suite. Every tool sleeps FAKE_LATENCY_MS
+(or FAKE_<TOOL>_LATENCY_MS) before answering, and output sizes are set by:
+
+    FAKE_WIFI_DEVICES  Wi-Fi adapters (wlan0 client, wlan1 AP, rest idle)  [2]
+    FAKE_NETWORKS      scan results                                         [20]
+    FAKE_BT_DEVICES    paired Bluetooth devices                             [3]
+    FAKE_CLIENTS       ARP entries / AP clients                             [5]
+    FAKE_DISKS         USB disks for lsblk                                  [2]
+"""
+import json
+import os
+import sys
+import time
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def latency(tool):
+    ms = os.environ.get(f"FAKE_{tool.upper().replace('-', '_')}_LATENCY_MS", os.environ.get('FAKE_LATENCY_MS', '0'))
+    time.sleep(float(ms) / 1000)
+
+
+def wifi_devices():
+    devices = []
+    for i in range(env_int('FAKE_WIFI_DEVICES', 2)):
+        if i == 0:
+            devices.append((f'wlan{i}', 'connected', f'uuid-{i}', 'Net0', 'infrastructure', 'Net0'))
+        elif i == 1:
+            devices.append((f'wlan{i}', 'connected', f'uuid-{i}', f'Hotspot_wlan{i}', 'ap', 'MiniCP'))
+        else:
+            devices.append((f'wlan{i}', 'disconnected', '', '', '', ''))
+    return devices
+
+
+def nmcli(args):
+    text = ' '.join(args)
+    devices = wifi_devices()
+    if args[:1] == ['monitor']:
+        while True:
+            time.sleep(3600)
+    if text.endswith('DEVICE,TYPE device'):
+        for d in devices:
+            print(f"{d[0]}:wifi")
+        print("eth0:ethernet")
+    elif 'DEVICE,TYPE,STATE,CON-UUID,CONNECTION device' in text:
+        for d in devices:
+            print(f"{d[0]}:wifi:{d[1]}:{d[2] or '--'}:{d[3] or '--'}")
+        print("eth0:ethernet:unavailable:--:--")
+    elif 'connection.uuid,' in text and 'con show' in text:
+        wanted = args[args.index('show') + 1:][1::2]
+        for d in devices:
+            if d[2] in wanted:
+                print(f"connection.uuid:{d[2]}\n802-11-wireless.mode:{d[4]}\n802-11-wireless.ssid:{d[5]}")
+    elif 'NAME,DEVICE con show --active' in text:
+        for d in devices:
+            if d[3]:
+                print(f"{d[3]}:{d[0]}")
+    elif 'IN-USE,BSSID,FREQ' in text:
+        for i in range(env_int('FAKE_NETWORKS', 20)):
+            print(f"{'*' if i == 0 else ' '}:02\\:00\\:00\\:00\\:01\\:{i:02X}:{2412 + 5 * (i % 13)} MHz")
+    elif 'wifi list' in text:
+        # SSID,BSSID,SIGNAL,SECURITY,CHAN,FREQ; every third network has a second, weaker BSSID
+        for i in range(env_int('FAKE_NETWORKS', 20)):
+            chan = 1 + 5 * (i % 3)
+            for b in range(2 if i % 3 == 0 else 1):
+                print(f"Network{i}:02\\:00\\:00\\:00\\:{b:02X}\\:{i:02X}:{max(5, 95 - 3 * i - 20 * b)}:WPA2:"
+                      f"{chan}:{2407 + 5 * chan} MHz")
+    elif 'con add' in text:
+        print("Connection 'x' (00000000-0000-0000-0000-000000000000) successfully added.")
+    elif 'con up' in text:
+        print("Connection successfully activated (D-Bus active path: /org/freedesktop/NetworkManager/ActiveConnection/1)")
+    elif 'con down' in text:
+        print("Connection successfully deactivated")
+    elif 'con delete' in text:
+        print("Connection successfully deleted.")
+    elif 'con modify' in text:
+        pass
+    elif 'connection.id,' in text and 'con show' in text:
+        # Saved profiles: Net* on wlan0 with password123
+        conn_id = args[-1]
+        if conn_id.startswith('Net'):
+            print(f"connection.id:{conn_id}\nconnection.interface-name:wlan0\n802-11-wireless.ssid:{conn_id}\n"
+                  f"802-11-wireless-security.key-mgmt:wpa-psk\n802-11-wireless-security.psk:password123")
+        else:
+            print(f"Error: {conn_id} - no such connection profile.", file=sys.stderr)
+            sys.exit(10)
+    elif 'con show' in text:
+        pass
+
+
+def bluetoothctl(args):
+    devices = [(f"AA:BB:CC:DD:EE:{i:02X}", f"Device {i}") for i in range(env_int('FAKE_BT_DEVICES', 3))]
+    prompt = "\x1b[0;94m[bluetooth]\x1b[0m# "
+
+    def answer(cmd):
+        if cmd in ('paired-devices', 'devices'):
+            return ''.join(f"Device {mac} {name}\n" for mac, name in devices)
+        if cmd.startswith('info'):
+            return f"Device {cmd.split()[-1]}\n\tName: Device\n\tPaired: yes\n\tConnected: yes\n"
+        if cmd.startswith('pair'):
+            return "Attempting to pair\nPairing successful\n"
+        if cmd.startswith('connect'):
+            return "Attempting to connect\nConnection successful\n"
+        if cmd.startswith('disconnect'):
+            return "Attempting to disconnect\nSuccessful disconnected\n"
+        if cmd.startswith('remove'):
+            return "Device has been removed\n"
+        if cmd.startswith('trust'):
+            return "Changing trust succeeded\n"
+        return "Done\n"
+
+    if args:
+        sys.stdout.write(answer(' '.join(args)))
+        return
+    sys.stdout.write("Agent registered\n" + prompt)
+    sys.stdout.flush()
+    for line in sys.stdin:
+        cmd = line.strip()
+        if cmd in ('exit', 'quit'):
+            return
+        latency('bluetoothctl')
+        sys.stdout.write(cmd + "\n" + answer(cmd) + prompt)
+        sys.stdout.flush()
+
+
+def arp(args):
+    print("Address                  HWtype  HWaddress           Flags Mask            Iface")
+    for i in range(env_int('FAKE_CLIENTS', 5)):
+        print(f"192.168.4.{10 + i:<17} ether   02:00:00:00:00:{i:02x}   C                     wlan1")
+
+
+def lsblk(args):
+    disks = [{
+        "name": f"sd{chr(97 + i)}", "label": None, "type": "disk", "mountpoint": None,
+        "children": [{"name": f"sd{chr(97 + i)}1", "label": f"USB{i}", "type": "part", "mountpoint": None}],
+    } for i in range(env_int('FAKE_DISKS', 2))]
+    print(json.dumps({"blockdevices": disks}, indent=3))
+
+
+def main():
+    tool, args = sys.argv[1], sys.argv[2:]
+    if tool != 'bluetoothctl' or args:
+        latency(tool)
+    handler = {'nmcli': nmcli, 'bluetoothctl': bluetoothctl, 'arp': arp, 'lsblk': lsblk}.get(tool)
+    if handler:
+        handler(args)
+    # iptables, iptables-save, iptables-restore, sysctl, sh: succeed silently
+
+
+if __name__ == "__main__":
+    main()
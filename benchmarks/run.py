@@ -0,0 +1,256 @@
+"""
+MiniCP benchmark suite: times every public method of WifiManager,
+RouterManager and BluetoothManager, plus the refresh paths of
+OverviewFrame, WifiManagerFrame and UsbManagerFrame, against the scripted
+stand-in binaries in benchmarks/fakebin (no Pi or radios needed).
+
+    python3 -m benchmarks.run -o bench.json
+    python3 -m benchmarks.run --latency-ms 40 --networks 60 -o slow-nm.json
+    python3 -m benchmarks.run --baseline bench.json --threshold 0.25   # exit 1 on regression
+
+UI refresh paths need a display; without $DISPLAY the suite starts Xvfb
+if it is installed and skips them otherwise.
+"""
+import argparse
+import inspect
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+FAKEBIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fakebin')
+
+# Arguments for every public manager method. A method missing here fails the
+# run, so new API cannot silently go unbenchmarked.
+MANAGER_CALLS = {
+    'WifiManager': {
+        'list_adapters': (),
+        'scan_networks': ('wlan0', 0),  # max_age 0: always read NetworkManager's list
+        'connect': ('wlan0', 'Net0', 'password123'),
+        'disconnect': ('wlan0',),
+        'get_active_connection': ('wlan0',),
+        'snapshot': (),
+        'get_status': ('wlan0',),
+        'save_credentials': ('wlan0', 'Net0', 'password123'),
+        'load_credentials': ('wlan0',),
+        'reconcile': ('wlan0',),
+    },
+    'RouterManager': {
+        'start_ap': ('wlan1', 'MiniCP', 'password123'),
+        'stop_ap': ('wlan1',),
+        'is_running': ('wlan1',),
+        'choose_channel': ('wlan1',),
+        'reevaluate_channel': ('wlan1',),
+        'list_connected_devices': ('wlan1',),
+        'client_tracker': ('wlan1',),
+        'traffic': ('wlan1',),
+        'enable_internet_sharing': ('wlan1',),
+        'disable_internet_sharing': ('wlan1',),
+        'save_credentials': ('wlan1', 'MiniCP', 'password123'),
+        'load_credentials': ('wlan1',),
+        'reconcile': ('wlan1',),
+    },
+    'BluetoothManager': {
+        'scan': (0.2,),
+        'pair': ('AA:BB:CC:DD:EE:00',),
+        'connect': ('AA:BB:CC:DD:EE:00',),
+        'disconnect': ('AA:BB:CC:DD:EE:00',),
+        'remove': ('AA:BB:CC:DD:EE:00',),
+        'get_paired': (),
+        'is_connected': ('AA:BB:CC:DD:EE:00',),
+    },
+}
+
+
+def measure(fn, iterations: int) -> dict:
+    fn()  # warm up (imports, session start-up, ...)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'n': iterations,
+        'median_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[max(0, math.ceil(len(samples) * 0.95) - 1)], 3),
+        'min_ms': round(samples[0], 3),
+    }
+
+
+def public_methods(cls) -> list[str]:
+    return [name for name, _ in inspect.getmembers(cls, inspect.isfunction) if not name.startswith('_')]
+
+
+def build_managers(use_cache: bool):
+    from managers.wifi_manager import WifiManager
+    from managers.router_manager import RouterManager
+    from managers.bluetooth_manager import BluetoothManager
+    from managers.firewall import Firewall
+    from utils.cache import QueryCache
+
+    # maxsize=0 evicts every entry at once, i.e. measures the real command cost
+    cache = None if use_cache else QueryCache(maxsize=0)
+    # Firewall writes these files itself rather than through fakebin; keep it off the real ones
+    scratch = tempfile.mkdtemp(prefix='minicp-bench-fw-')
+    ip_forward = os.path.join(scratch, 'ip_forward')
+    with open(ip_forward, 'w') as f:
+        f.write('0\n')
+    firewall = Firewall(persist_path=os.path.join(scratch, 'rules.v4'), ip_forward_path=ip_forward)
+    return {
+        'WifiManager': WifiManager('wlan0', cache=cache),
+        'RouterManager': RouterManager('wlan1', cache=cache, firewall=firewall),
+        'BluetoothManager': BluetoothManager(cache=cache),
+    }
+
+
+def bench_managers(iterations: int, use_cache: bool) -> dict:
+    results = {}
+    for cls_name, mgr in build_managers(use_cache).items():
+        calls = MANAGER_CALLS[cls_name]
+        missing = set(public_methods(type(mgr))) - calls.keys()
+        if missing:
+            raise SystemExit(f"No benchmark arguments for {cls_name}.{', '.join(sorted(missing))}")
+        for method, args in calls.items():
+            n = 3 if method == 'scan' else iterations
+            results[f"{cls_name}.{method}"] = measure(lambda: getattr(mgr, method)(*args), n)
+    return results
+
+
+def ensure_display():
+    """Return an Xvfb process started for us, None if a display exists; raise if none can be had."""
+    if os.environ.get('DISPLAY'):
+        return None
+    if not shutil.which('Xvfb'):
+        raise RuntimeError("no $DISPLAY and Xvfb is not installed")
+    display = ':97'
+    proc = subprocess.Popen(['Xvfb', display, '-screen', '0', '480x320x24'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    os.environ['DISPLAY'] = display
+    return proc
+
+
+def bench_ui(iterations: int, use_cache: bool) -> dict:
+    import tkinter as tk
+    from types import SimpleNamespace
+    from ui.overview_frame import OverviewFrame
+    from ui.wifi_frame import WifiManagerFrame
+    from ui.usb_frame import UsbManagerFrame
+    from managers.last_state import LastStateStore
+    from managers.throughput import ThroughputSampler
+
+    managers = build_managers(use_cache)
+    root = tk.Tk()
+    root.geometry("480x320")
+    app = SimpleNamespace(root=root, wifi_mgr=managers['WifiManager'],
+                          router_mgr=managers['RouterManager'], bt_mgr=managers['BluetoothManager'],
+                          last_state=LastStateStore(), throughput=ThroughputSampler())
+    overview = OverviewFrame(root, app)
+    wifi = WifiManagerFrame(root, app)
+    usb = UsbManagerFrame(root, app)
+    for frame in (overview, wifi, usb):
+        frame.pack()
+
+    def refresh(fn):
+        def run():
+            fn()
+            root.update_idletasks()
+        return run
+
+    results = {
+        # update_status hands this work to the asyncio bridge; time the fetch and paint it schedules
+        'OverviewFrame.update_status': measure(refresh(lambda: overview.apply_status(overview.fetch_status())),
+                                               iterations),
+        'WifiManagerFrame.refresh_ifaces': measure(refresh(wifi.refresh_ifaces), iterations),
+        'UsbManagerFrame.refresh_usb': measure(refresh(usb.refresh_usb), iterations),
+    }
+    root.destroy()
+    return results
+
+
+def compare(results: dict, baseline_path: str, threshold: float, floor_ms: float) -> list[str]:
+    """Names of benchmarks whose median got slower than baseline by more than threshold."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    regressions = []
+    for name, res in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        new_ms, old_ms = res['median_ms'], old['median_ms']
+        if new_ms - old_ms > floor_ms and new_ms > old_ms * (1 + threshold):
+            regressions.append(f"{name}: {old_ms:.2f} -> {new_ms:.2f} ms (+{(new_ms / old_ms - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--iterations', type=int, default=20)
+    parser.add_argument('-o', '--output', help="write results as JSON to this file")
+    parser.add_argument('--latency-ms', type=float, default=0, help="latency of every fake binary")
+    parser.add_argument('--wifi-devices', type=int, default=2)
+    parser.add_argument('--networks', type=int, default=20)
+    parser.add_argument('--bt-devices', type=int, default=3)
+    parser.add_argument('--clients', type=int, default=5)
+    parser.add_argument('--cached', action='store_true', help="keep the shared query cache enabled")
+    parser.add_argument('--no-ui', action='store_true', help="skip the Tk refresh benchmarks")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed relative slowdown (default 0.2 = 20%%)")
+    parser.add_argument('--floor-ms', type=float, default=1.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    os.environ['PATH'] = FAKEBIN + os.pathsep + os.environ['PATH']
+    os.environ['HOME'] = tempfile.mkdtemp(prefix='minicp-bench-')  # logs and credential files
+    os.environ.update({
+        'FAKE_LATENCY_MS': str(args.latency_ms),
+        'FAKE_WIFI_DEVICES': str(args.wifi_devices),
+        'FAKE_NETWORKS': str(args.networks),
+        'FAKE_BT_DEVICES': str(args.bt_devices),
+        'FAKE_CLIENTS': str(args.clients),
+    })
+
+    results = bench_managers(args.iterations, args.cached)
+    if not args.no_ui:
+        try:
+            xvfb = ensure_display()
+        except RuntimeError as e:
+            print(f"Skipping UI benchmarks: {e}", file=sys.stderr)
+        else:
+            try:
+                results.update(bench_ui(args.iterations, args.cached))
+            finally:
+                if xvfb:
+                    xvfb.terminate()
+
+    for name, res in results.items():
+        print(f"{name:44} {res['median_ms']:9.2f} ms  (p95 {res['p95_ms']:.2f})")
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'params': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')},
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.threshold, args.floor_ms)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,127 @@
-from utils.cmd import run_cmd
-import subprocess
+import logging
+import time
+from managers.bt_session import BluetoothctlSession
+from managers import bluez_dbus
+from utils.cache import SHARED, cached, invalidates
+from utils.opqueue import SUPERSEDED, serialized
+from utils.metrics import METRICS
+
+PAIR_DONE = (r'Pairing successful', r'already paired', r'Failed to pair', r'not available')
+CONNECT_DONE = (r'Connection successful', r'Failed to connect', r'br-connection-profile-unavailable', r'not available')
+DISCONNECT_DONE = (r'Successful disconnected', r'Disconnected: yes', r'Failed to disconnect', r'not available')
+REMOVE_DONE = (r'Device has been removed', r'Failed to remove', r'not available')
+LANE = 'bt'  # one adapter, one bluetoothctl session: every operation shares a queue
+
+
+def _parse_devices(out: str) -> list[tuple[str, str]]:
+    devices = []
+    for line in out.splitlines():
+        line = line.strip()
+        if line.startswith('Device '):
+            parts = line.split(' ', 2)
+            mac = parts[1]
+            name = parts[2] if len(parts) == 3 else '<unknown>'
+            devices.append((mac, name))
+    return devices
+
 
 class BluetoothManager:
-    def _btctl(self, commands: list[str], timeout: int = 10) -> str:
+    def __init__(self, session: BluetoothctlSession = None, backend: str = 'bluetoothctl', bus=None, cache=None):
+        self.cache = cache or SHARED  # QueryCache behind the @cached read methods
+        # Started lazily on the first command; agent is registered once per process
+        self.session = session or BluetoothctlSession()
+        # 'bluetoothctl', 'dbus' or 'auto'; with D-Bus, queries are reads from a signal-fed index
+        self.bluez = bluez_dbus.open_index(backend, bus)
+        if self.bluez is not None:
+            self.bluez.subscribe(lambda mac, device: self.cache.invalidate('bt:paired', f'bt:{mac}'))
+
+    def _bluez_action(self, mac: str, method: str, timeout: float = 10):
         """
-        Run a sequence of bluetoothctl commands in a single session, return combined output.
+        Run a Device1 method over D-Bus. Returns None to fall back to
+        bluetoothctl, else (ok, dbus error name, message).
         """
-        proc = subprocess.Popen(
-            ['bluetoothctl'], stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-            text=True
-        )
-        # send commands then exit
-        cmd_str = "\n".join(commands) + "\nexit\n"
-        out, err = proc.communicate(cmd_str, timeout=timeout)
-        return (out or '') + (err or '')
+        if self.bluez is None:
+            return None
+        try:
+            self.bluez.call(mac, method, timeout)
+            return True, '', ''
+        except KeyError as e:
+            return False, '', str(e)
+        except bluez_dbus.dbus.DBusException as e:
+            return False, e.get_dbus_name() or '', e.get_dbus_message() or str(e)
 
-    def scan(self, duration: int = 10) -> list[tuple[str,str]]:
-        # Ensure powered on and agent ready
-        run_cmd(['bluetoothctl', 'power', 'on'], timeout=5)
-        # Perform scan inside single btctl session
-        out = self._btctl([
-            'agent on',
-            'default-agent',
-            'scan on'
-        ], timeout=duration)
-        # turn off scan
-        run_cmd(['bluetoothctl', 'scan', 'off'], timeout=5)
+    def _btctl(self, commands: list[str], timeout: int = 10, expect=None) -> str:
+        """
+        Run a sequence of bluetoothctl commands over the shared session, return combined output.
+        """
+        if METRICS.enabled:
+            return "\n".join(self._btctl_timed(cmd, timeout, expect) for cmd in commands)
+        try:
+            return "\n".join(self.session.run(cmd, timeout=timeout, expect=expect) for cmd in commands)
+        except OSError as e:
+            logging.error(f"bluetoothctl session failed: {e}")
+            return ""
 
-        devices = []
-        for line in out.splitlines():
-            line = line.strip()
-            if line.startswith('Device '):
-                parts = line.split(' ', 2)
-                mac = parts[1]
-                name = parts[2] if len(parts) == 3 else '<unknown>'
-                devices.append((mac, name))
-        return devices
+    def _btctl_timed(self, command: str, timeout: int, expect) -> str:
+        """One session command, recorded in the metrics registry."""
+        start = time.monotonic()
+        try:
+            out = self.session.run(command, timeout=timeout, expect=expect)
+        except OSError as e:
+            METRICS.observe('bluetoothctl', command.split(' ', 1)[0], time.monotonic() - start, failed=True)
+            logging.error(f"bluetoothctl session failed: {e}")
+            return ""
+        duration = time.monotonic() - start
+        # expect=() collects output for the whole timeout on purpose (scan on)
+        timed_out = expect != () and duration >= timeout
+        METRICS.observe('bluetoothctl', command.split(' ', 1)[0], duration, timed_out)
+        return out
+
+    @serialized(LANE, coalesce=True)
+    def scan(self, duration: int = 10) -> list[tuple[str,str]]:
+        if self.bluez is not None:
+            try:
+                self.bluez.discover(duration)
+                return self.bluez.devices()
+            except Exception as e:
+                logging.warning(f"D-Bus discovery failed, falling back to bluetoothctl: {e}")
+        # Ensure powered on, then collect discoveries for the whole duration
+        self._btctl(['power on'], timeout=5)
+        self._btctl(['scan on'], timeout=duration, expect=())
+        self._btctl(['scan off'], timeout=5)
+        return _parse_devices(self._btctl(['devices'], timeout=5))
 
+    @invalidates('bt:paired', 'bt:{mac}')
+    @serialized(LANE, supersedes='bt:{mac}', superseded=(False, SUPERSEDED))
     def pair(self, mac: str) -> tuple[bool,str]:
-        cmds = [
-            'agent on',
-            'default-agent',
-            f'pair {mac}',
-            f'trust {mac}'
-        ]
-        out = self._btctl(cmds, timeout=15)
+        result = self._bluez_action(mac, 'Pair', timeout=15)
+        if result is not None:
+            ok, name, msg = result
+            if ok or name == 'org.bluez.Error.AlreadyExists':
+                try:
+                    self.bluez.set_trusted(mac)
+                except bluez_dbus.dbus.DBusException as e:
+                    logging.warning(f"Could not trust {mac}: {e}")
+                return True, ''
+            return False, msg
+        out = self._btctl([f'pair {mac}'], timeout=15, expect=PAIR_DONE)
         if 'Pairing successful' in out or 'already paired' in out:
+            self._btctl([f'trust {mac}'], timeout=5)
             return True, ''
         return False, out.strip()
 
+    @invalidates('bt:{mac}')
+    @serialized(LANE, supersedes='bt:{mac}', superseded=(False, SUPERSEDED))
     def connect(self, mac: str) -> tuple[bool,str]:
         """
         Connect to a paired device; handle profile errors.
         """
-        out = self._btctl([f'connect {mac}'], timeout=10)
+        result = self._bluez_action(mac, 'Connect', timeout=10)
+        if result is not None:
+            ok, _, out = result
+        else:
+            out = self._btctl([f'connect {mac}'], timeout=10, expect=CONNECT_DONE)
+            ok = 'Connection successful' in out or 'Connected: yes' in out
         # Profile unavailable error
         if 'br-connection-profile-unavailable' in out:
             msg = (
@@ -62,41 +129,54 @@ class BluetoothManager:
                 'Install/configure bluealsa or pulseaudio with A2DP support.'
             )
             return False, msg
-        # Success indicator
-        if 'Connection successful' in out or 'Connected: yes' in out:
+        if ok:
             return True, ''
         # Fallback: query info
-        info = run_cmd(['bluetoothctl', 'info', mac], timeout=5)
-        if 'Connected: yes' in info:
+        if self.is_connected(mac):
             return True, ''
-        return False, (out + '\n' + info).strip()
+        return False, out.strip()
 
+    @invalidates('bt:{mac}')
+    @serialized(LANE, supersedes='bt:{mac}', superseded=(False, SUPERSEDED))
     def disconnect(self, mac: str) -> tuple[bool,str]:
-        out = self._btctl([f'disconnect {mac}'], timeout=5)
+        result = self._bluez_action(mac, 'Disconnect', timeout=5)
+        if result is not None:
+            return result[0], result[2]
+        out = self._btctl([f'disconnect {mac}'], timeout=5, expect=DISCONNECT_DONE)
         if 'Successful disconnected' in out or 'Disconnected: yes' in out:
             return True, ''
         return False, out.strip()
 
+    @invalidates('bt:paired', 'bt:{mac}')
+    @serialized(LANE, supersedes='bt:{mac}', superseded=(False, SUPERSEDED))
     def remove(self, mac: str) -> tuple[bool,str]:
-        out = self._btctl([f'remove {mac}'], timeout=5)
+        if self.bluez is not None:
+            try:
+                self.bluez.remove(mac)
+                return True, ''
+            except KeyError as e:
+                return False, str(e)
+            except bluez_dbus.dbus.DBusException as e:
+                return False, e.get_dbus_message() or str(e)
+        out = self._btctl([f'remove {mac}'], timeout=5, expect=REMOVE_DONE)
         if 'Device has been removed' in out:
             return True, ''
         return False, out.strip()
 
+    @cached(10, 'bt:paired')
+    @serialized(LANE, coalesce=True)
     def get_paired(self) -> list[tuple[str,str]]:
-        out = run_cmd(['bluetoothctl', 'paired-devices'], timeout=5)
-        paired = []
-        for line in out.splitlines():
-            if line.startswith('Device '):
-                parts = line.split(' ', 2)
-                mac = parts[1]
-                name = parts[2] if len(parts) == 3 else '<unknown>'
-                paired.append((mac, name))
-        return paired
+        if self.bluez is not None:
+            return self.bluez.paired()
+        return _parse_devices(self._btctl(['paired-devices'], timeout=5))
 
+    @cached(5, 'bt:{mac}')
+    @serialized(LANE, coalesce=True)
     def is_connected(self, mac: str) -> bool:
-        out = run_cmd(['bluetoothctl', 'info', mac], timeout=5)
+        if self.bluez is not None:
+            return self.bluez.is_connected(mac)
+        out = self._btctl([f'info {mac}'], timeout=5)
         for line in out.splitlines():
             if line.strip().startswith('Connected:'):
                 return line.split(':',1)[1].strip() == 'yes'
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,209 @@
+import logging
+import threading
+import time
+
+try:
+    import dbus
+    import dbus.service
+    from dbus.mainloop.glib import DBusGMainLoop, threads_init
+    from gi.repository import GLib
+except ImportError:  # python3-dbus / python3-gi are optional, bluetoothctl remains the fallback
+    dbus = None
+
+BLUEZ = 'org.bluez'
+OBJECT_MANAGER = 'org.freedesktop.DBus.ObjectManager'
+PROPS = 'org.freedesktop.DBus.Properties'
+ADAPTER = 'org.bluez.Adapter1'
+DEVICE = 'org.bluez.Device1'
+AGENT_MANAGER = 'org.bluez.AgentManager1'
+AGENT_PATH = '/org/minicp/agent'
+
+
+class BlueZIndex:
+    """
+    Local index of BlueZ devices, loaded with one GetManagedObjects call and
+    kept current from PropertiesChanged and InterfacesAdded/Removed signals
+    dispatched on a GLib loop thread. Paired/connected queries are plain
+    dict reads.
+    """
+    def __init__(self, bus=None):
+        if dbus is None:
+            raise RuntimeError("python3-dbus / python3-gi are not installed")
+        threads_init()
+        # A private connection: the shared one may already exist without a mainloop (e.g. opened by
+        # nm_dbus), and then signals and the pairing agent would never be dispatched
+        self.bus = bus or dbus.SystemBus(private=True, mainloop=DBusGMainLoop())
+        self._lock = threading.Lock()
+        self._devices = {}  # path -> {'mac', 'name', 'paired', 'connected', 'rssi', 'adapter'}
+        self._by_mac = {}   # mac -> path
+        self._subscribers = []
+
+        self.bus.add_signal_receiver(self._on_properties, 'PropertiesChanged', PROPS, BLUEZ, path_keyword='path')
+        self.bus.add_signal_receiver(self._on_added, 'InterfacesAdded', OBJECT_MANAGER, BLUEZ)
+        self.bus.add_signal_receiver(self._on_removed, 'InterfacesRemoved', OBJECT_MANAGER, BLUEZ)
+        self.adapter = None
+        manager = dbus.Interface(self.bus.get_object(BLUEZ, '/'), OBJECT_MANAGER)
+        for path, ifaces in manager.GetManagedObjects().items():
+            self._on_added(path, ifaces)
+        self._register_agent()
+        threading.Thread(target=GLib.MainLoop().run, name="bluez-dbus", daemon=True).start()
+
+    def subscribe(self, callback):
+        """callback(mac, device_dict_or_None) on every change. Returns an unsubscribe function."""
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    # queries
+
+    def paired(self) -> list[tuple[str, str]]:
+        with self._lock:
+            return [(d['mac'], d['name']) for d in self._devices.values() if d['paired']]
+
+    def devices(self) -> list[tuple[str, str]]:
+        with self._lock:
+            return [(d['mac'], d['name']) for d in self._devices.values()]
+
+    def is_connected(self, mac: str) -> bool:
+        with self._lock:
+            path = self._by_mac.get(mac)
+            return bool(path and self._devices[path]['connected'])
+
+    def rssi(self, mac: str) -> int | None:
+        with self._lock:
+            path = self._by_mac.get(mac)
+            return self._devices[path]['rssi'] if path else None
+
+    # actions
+
+    def _device(self, mac: str):
+        with self._lock:
+            path = self._by_mac.get(mac)
+        if path is None:
+            raise KeyError(f"Device {mac} not available")
+        return path, dbus.Interface(self.bus.get_object(BLUEZ, path), DEVICE)
+
+    def call(self, mac: str, method: str, timeout: float = 10):
+        """Invoke a Device1 method (Pair, Connect, Disconnect, ...)."""
+        _, device = self._device(mac)
+        return getattr(device, method)(timeout=timeout)
+
+    def set_trusted(self, mac: str):
+        path, _ = self._device(mac)
+        self.bus.get_object(BLUEZ, path).Set(DEVICE, 'Trusted', True, dbus_interface=PROPS)
+
+    def remove(self, mac: str):
+        path, _ = self._device(mac)
+        adapter = self._devices[path]['adapter']
+        dbus.Interface(self.bus.get_object(BLUEZ, adapter), ADAPTER).RemoveDevice(path)
+
+    def discover(self, duration: float):
+        adapter = self.bus.get_object(BLUEZ, self.adapter)
+        adapter.Set(ADAPTER, 'Powered', True, dbus_interface=PROPS)
+        adapter.StartDiscovery(dbus_interface=ADAPTER)
+        try:
+            time.sleep(duration)
+        finally:
+            adapter.StopDiscovery(dbus_interface=ADAPTER)
+
+    # signal handlers (GLib loop thread)
+
+    def _notify(self, mac, device):
+        for cb in list(self._subscribers):
+            try:
+                cb(mac, device)
+            except Exception:
+                logging.exception("BlueZ subscriber failed")
+
+    def _on_added(self, path, ifaces):
+        path = str(path)
+        if ADAPTER in ifaces and self.adapter is None:
+            self.adapter = path
+        if DEVICE not in ifaces:
+            return
+        props = ifaces[DEVICE]
+        device = {
+            'mac': str(props.get('Address', '')),
+            'name': str(props.get('Alias', props.get('Name', '<unknown>'))),
+            'paired': bool(props.get('Paired', False)),
+            'connected': bool(props.get('Connected', False)),
+            'rssi': int(props['RSSI']) if 'RSSI' in props else None,
+            'adapter': str(props.get('Adapter', self.adapter)),
+        }
+        with self._lock:
+            self._devices[path] = device
+            self._by_mac[device['mac']] = path
+        self._notify(device['mac'], dict(device))
+
+    def _on_removed(self, path, ifaces):
+        if DEVICE not in ifaces:
+            return
+        with self._lock:
+            device = self._devices.pop(str(path), None)
+            if device:
+                self._by_mac.pop(device['mac'], None)
+        if device:
+            self._notify(device['mac'], None)
+
+    def _on_properties(self, iface, changed, invalidated, path=None):
+        if iface != DEVICE:
+            return
+        keys = {'Paired': 'paired', 'Connected': 'connected', 'RSSI': 'rssi', 'Alias': 'name'}
+        with self._lock:
+            device = self._devices.get(str(path))
+            if device is None:
+                return
+            for prop, key in keys.items():
+                if prop in changed:
+                    value = changed[prop]
+                    device[key] = str(value) if key == 'name' else int(value) if key == 'rssi' else bool(value)
+            for prop in invalidated:
+                if prop == 'RSSI':
+                    device['rssi'] = None
+            snapshot = dict(device)
+        self._notify(snapshot['mac'], snapshot)
+
+    def _register_agent(self):
+        """Register a NoInputNoOutput agent so Just Works pairing succeeds without bluetoothctl."""
+        try:
+            _Agent(self.bus, AGENT_PATH)
+            manager = dbus.Interface(self.bus.get_object(BLUEZ, '/org/bluez'), AGENT_MANAGER)
+            manager.RegisterAgent(AGENT_PATH, 'NoInputNoOutput')
+            manager.RequestDefaultAgent(AGENT_PATH)
+        except dbus.DBusException as e:
+            logging.warning(f"Could not register BlueZ agent: {e}")
+
+
+if dbus is not None:
+    class _Agent(dbus.service.Object):
+        @dbus.service.method('org.bluez.Agent1', in_signature='', out_signature='')
+        def Release(self):
+            pass
+
+        @dbus.service.method('org.bluez.Agent1', in_signature='os', out_signature='')
+        def AuthorizeService(self, device, uuid):
+            pass
+
+        @dbus.service.method('org.bluez.Agent1', in_signature='ou', out_signature='')
+        def RequestConfirmation(self, device, passkey):
+            pass
+
+        @dbus.service.method('org.bluez.Agent1', in_signature='o', out_signature='')
+        def RequestAuthorization(self, device):
+            pass
+
+        @dbus.service.method('org.bluez.Agent1', in_signature='', out_signature='')
+        def Cancel(self):
+            pass
+
+
+def open_index(backend: str, bus=None):
+    """'bluetoothctl' -> None, 'dbus' -> BlueZIndex (or raise), 'auto' -> BlueZIndex if reachable."""
+    if backend == 'bluetoothctl':
+        return None
+    try:
+        return BlueZIndex(bus)
+    except Exception as e:
+        if backend == 'dbus':
+            raise
+        logging.info(f"BlueZ D-Bus backend unavailable, using bluetoothctl: {e}")
+        return None
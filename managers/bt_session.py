@@ -0,0 +1,182 @@
+import logging
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import Future
+
+ANSI_RE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]|[\x01\x02]')
+# "[bluetooth]# ", "[JBL Go]# ", "[agent] Enter PIN code: " is not a prompt
+PROMPT_RE = re.compile(r'^\[[^\]]*\][#>] ?')
+# Asynchronous notifications; bluetoothctl reprints the prompt after each one
+EVENT_RE = re.compile(r'^\[(CHG|NEW|DEL)\] ')
+DRAIN_MAX = 0.5           # longest wait for output to settle before writing a command
+DRAIN_AFTER_TIMEOUT = 2.0  # ... when the previous command timed out and may still answer
+
+
+class BluetoothctlSession:
+    """
+    One long-lived interactive bluetoothctl process shared by every caller.
+
+    Requests are queued and written one at a time. A response is framed by
+    the prompt bluetoothctl prints once it is ready for the next command, or
+    by an expected pattern for commands whose result arrives asynchronously
+    (pair, connect, ...). Prompts reprinted after [CHG]/[NEW]/[DEL] events
+    do not end a response, and output still arriving from an earlier
+    (e.g. timed out) command is drained and discarded before the next one
+    is written. The process is restarted transparently, agent included, if
+    it dies.
+    """
+    def __init__(self, init_commands=('agent on', 'default-agent'), quiet: float = 0.05):
+        self.init_commands = init_commands
+        self.quiet = quiet
+        self._proc = None
+        self._queue = queue.Queue()
+        self._cond = threading.Condition()
+        self._lines = []          # output lines of the request in flight
+        self._prompts = 0         # prompts seen since the request was written
+        self._after_event = False # the last line was an event, so the next prompt is a reprint
+        self._timed_out = False   # the previous request gave up waiting for its answer
+        self._last_output = 0.0
+        self._worker = None
+
+    def run(self, command: str, timeout: float = 10, expect=None) -> str:
+        """
+        Send one command and return its output.
+
+        expect=None frames the response by the next prompt; a tuple of
+        regexes waits until one of them matches (an empty tuple collects
+        output for the whole timeout, e.g. for 'scan on').
+        """
+        fut = Future()
+        self._queue.put((command, timeout, expect, fut))
+        self._ensure_worker()
+        return fut.result()
+
+    def close(self):
+        self._queue.put(None)
+        self._kill()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._serve, name="bluetoothctl", daemon=True)
+            self._worker.start()
+
+    def _serve(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            command, timeout, expect, fut = item
+            try:
+                fut.set_result(self._execute(command, timeout, expect))
+            except Exception as e:
+                fut.set_exception(e)
+
+    def _execute(self, command, timeout, expect, retry=True) -> str:
+        if self._proc is None or self._proc.poll() is not None:
+            self._start()
+        try:
+            return self._exchange(command, timeout, expect)
+        except (BrokenPipeError, OSError):
+            if not retry:
+                raise
+            logging.warning("bluetoothctl died, restarting session")
+            self._kill()
+            return self._execute(command, timeout, expect, retry=False)
+
+    def _start(self):
+        logging.info("Starting bluetoothctl session")
+        self._proc = subprocess.Popen(
+            ['bluetoothctl'], stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0
+        )
+        threading.Thread(target=self._read, args=(self._proc,), daemon=True).start()
+        for cmd in self.init_commands:
+            self._exchange(cmd, 5, None)
+
+    def _kill(self):
+        if self._proc and self._proc.poll() is None:
+            self._proc.kill()
+        self._proc = None
+
+    def _read(self, proc):
+        """Split raw output into lines; a trailing prompt has no newline, so it is detected on the fly."""
+        buf = ''
+        fd = proc.stdout.fileno()
+        while True:
+            try:
+                chunk = os.read(fd, 4096)
+            except OSError:
+                chunk = b''
+            if not chunk:
+                with self._cond:
+                    self._cond.notify_all()
+                return
+            buf += ANSI_RE.sub('', chunk.decode(errors='replace'))
+            *lines, buf = re.split(r'[\r\n]', buf)
+            with self._cond:
+                for line in lines:
+                    self._add_line(line)
+                if PROMPT_RE.match(buf):
+                    if not self._after_event:
+                        self._prompts += 1
+                    self._after_event = False
+                    buf = PROMPT_RE.sub('', buf, count=1)
+                self._last_output = time.monotonic()
+                self._cond.notify_all()
+
+    def _add_line(self, line):
+        if PROMPT_RE.match(line):
+            line = PROMPT_RE.sub('', line, count=1)
+        if line.strip():
+            self._lines.append(line.strip())
+            self._after_event = bool(EVENT_RE.match(line.strip()))
+
+    def _drain(self):
+        """
+        Wait for output to settle, then discard it: late answers to an
+        earlier command, events. After a timeout the late answer is also
+        waited for (its prompt), within DRAIN_AFTER_TIMEOUT.
+        """
+        limit = time.monotonic() + (DRAIN_AFTER_TIMEOUT if self._timed_out else DRAIN_MAX)
+        with self._cond:
+            while time.monotonic() < limit and (time.monotonic() - self._last_output < self.quiet
+                                                or self._timed_out and not self._prompts):
+                if self._proc.poll() is not None:
+                    break
+                self._cond.wait(self.quiet)
+            if self._lines:
+                logging.debug(f"Discarding stray bluetoothctl output: {self._lines}")
+            self._lines, self._prompts = [], 0
+        self._timed_out = False
+
+    def _exchange(self, command, timeout, expect) -> str:
+        patterns = [re.compile(p) for p in expect] if expect is not None else None
+        self._drain()
+        self._proc.stdin.write((command + '\n').encode())
+        self._proc.stdin.flush()
+
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                # Events are the answer when waiting for a pattern (e.g. "Connected: yes"), noise otherwise
+                body = [l for l in self._lines if l != command and (patterns is not None or not EVENT_RE.match(l))]
+                if patterns is not None:
+                    if any(p.search(l) for p in patterns for l in body):
+                        break
+                elif self._prompts and time.monotonic() - self._last_output >= (self.quiet if body else 10 * self.quiet):
+                    break
+                if self._proc.poll() is not None:
+                    raise BrokenPipeError("bluetoothctl exited")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if expect != ():  # () collects for the whole timeout on purpose
+                        logging.warning(f"bluetoothctl {command!r} timed out")
+                        self._timed_out = True
+                        self._prompts = 0  # the next prompt is the late answer's
+                    break
+                self._cond.wait(min(remaining, self.quiet))
+            return '\n'.join(body)
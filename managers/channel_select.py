@@ -0,0 +1,70 @@
+from managers.nm_state import freq_to_channel
+
+# Channels an AP may be started on without DFS radar detection, per nmcli band
+CHANNELS = {
+    'bg': tuple(range(1, 12)),
+    'a': (36, 40, 44, 48, 149, 153, 157, 161, 165),
+}
+NON_OVERLAPPING = (1, 6, 11)  # preferred on 2.4 GHz when scores tie
+
+# Score weights: every BSS on the channel, plus its signal (0..1) scaled by overlap
+BSS_WEIGHT = 1.0
+SIGNAL_WEIGHT = 2.0
+SPAN = 5  # 2.4 GHz channels 5 apart no longer overlap (20 MHz wide, 5 MHz spacing)
+
+
+def band_of(freq: int) -> str | None:
+    """nmcli band of a frequency in MHz: 'bg', 'a', or None (e.g. 6 GHz)."""
+    if 2400 <= freq <= 2500:
+        return 'bg'
+    if 5000 <= freq <= 5925:
+        return 'a'
+    return None
+
+
+def overlap(a: int, b: int, band: str) -> float:
+    """Fraction of channel a's spectrum shared with channel b: 1 on the same channel."""
+    if a == b:
+        return 1.0
+    if band != 'bg':
+        return 0.0
+    return max(0.0, 1 - abs(a - b) / SPAN)
+
+
+def score_channels(networks, band: str = 'bg', channels=None) -> dict[int, float]:
+    """
+    Congestion score per legal channel of band, lower is better, from scan
+    results (one entry per BSS with 'signal' in % and 'channel' or 'freq').
+    Each BSS on the same channel adds BSS_WEIGHT; on 2.4 GHz, BSSes on
+    overlapping channels add a share of it that falls off with distance.
+    Every BSS also adds its signal strength weighted by the same overlap,
+    so a strong neighbour counts for more than a faint one.
+    """
+    channels = channels or CHANNELS[band]
+    bss = []
+    for net in networks:
+        freq = net.get('freq', 0)
+        if freq:
+            # By frequency: 6 GHz channel numbers (1-233) collide with both other bands
+            if band_of(freq) != band:
+                continue
+            channel = freq_to_channel(freq)
+        else:
+            channel = net.get('channel', 0)
+            if (channel > 14) != (band == 'a'):
+                continue
+        if channel:
+            bss.append((channel, max(0, min(100, net.get('signal', 0))) / 100))
+    scores = {}
+    for channel in channels:
+        score = 0.0
+        for other, strength in bss:
+            share = overlap(channel, other, band)
+            score += share * (BSS_WEIGHT + SIGNAL_WEIGHT * strength)
+        scores[channel] = round(score, 3)
+    return scores
+
+
+def best_channel(scores: dict[int, float]) -> int:
+    """Least congested channel; ties go to 1/6/11, then the lowest channel."""
+    return min(scores, key=lambda ch: (scores[ch], ch not in NON_OVERLAPPING, ch))
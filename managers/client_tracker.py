@@ -0,0 +1,264 @@
+import errno
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass
+
+PROC_ARP = '/proc/net/arp'
+# Written by the dnsmasq NetworkManager starts for ipv4.method=shared
+LEASES_TEMPLATE = '/var/lib/NetworkManager/dnsmasq-{ifname}.leases'
+
+# rtnetlink, see linux/rtnetlink.h and linux/neighbour.h
+RTMGRP_NEIGH = 0x4
+RTM_NEWNEIGH, RTM_DELNEIGH, RTM_GETNEIGH = 28, 29, 30
+NLMSG_ERROR, NLMSG_DONE = 2, 3
+NLM_F_REQUEST, NLM_F_DUMP = 0x1, 0x300
+NDA_DST, NDA_LLADDR = 1, 2
+NUD_VALID = 0x02 | 0x04 | 0x08 | 0x10 | 0x80  # reachable, stale, delay, probe, permanent
+_NLMSGHDR = struct.Struct('=IHHII')
+_NDMSG = struct.Struct('=B3xiHBB')
+_RTATTR = struct.Struct('=HH')
+
+ATF_COM = 0x2  # /proc/net/arp flag of a completed entry
+
+
+@dataclass(frozen=True)
+class Client:
+    mac: str
+    ip: str
+    hostname: str = ''
+    since: float = 0.0  # when the tracker first saw the client
+
+    def as_dict(self) -> dict:
+        return {'ip': self.ip, 'mac': self.mac, 'hostname': self.hostname}
+
+
+def parse_proc_arp(text: str, ifname: str) -> dict[str, str]:
+    """{mac: ip} of the completed neighbour entries on ifname."""
+    neighbours = {}
+    for line in text.splitlines()[1:]:
+        parts = line.split()
+        if len(parts) < 6 or parts[5] != ifname:
+            continue
+        ip, flags, mac = parts[0], int(parts[2], 16), parts[3].lower()
+        if flags & ATF_COM and mac != '00:00:00:00:00:00':
+            neighbours[mac] = ip
+    return neighbours
+
+
+def parse_leases(text: str, now: float = None) -> dict[str, tuple[str, str]]:
+    """{mac: (ip, hostname)} of the unexpired leases in a dnsmasq leases file."""
+    now = time.time() if now is None else now
+    leases = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 4 or not parts[0].isdigit():
+            continue
+        expires = int(parts[0])
+        if expires and expires < now:
+            continue
+        hostname = '' if parts[3] == '*' else parts[3]
+        leases[parts[1].lower()] = (parts[2], hostname)
+    return leases
+
+
+def _parse_neigh_messages(data: bytes):
+    """Yield (msg_type, ifindex, state, ip, mac) from a netlink datagram; ip/mac may be ''."""
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(data):
+        length, msg_type = _NLMSGHDR.unpack_from(data, offset)[:2]
+        if length < _NLMSGHDR.size:
+            break
+        body = offset + _NLMSGHDR.size
+        if msg_type in (RTM_NEWNEIGH, RTM_DELNEIGH) and body + _NDMSG.size <= offset + length:
+            family, ifindex, state = _NDMSG.unpack_from(data, body)[:3]
+            ip = mac = ''
+            attr = body + _NDMSG.size
+            while attr + _RTATTR.size <= offset + length:
+                attr_len, attr_type = _RTATTR.unpack_from(data, attr)
+                if attr_len < _RTATTR.size:
+                    break
+                payload = data[attr + _RTATTR.size:attr + attr_len]
+                if attr_type == NDA_DST and family == socket.AF_INET:
+                    ip = socket.inet_ntop(socket.AF_INET, payload)
+                elif attr_type == NDA_LLADDR:
+                    mac = ':'.join(f'{b:02x}' for b in payload)
+                attr += (attr_len + 3) & ~3
+            if ip:
+                yield msg_type, ifindex, state, ip, mac
+        elif msg_type in (NLMSG_DONE, NLMSG_ERROR):
+            yield msg_type, 0, 0, '', ''
+        offset += (length + 3) & ~3
+
+
+class ClientTracker:
+    """
+    Stations on an access point interface, from the kernel neighbour table
+    joined with the DHCP leases of NetworkManager's shared-mode dnsmasq.
+
+    With rtnetlink available a listener thread keeps the neighbour table
+    current from RTM_NEWNEIGH/RTM_DELNEIGH events; otherwise every query
+    re-reads /proc/net/arp. Either way a query costs a file read at most,
+    never a process spawn. A freshly leased client counts as connected for
+    lease_grace seconds even before it has a neighbour entry.
+    """
+    def __init__(self, ifname: str, leases_path: str = None, use_netlink: bool = True, lease_grace: float = 60):
+        self.ifname = ifname
+        self.leases_path = leases_path or LEASES_TEMPLATE.format(ifname=ifname)
+        self.use_netlink = use_netlink
+        self.lease_grace = lease_grace
+        self._lock = threading.Lock()
+        self._neighbours = {}   # mac -> ip
+        self._clients = {}      # mac -> Client
+        self._leases = {}       # mac -> (ip, hostname)
+        self._leases_stamp = None
+        self._lease_seen = {}   # mac -> first time its lease was seen
+        self._leases_read = False
+        self._subscribers = []
+        self._sock = None
+        self._netlink_synced = False
+
+    def start(self):
+        """Start the rtnetlink listener if the kernel allows it; /proc/net/arp polling otherwise."""
+        if self.use_netlink and self._sock is None:
+            try:
+                sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+                sock.bind((0, RTMGRP_NEIGH))
+            except (OSError, AttributeError) as e:
+                logging.info(f"rtnetlink unavailable, polling {PROC_ARP}: {e}")
+            else:
+                self._sock = sock
+                threading.Thread(target=self._listen, name=f"neigh-{self.ifname}", daemon=True).start()
+        return self
+
+    def stop(self):
+        sock, self._sock = self._sock, None
+        self._netlink_synced = False
+        if sock is not None:
+            sock.close()
+
+    def subscribe(self, callback):
+        """callback(event, client) with event 'join' or 'leave'. Returns an unsubscribe function."""
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def clients(self) -> list[Client]:
+        self.refresh()
+        with self._lock:
+            return sorted(self._clients.values(), key=lambda c: c.since)
+
+    def refresh(self):
+        """Recompute the client table from the neighbour table and leases, emit join/leave events."""
+        if not self._netlink_synced:
+            try:
+                with open(PROC_ARP) as f:
+                    neighbours = parse_proc_arp(f.read(), self.ifname)
+            except OSError as e:
+                logging.error(f"Failed to read {PROC_ARP}: {e}")
+                neighbours = {}
+            with self._lock:
+                self._neighbours = neighbours
+        self._read_leases()
+
+        now = time.time()
+        events = []
+        with self._lock:
+            present = dict(self._neighbours)
+            for mac, (ip, _) in self._leases.items():
+                if mac not in present and now - self._lease_seen.get(mac, 0) < self.lease_grace:
+                    present[mac] = ip
+            old, self._clients = self._clients, {}
+            for mac, ip in present.items():
+                hostname = self._leases.get(mac, ('', ''))[1]
+                previous = old.get(mac)
+                self._clients[mac] = Client(mac, ip, hostname, previous.since if previous else now)
+                if previous is None:
+                    events.append(('join', self._clients[mac]))
+            events += [('leave', client) for mac, client in old.items() if mac not in present]
+        for event, client in events:
+            logging.info(f"Client {event} on {self.ifname}: {client.mac} {client.ip} {client.hostname}")
+            for callback in list(self._subscribers):
+                try:
+                    callback(event, client)
+                except Exception:
+                    logging.exception("Client tracker subscriber failed")
+
+    def _read_leases(self):
+        try:
+            st = os.stat(self.leases_path)
+            stamp = st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            stamp = None
+        if stamp == self._leases_stamp:
+            return
+        leases = {}
+        if stamp is not None:
+            try:
+                with open(self.leases_path) as f:
+                    leases = parse_leases(f.read())
+            except OSError as e:
+                logging.error(f"Failed to read {self.leases_path}: {e}")
+                return
+        now = time.time()
+        with self._lock:
+            # Leases found on the first read may be left over from an earlier session
+            first_seen = now if self._leases_read else 0
+            self._lease_seen = {mac: self._lease_seen.get(mac, first_seen) for mac in leases}
+            self._leases, self._leases_stamp, self._leases_read = leases, stamp, True
+
+    # rtnetlink
+
+    def _request_dump(self, sock):
+        request = _NLMSGHDR.pack(_NLMSGHDR.size + _NDMSG.size, RTM_GETNEIGH, NLM_F_REQUEST | NLM_F_DUMP, 1, 0)
+        sock.send(request + _NDMSG.pack(socket.AF_INET, 0, 0, 0, 0))
+
+    def _listen(self):
+        sock = self._sock
+        dump = {}
+        dumping = True
+        try:
+            self._request_dump(sock)
+            while self._sock is sock:
+                try:
+                    data = sock.recv(65536)
+                except OSError as e:
+                    if self._sock is not sock:
+                        return
+                    if e.errno == errno.ENOBUFS:  # events were dropped, the table must be re-read
+                        logging.warning(f"Neighbour events overrun on {self.ifname}, resyncing")
+                        dump, dumping = {}, True
+                        self._request_dump(sock)
+                        continue
+                    raise
+                try:
+                    ifindex = socket.if_nametoindex(self.ifname)
+                except OSError:
+                    ifindex = None  # interface not up yet
+                changed = False
+                for msg_type, index, state, ip, mac in _parse_neigh_messages(data):
+                    if msg_type in (NLMSG_DONE, NLMSG_ERROR):
+                        if dumping:
+                            with self._lock:
+                                self._neighbours = dump
+                            dumping, changed = False, True
+                            self._netlink_synced = True
+                        continue
+                    if index != ifindex:
+                        continue
+                    table = dump if dumping else self._neighbours
+                    with self._lock:
+                        for known, known_ip in list(table.items()):
+                            if known_ip == ip:
+                                del table[known]
+                        if msg_type == RTM_NEWNEIGH and state & NUD_VALID and mac:
+                            table[mac] = ip
+                    changed = changed or not dumping
+                if changed:
+                    self.refresh()
+        except Exception as e:
+            logging.error(f"rtnetlink listener on {self.ifname} failed, falling back to {PROC_ARP}: {e}")
+        finally:
+            self._netlink_synced = False
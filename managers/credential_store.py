@@ -0,0 +1,167 @@
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+
+
+class CredentialStore:
+    """
+    In-memory credentials backed by one JSON file.
+
+    Reads are served from memory; the file is only re-parsed when its
+    mtime/size changes (someone edited it by hand). Writes are coalesced
+    for flush_delay seconds and then written atomically (temp file, fsync,
+    rename), so a power cut on the SD card never leaves a truncated file.
+
+    Layout, compatible with the old {ifname: {'ssid', 'psk'}} files:
+        {ifname: {'ssid': last used, 'psk': ..., 'profiles': {ssid: psk}, 'disabled': bool}}
+    """
+    def __init__(self, path: str, flush_delay: float = 1.0):
+        self.path = path
+        self.flush_delay = flush_delay
+        self._lock = threading.RLock()
+        self._data = {}
+        self._stamp = None
+        self._dirty = False
+        self._timer = None
+        self._reload()
+        atexit.register(self.flush)
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
+
+    def _reload(self):
+        stamp = self._file_stamp()
+        data = {}
+        if stamp is not None:
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            except Exception as e:
+                logging.error(f"Failed to load credentials from {self.path}: {e}")
+        self._data = data if isinstance(data, dict) else {}
+        self._stamp = stamp
+
+    def _check_external_edit(self):
+        # Pending in-memory changes win over an edit made in between
+        if not self._dirty and self._file_stamp() != self._stamp:
+            logging.info(f"{self.path} changed on disk, reloading")
+            self._reload()
+
+    def _entry(self, ifname: str) -> dict:
+        entry = self._data.get(ifname) or {}
+        if 'profiles' not in entry and entry.get('ssid'):
+            entry['profiles'] = {entry['ssid']: entry.get('psk', '')}
+        return entry
+
+    def get(self, ifname: str, ssid: str = None) -> tuple[str, str]:
+        """(ssid, psk) of the given profile, or of the last one used on ifname."""
+        with self._lock:
+            self._check_external_edit()
+            entry = self._entry(ifname)
+            if ssid is None:
+                return entry.get('ssid', ''), entry.get('psk', '')
+            psk = entry.get('profiles', {}).get(ssid)
+            return (ssid, psk) if psk is not None else ('', '')
+
+    def profiles(self, ifname: str) -> dict[str, str]:
+        with self._lock:
+            self._check_external_edit()
+            return dict(self._entry(ifname).get('profiles', {}))
+
+    def put(self, ifname: str, ssid: str, psk: str):
+        """Store a profile and make it the last used one for ifname."""
+        with self._lock:
+            self._check_external_edit()
+            entry = self._entry(ifname)
+            entry.setdefault('profiles', {})[ssid] = psk
+            entry['ssid'], entry['psk'] = ssid, psk
+            self._data[ifname] = entry
+            self._schedule_flush()
+
+    def remove(self, ifname: str, ssid: str):
+        with self._lock:
+            self._check_external_edit()
+            entry = self._entry(ifname)
+            entry.get('profiles', {}).pop(ssid, None)
+            if entry.get('ssid') == ssid:
+                entry['ssid'], entry['psk'] = next(iter(entry.get('profiles', {}).items()), ('', ''))
+            self._data[ifname] = entry
+            self._schedule_flush()
+
+    def set_disabled(self, ifname: str, disabled: bool):
+        """Record that the user took ifname down (or brought it back up), so supervision leaves it alone."""
+        with self._lock:
+            self._check_external_edit()
+            entry = self._entry(ifname)
+            if bool(entry.get('disabled')) == disabled:
+                return
+            if disabled:
+                entry['disabled'] = True
+            else:
+                entry.pop('disabled', None)
+            self._data[ifname] = entry
+            self._schedule_flush()
+
+    def is_disabled(self, ifname: str) -> bool:
+        with self._lock:
+            self._check_external_edit()
+            return bool(self._entry(ifname).get('disabled'))
+
+    def _schedule_flush(self):
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write pending changes now: temp file + fsync + rename."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            directory = os.path.dirname(self.path)
+            try:
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(prefix='.creds-', dir=directory)
+                try:
+                    with os.fdopen(fd, 'w') as f:
+                        json.dump(self._data, f, indent=4)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.chmod(tmp, 0o600)
+                    os.replace(tmp, self.path)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+                dir_fd = os.open(directory, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+            except Exception as e:
+                logging.error(f"Failed to save credentials to {self.path}: {e}")
+                return
+            self._dirty = False
+            self._stamp = self._file_stamp()
+            logging.debug(f"Flushed credentials to {self.path}")
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store(path: str) -> CredentialStore:
+    """One store per file, shared by every manager using it."""
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = CredentialStore(path)
+        return _stores[path]
@@ -0,0 +1,214 @@
+import ipaddress
+import logging
+import os
+import re
+import tempfile
+import threading
+from utils.cmd import run_cmd
+
+PERSIST_FILE = '/etc/iptables/rules.v4'
+IP_FORWARD = '/proc/sys/net/ipv4/ip_forward'
+
+FWD_CHAIN = 'MINICP-FWD'
+NAT_CHAIN = 'MINICP-NAT'
+ACCT_CHAIN = 'MINICP-ACCT-{ifname}'
+# table -> (built-in chain, our chain hooked into it)
+HOOKS = {'filter': ('FORWARD', FWD_CHAIN), 'nat': ('POSTROUTING', NAT_CHAIN)}
+
+_COUNTERS_RE = re.compile(r'^\[(\d+):(\d+)\]\s+')
+_IFNAME_RE = re.compile(r'[A-Za-z0-9_.-]{1,15}')
+
+
+def parse_save(out: str) -> dict[str, dict[str, list[tuple[str, str]]]]:
+    """`iptables-save -c` output as {table: {chain: [(counters, rule spec), ...]}}."""
+    tables, table = {}, None
+    for line in out.splitlines():
+        if line.startswith('*'):
+            table = tables.setdefault(line[1:].strip(), {})
+        elif table is None:
+            continue
+        elif line.startswith(':'):
+            table.setdefault(line[1:].split()[0], [])
+        else:
+            counters = '0:0'
+            m = _COUNTERS_RE.match(line)
+            if m:
+                counters, line = f"{m.group(1)}:{m.group(2)}", line[m.end():]
+            parts = line.split(None, 2)
+            if len(parts) >= 2 and parts[0] == '-A':
+                table.setdefault(parts[1], []).append((counters, parts[2] if len(parts) > 2 else ''))
+    return tables
+
+
+def legacy_rules(ap: str, uplink: str) -> dict[str, set[str]]:
+    """Rules the old enable_internet_sharing appended to the built-in chains, per table."""
+    return {
+        'filter': {
+            f'-i {ap} -o {uplink} -j ACCEPT',
+            f'-i {uplink} -o {ap} -m state --state RELATED,ESTABLISHED -j ACCEPT',
+            f'-j {ACCT_CHAIN.format(ifname=ap)}',
+        },
+        'nat': {f'-o {uplink} -j MASQUERADE'},
+    }
+
+
+def check_ifname(ifname: str) -> str:
+    """ifname if it is a valid interface name; anything else could inject lines into the restore script."""
+    if not isinstance(ifname, str) or not _IFNAME_RE.fullmatch(ifname):
+        raise ValueError(f"Invalid interface name {ifname!r}")
+    return ifname
+
+
+class Firewall:
+    """
+    NAT/forwarding and traffic accounting rules of every AP, kept in own
+    chains (MINICP-FWD, MINICP-NAT, MINICP-ACCT-<ifname>) hooked once into
+    FORWARD and POSTROUTING.
+
+    apply() compares the desired rule set with one `iptables-save -c` and,
+    only if they differ, rewrites our chains, fixes the hooks and deletes
+    duplicates and rules left by older versions in a single atomic
+    `iptables-restore --noflush` transaction. Accounting counters are
+    carried over, so rewriting never resets them. The rules are saved for
+    netfilter-persistent only when the shares changed, not on every client
+    joining or leaving, to spare the SD card.
+    """
+    def __init__(self, persist_path: str = PERSIST_FILE, ip_forward_path: str = IP_FORWARD):
+        self.persist_path = persist_path
+        self.ip_forward_path = ip_forward_path
+        self._shares = {}      # AP ifname -> uplink ifname
+        self._accounting = {}  # AP ifname -> client IPs
+        self._retired = set()  # (ap, uplink) pairs whose leftovers still need deleting
+        self._persisted = None  # shares as last saved to persist_path
+        self._lock = threading.RLock()
+
+    def share(self, ap: str, uplink: str):
+        check_ifname(ap), check_ifname(uplink)
+        with self._lock:
+            old = self._shares.get(ap)
+            if old and old != uplink:
+                self._retired.add((ap, old))
+            self._shares[ap] = uplink
+
+    def unshare(self, ap: str):
+        with self._lock:
+            uplink = self._shares.pop(ap, None)
+            if uplink:
+                self._retired.add((ap, uplink))
+
+    def set_accounting(self, ap: str, ips):
+        check_ifname(ap)
+        ips = {str(ipaddress.IPv4Address(ip)) for ip in ips}
+        with self._lock:
+            self._accounting[ap] = sorted(ips)
+
+    def clear_accounting(self, ap: str):
+        with self._lock:
+            self._accounting.pop(ap, None)
+
+    def desired(self) -> dict[str, dict[str, list[str]]]:
+        """{table: {chain: [rule spec, ...]}} of our chains; a table without rules needs no chains."""
+        with self._lock:
+            fwd, nat, acct = [], [], {}
+            for ap, ips in self._accounting.items():
+                chain = ACCT_CHAIN.format(ifname=ap)
+                acct[chain] = [f'-s {ip}/32' for ip in ips] + [f'-d {ip}/32' for ip in ips]
+                fwd.append(f'-j {chain}')
+            for ap, uplink in sorted(self._shares.items()):
+                fwd.append(f'-i {ap} -o {uplink} -j ACCEPT')
+                fwd.append(f'-i {uplink} -o {ap} -m state --state RELATED,ESTABLISHED -j ACCEPT')
+                masquerade = f'-o {uplink} -j MASQUERADE'
+                if masquerade not in nat:
+                    nat.append(masquerade)
+        return {
+            'filter': {FWD_CHAIN: fwd, **acct} if fwd else {},
+            'nat': {NAT_CHAIN: nat} if nat else {},
+        }
+
+    def plan(self, current: dict) -> str:
+        """iptables-restore script turning `current` (see parse_save) into the desired state; '' if nothing to do."""
+        with self._lock:
+            desired = self.desired()
+            pairs = self._retired | set(self._shares.items())
+        script = []
+        for table, (builtin, hook) in HOOKS.items():
+            have = current.get(table, {})
+            want = desired[table]
+            ours = {chain for chain in have if chain.startswith('MINICP-')}
+            stale = ours - want.keys()
+            legacy = set().union(*(legacy_rules(ap, uplink)[table] for ap, uplink in pairs))
+            if table == 'filter':
+                legacy |= {f'-j {chain}' for chain in ours if chain.startswith('MINICP-ACCT-')}
+            builtin_rules = [spec for _, spec in have.get(builtin, [])]
+            jumps = builtin_rules.count(f'-j {hook}')
+            leftovers = [spec for spec in builtin_rules if spec in legacy]
+            same = all([spec for _, spec in have.get(chain, [])] == specs for chain, specs in want.items()) \
+                and want.keys() <= have.keys()
+            if same and not stale and not leftovers and jumps == (1 if want else 0):
+                continue
+
+            lines = [f'*{table}']
+            lines += [f':{chain} - [0:0]' for chain in sorted(want.keys() | stale)]  # create or flush
+            if want and not jumps:
+                lines.append(f'-I {builtin} 1 -j {hook}')
+            lines += [f'-D {builtin} -j {hook}'] * (jumps - (1 if want else 0))
+            lines += [f'-D {builtin} {spec}' for spec in leftovers]
+            for chain, specs in want.items():
+                counters = {}
+                for c, spec in have.get(chain, []):
+                    counters.setdefault(spec, []).append(c)
+                for spec in specs:
+                    c = counters.get(spec, ['0:0'])
+                    lines.append(f'[{c.pop(0) if len(c) > 1 else c[0]}] -A {chain} {spec}')
+            lines += [f'-X {chain}' for chain in sorted(stale)]
+            lines.append('COMMIT')
+            script += lines
+        return '\n'.join(script) + '\n' if script else ''
+
+    def apply(self) -> tuple[bool, str]:
+        """Bring the kernel rules to the desired state in one transaction."""
+        with self._lock:
+            script = self.plan(parse_save(run_cmd(['iptables-save', '-c'], timeout=10)))
+            if not script:
+                logging.debug("Firewall rules already up to date")
+                self._retired.clear()
+                return True, ""
+            out = run_cmd(['iptables-restore', '--noflush', '--counters'], timeout=10, input=script)
+            if out.strip():
+                logging.error(f"iptables-restore failed: {out}\n{script}")
+                return False, out
+            self._retired.clear()
+            logging.info(f"Applied firewall rules:\n{script}")
+            if self._shares != self._persisted:
+                self._persist()
+                self._persisted = dict(self._shares)
+            return True, ""
+
+    def enable_ip_forward(self):
+        enable_ip_forward(self.ip_forward_path)
+
+    def _persist(self):
+        """Save the full rule set for netfilter-persistent, if it is installed."""
+        directory = os.path.dirname(self.persist_path)
+        if not os.path.isdir(directory):
+            return
+        rules = run_cmd(['iptables-save'], timeout=10)
+        try:
+            fd, tmp = tempfile.mkstemp(prefix='.rules-', dir=directory)
+            with os.fdopen(fd, 'w') as f:
+                f.write(rules)
+            os.replace(tmp, self.persist_path)
+        except OSError as e:
+            logging.error(f"Failed to save firewall rules to {self.persist_path}: {e}")
+
+
+def enable_ip_forward(path: str = IP_FORWARD):
+    """Turn on IPv4 forwarding via procfs, without forking sysctl when it is already on."""
+    try:
+        with open(path) as f:
+            if f.read().strip() == '1':
+                return
+        with open(path, 'w') as f:
+            f.write('1\n')
+    except OSError:
+        run_cmd(['sysctl', '-w', 'net.ipv4.ip_forward=1'])
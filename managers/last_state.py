@@ -0,0 +1,61 @@
+import json
+import logging
+import os
+import tempfile
+import time
+
+LAST_STATE_FILE = os.path.join(os.path.expanduser("~"), ".config/minicp/last_state.json")
+
+
+class LastStateStore:
+    """
+    Last known interface roles/SSIDs (AP state included) and paired
+    Bluetooth devices, persisted so the Overview can paint instantly at
+    boot, before NetworkManager and bluez answer. The file is only
+    rewritten when the state actually changed, to spare the SD card.
+
+        {'saved_at': epoch, 'wifi': {ifname: {'role', 'ssid'}},
+         'bluetooth': {mac: [name, connected]}}
+    """
+    def __init__(self, path: str = LAST_STATE_FILE):
+        self.path = path
+        self._written = None
+
+    def load(self) -> dict | None:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable {self.path}: {e}")
+            return None
+        if not isinstance(data, dict):
+            return None
+        self._written = {'wifi': data.get('wifi', {}), 'bluetooth': data.get('bluetooth', {})}
+        return {
+            'saved_at': data.get('saved_at', 0),
+            'wifi': data.get('wifi', {}),
+            'bluetooth': {mac: tuple(v) for mac, v in data.get('bluetooth', {}).items()},
+        }
+
+    def save(self, wifi: dict, bluetooth: dict):
+        """wifi as from DeviceSnapshot.status(), bluetooth as {mac: (name, connected)}."""
+        state = {'wifi': wifi, 'bluetooth': {mac: list(v) for mac, v in bluetooth.items()}}
+        if state == self._written:
+            return
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix='.last_state-', dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({'saved_at': time.time(), **state}, f)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except Exception as e:
+            logging.error(f"Failed to save last state to {self.path}: {e}")
+            return
+        self._written = state
@@ -568,32 +568,35 @@ class MainApp:
         nb.add(self.bluetooth_tab, text="Bluetooth")
 
     def get_device_status(self):
-        devices = []
-        out = subprocess.check_output(['nmcli', '-t', '-f', 'DEVICE,TYPE', 'device']).decode().splitlines()
+        # One call for every device, one for the settings of all active Wi-Fi connections
+        out = subprocess.check_output(['nmcli', '-t', '-f', 'DEVICE,TYPE,STATE,CON-UUID', 'device']).decode().splitlines()
+        devices = {}
         for line in out:
-            device, typ = line.split(':')
-            if typ == 'wifi':
-                devices.append(device)
+            parts = line.split(':')
+            if len(parts) >= 4 and parts[1] == 'wifi':
+                devices[parts[0]] = (parts[2], parts[3])
+
+        uuids = [uuid for state, uuid in devices.values() if state == 'connected' and uuid not in ('', '--')]
+        settings = {}
+        if uuids:
+            cmd = ['nmcli', '-t', '-f', 'connection.uuid,802-11-wireless.mode,802-11-wireless.ssid', 'con', 'show']
+            for uuid in uuids:
+                cmd += ['uuid', uuid]
+            uuid = None
+            for line in subprocess.check_output(cmd).decode().splitlines():
+                key, _, value = line.partition(':')
+                if key == 'connection.uuid':
+                    uuid = value
+                    settings[uuid] = {}
+                elif uuid:
+                    settings[uuid][key] = value
 
         status = {}
-        for device in devices:
-            out = subprocess.check_output(['nmcli', '-t', '-f', 'GENERAL.STATE,GENERAL.CONNECTION', 'device', 'show', device]).decode().splitlines()
-            state = connection = ''
-            for line in out:
-                if line.startswith('GENERAL.STATE:'):
-                    state = line.split(':')[1].strip()
-                elif line.startswith('GENERAL.CONNECTION:'):
-                    connection = line.split(':')[1].strip()
-
-            if state == '100 (connected)' and connection:
-                details = subprocess.check_output(['nmcli', '-f', '802-11-wireless.mode,802-11-wireless.ssid', 'con', 'show', connection]).decode().splitlines()
-                mode = ssid = ''
-                for line in details:
-                    if line.startswith('802-11-wireless.mode:'):
-                        mode = line.split(':')[1].strip()
-                    elif line.startswith('802-11-wireless.ssid:'):
-                        ssid = line.split(':')[1].strip()
-                status[device] = {'role': 'client' if mode == 'infrastructure' else 'ap', 'ssid': ssid}
+        for device, (state, uuid) in devices.items():
+            if uuid in settings:
+                mode = settings[uuid].get('802-11-wireless.mode', '')
+                ssid = settings[uuid].get('802-11-wireless.ssid', '')
+                status[device] = {'role': 'ap' if 'ap' in mode else 'client', 'ssid': ssid}  # as DeviceState.role
             else:
                 status[device] = {'role': 'idle'}
         return status
@@ -0,0 +1,291 @@
+import logging
+import time
+from managers.nm_state import DeviceState, DeviceSnapshot, freq_to_channel
+
+try:
+    import dbus
+except ImportError:  # python3-dbus is optional, nmcli remains the fallback
+    dbus = None
+
+NM = 'org.freedesktop.NetworkManager'
+NM_PATH = '/org/freedesktop/NetworkManager'
+SETTINGS_PATH = '/org/freedesktop/NetworkManager/Settings'
+PROPS = 'org.freedesktop.DBus.Properties'
+DEVICE = NM + '.Device'
+WIRELESS = NM + '.Device.Wireless'
+ACCESS_POINT = NM + '.AccessPoint'
+ACTIVE = NM + '.Connection.Active'
+SETTINGS = NM + '.Settings'
+CONNECTION = NM + '.Settings.Connection'
+
+DEVICE_TYPES = {1: 'ethernet', 2: 'wifi', 5: 'bt', 14: 'generic', 30: 'wifi-p2p', 32: 'loopback'}
+DEVICE_STATES = {
+    10: 'unmanaged', 20: 'unavailable', 30: 'disconnected',
+    40: 'connecting (prepare)', 50: 'connecting (configuring)',
+    60: 'connecting (need authentication)', 70: 'connecting (getting IP configuration)',
+    80: 'connecting (checking IP connectivity)', 90: 'connecting (starting secondary connections)',
+    100: 'connected', 110: 'deactivating', 120: 'connection failed',
+}
+ACTIVE_ACTIVATED, ACTIVE_DEACTIVATED = 2, 4
+NO_OBJECT = '/'
+
+
+class NMDBusBackend:
+    """
+    Talks to org.freedesktop.NetworkManager directly instead of scraping nmcli.
+    Pass a bus (e.g. dbus.SessionBus() with python-dbusmock's networkmanager
+    template) to run against something other than the system daemon.
+    """
+    def __init__(self, bus=None):
+        if dbus is None:
+            raise RuntimeError("python3-dbus is not installed")
+        self.bus = bus or dbus.SystemBus()
+        self.nm = dbus.Interface(self.bus.get_object(NM, NM_PATH), NM)
+        self.settings = dbus.Interface(self.bus.get_object(NM, SETTINGS_PATH), SETTINGS)
+
+    def _props(self, path: str, iface: str) -> dict:
+        return self.bus.get_object(NM, path).GetAll(iface, dbus_interface=PROPS)
+
+    def _prop(self, path: str, iface: str, name: str):
+        return self.bus.get_object(NM, path).Get(iface, name, dbus_interface=PROPS)
+
+    def _device_path(self, ifname: str) -> str:
+        return self.nm.GetDeviceByIpIface(ifname)
+
+    def _connection_settings(self, path: str) -> dict:
+        return self.bus.get_object(NM, path).GetSettings(dbus_interface=CONNECTION)
+
+    def _find_connections(self, conn_id: str) -> list[str]:
+        return [
+            path for path in self.settings.ListConnections()
+            if self._connection_settings(path)['connection']['id'] == conn_id
+        ]
+
+    # queries
+
+    def snapshot(self) -> DeviceSnapshot:
+        devices = []
+        for path in self.nm.GetDevices():
+            props = self._props(path, DEVICE)
+            typ = DEVICE_TYPES.get(int(props['DeviceType']), 'unknown')
+            state = DEVICE_STATES.get(int(props['State']), 'unknown')
+            conn = mode = ssid = ''
+            active = props.get('ActiveConnection', NO_OBJECT)
+            if active != NO_OBJECT:
+                active_props = self._props(active, ACTIVE)
+                conn = str(active_props['Id'])
+                if typ == 'wifi':
+                    wireless = self._connection_settings(active_props['Connection']).get('802-11-wireless', {})
+                    mode = str(wireless.get('mode', ''))
+                    ssid = bytes(wireless.get('ssid', b'')).decode(errors='replace')
+            devices.append(DeviceState(str(props['Interface']), typ, state, conn, mode, ssid))
+        return DeviceSnapshot(tuple(devices))
+
+    def list_adapters(self) -> list[str]:
+        return [d.ifname for d in self.snapshot().wifi()]
+
+    def active_connection(self, ifname: str) -> str:
+        active = self._prop(self._device_path(ifname), DEVICE, 'ActiveConnection')
+        if active == NO_OBJECT:
+            return ""
+        return str(self._prop(active, ACTIVE, 'Id'))
+
+    def scan(self, ifname: str, rescan: bool = True, timeout: float = 10) -> list[dict]:
+        dev = self._device_path(ifname)
+        wireless = dbus.Interface(self.bus.get_object(NM, dev), WIRELESS)
+        if rescan:
+            before = self._prop(dev, WIRELESS, 'LastScan')
+            try:
+                wireless.RequestScan({})
+                deadline = time.monotonic() + timeout
+                while time.monotonic() < deadline and self._prop(dev, WIRELESS, 'LastScan') == before:
+                    time.sleep(0.2)
+            except dbus.DBusException as e:
+                # NM refuses scans while one is already running; use what it has
+                logging.debug(f"RequestScan on {ifname} refused: {e}")
+        networks = []
+        for ap in wireless.GetAllAccessPoints():
+            props = self._props(ap, ACCESS_POINT)
+            freq = int(props['Frequency'])
+            networks.append({
+                'ssid': bytes(props['Ssid']).decode(errors='replace'),
+                'bssid': str(props['HwAddress']),
+                'signal': int(props['Strength']),
+                'security': _security(props),
+                'channel': freq_to_channel(freq),
+                'freq': freq,
+            })
+        return networks
+
+    # mutations
+
+    def delete_connection(self, conn_id: str):
+        for path in self._find_connections(conn_id):
+            self.bus.get_object(NM, path).Delete(dbus_interface=CONNECTION)
+
+    def deactivate(self, conn_id: str) -> bool:
+        for active in self._prop(NM_PATH, NM, 'ActiveConnections'):
+            if self._prop(active, ACTIVE, 'Id') == conn_id:
+                self.nm.DeactivateConnection(active)
+                return True
+        return False
+
+    def replace_and_activate(self, ifname: str, settings: dict, timeout: float = 15) -> tuple[bool, str]:
+        """Drop any profile with the same id, then add and activate the new one."""
+        self.delete_connection(settings['connection']['id'])
+        return self.add_and_activate(ifname, settings, timeout)
+
+    def add_and_activate(self, ifname: str, settings: dict, timeout: float = 15) -> tuple[bool, str]:
+        """Add a connection profile, activate it on ifname and wait for the outcome."""
+        try:
+            _, active = self.nm.AddAndActivateConnection(settings, self._device_path(ifname), NO_OBJECT)
+        except dbus.DBusException as e:
+            return False, f"Error: {e.get_dbus_message()}"
+        return self._wait_activated(active, timeout)
+
+    def activate_profile(self, ifname: str, settings: dict, bssid: str = None, timeout: float = 15) -> tuple[bool, str]:
+        """
+        Reuse the profile with the same id: update only the settings that
+        differ, then activate it, on the given BSSID if it is in range.
+        Adds the profile when there is none.
+        """
+        paths = self._find_connections(settings['connection']['id'])
+        if not paths:
+            return self.add_and_activate(ifname, settings, timeout)
+        conn = self.bus.get_object(NM, paths[0])
+        current = conn.GetSettings(dbus_interface=CONNECTION)
+        if '802-11-wireless-security' in settings:
+            try:
+                secrets = conn.GetSecrets('802-11-wireless-security', dbus_interface=CONNECTION)
+                current.setdefault('802-11-wireless-security', {}).update(secrets.get('802-11-wireless-security', {}))
+            except dbus.DBusException as e:
+                logging.debug(f"Cannot read secrets of {paths[0]}: {e}")
+        changed = False
+        for section, values in settings.items():
+            for key, value in values.items():
+                if not _same_setting(current.get(section, {}).get(key), value):
+                    current.setdefault(section, {})[key] = value
+                    changed = True
+        if changed:
+            conn.Update(current, dbus_interface=CONNECTION)
+        device = self._device_path(ifname)
+        ap = self._access_point(device, bssid) if bssid else NO_OBJECT
+        try:
+            active = self.nm.ActivateConnection(paths[0], device, ap)
+        except dbus.DBusException as e:
+            return False, f"Error: {e.get_dbus_message()}"
+        ok, msg = self._wait_activated(active, timeout)
+        if not ok and ap != NO_OBJECT:
+            logging.info(f"Activation pinned to {bssid} failed, retrying on any BSSID")
+            try:
+                active = self.nm.ActivateConnection(paths[0], device, NO_OBJECT)
+            except dbus.DBusException as e:
+                return False, f"Error: {e.get_dbus_message()}"
+            return self._wait_activated(active, timeout)
+        return ok, msg
+
+    def _access_point(self, device: str, bssid: str) -> str:
+        for ap in self._prop(device, WIRELESS, 'AccessPoints'):
+            if str(self._prop(ap, ACCESS_POINT, 'HwAddress')).lower() == bssid.lower():
+                return ap
+        return NO_OBJECT
+
+    def active_access_point(self, ifname: str) -> tuple[str, int] | None:
+        """(BSSID, frequency in MHz) the interface is associated with."""
+        ap = self._prop(self._device_path(ifname), WIRELESS, 'ActiveAccessPoint')
+        if ap == NO_OBJECT:
+            return None
+        props = self._props(ap, ACCESS_POINT)
+        return str(props['HwAddress']), int(props['Frequency'])
+
+    def _wait_activated(self, active: str, timeout: float) -> tuple[bool, str]:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                state = int(self._prop(active, ACTIVE, 'State'))
+            except dbus.DBusException:
+                return False, "Error: connection activation failed"
+            if state == ACTIVE_ACTIVATED:
+                return True, ""
+            if state == ACTIVE_DEACTIVATED:
+                return False, "Error: connection activation failed"
+            time.sleep(0.1)
+        return False, "Error: timeout waiting for activation"
+
+
+def _same_setting(current, wanted) -> bool:
+    """Compare a GetSettings value with a wanted one; byte strings such as the SSID come back as arrays of bytes."""
+    if isinstance(wanted, (bytes, bytearray)) and isinstance(current, (list, tuple)):
+        return bytes(current) == bytes(wanted)
+    return current == wanted
+
+
+def _security(ap: dict) -> str:
+    flags, wpa, rsn = int(ap.get('Flags', 0)), int(ap.get('WpaFlags', 0)), int(ap.get('RsnFlags', 0))
+    parts = []
+    if wpa:
+        parts.append('WPA1')
+    if rsn:
+        parts.append('WPA3' if rsn & 0x400 else 'WPA2')  # NM_802_11_AP_SEC_KEY_MGMT_SAE
+    if not parts and flags & 0x1:  # privacy bit without WPA: WEP
+        parts.append('WEP')
+    return ' '.join(parts)
+
+
+def wifi_settings(ifname: str, conn_id: str, ssid: str, psk: str, mode: str = 'infrastructure', **wireless) -> dict:
+    """Build the settings dict nmcli would create for a WPA-PSK Wi-Fi profile."""
+    settings = {
+        'connection': {'id': conn_id, 'type': '802-11-wireless', 'interface-name': ifname},
+        '802-11-wireless': {'ssid': dbus.ByteArray(ssid.encode()), 'mode': mode},
+        '802-11-wireless-security': {'key-mgmt': 'wpa-psk', 'psk': psk},
+        'ipv4': {'method': 'auto'},
+        'ipv6': {'method': 'auto'},
+    }
+    settings['802-11-wireless'].update(wireless)
+    return settings
+
+
+def ap_settings(ifname: str, conn_id: str, ssid: str, psk: str, band: str, channel: int,
+                address: str = '192.168.4.1', prefix: int = 24) -> dict:
+    """Settings for a shared-mode hotspot profile, matching RouterManager's nmcli one."""
+    settings = wifi_settings(ifname, conn_id, ssid, psk, mode='ap', band=band, channel=dbus.UInt32(channel))
+    settings['connection']['autoconnect'] = True
+    settings['ipv4'] = {
+        'method': 'shared',
+        'address-data': dbus.Array(
+            [dbus.Dictionary({'address': address, 'prefix': dbus.UInt32(prefix)}, signature='sv')],
+            signature='a{sv}'
+        ),
+    }
+    return settings
+
+
+def try_call(backend, method: str, *args):
+    """
+    Call a backend method, returning (True, result). Returns (False, None)
+    when there is no backend or the call failed, so the caller can fall
+    back to nmcli.
+    """
+    if backend is None:
+        return False, None
+    try:
+        return True, getattr(backend, method)(*args)
+    except Exception as e:
+        logging.warning(f"D-Bus {method} failed, falling back to nmcli: {e}")
+        return False, None
+
+
+def open_backend(backend: str, bus=None):
+    """
+    Resolve a backend name: 'nmcli' -> None, 'dbus' -> NMDBusBackend (or raise),
+    'auto' -> NMDBusBackend when NetworkManager is reachable, else None.
+    """
+    if backend == 'nmcli':
+        return None
+    try:
+        return NMDBusBackend(bus)
+    except Exception as e:
+        if backend == 'dbus':
+            raise
+        logging.info(f"NetworkManager D-Bus backend unavailable, using nmcli: {e}")
+        return None
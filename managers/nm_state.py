@@ -0,0 +1,272 @@
+import logging
+import re
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from utils.cmd import run_cmd
+
+# "wlan0: connected", "wlan0: using connection 'Home'", "wlan1: device removed"
+EVENT_RE = re.compile(r"^(\S+): (.+)$")
+USING_RE = re.compile(r"^using connection '(.*)'$")
+
+
+def split_terse(line: str) -> list[str]:
+    """Split an `nmcli -t` line on ':' honouring backslash escapes."""
+    fields, cur, esc = [], [], False
+    for ch in line:
+        if esc:
+            cur.append(ch)
+            esc = False
+        elif ch == '\\':
+            esc = True
+        elif ch == ':':
+            fields.append(''.join(cur))
+            cur = []
+        else:
+            cur.append(ch)
+    fields.append(''.join(cur))
+    return fields
+
+
+@dataclass(frozen=True)
+class DeviceState:
+    ifname: str
+    type: str
+    state: str
+    connection: str = ''
+    mode: str = ''  # 802-11-wireless.mode of the active connection
+    ssid: str = ''
+
+    @property
+    def connected(self) -> bool:
+        return self.state.startswith('connected')
+
+    @property
+    def role(self) -> str:
+        if not self.connection:
+            return 'idle'
+        # Mode is read after the connection appears (and is empty for e.g. ethernet): only 'ap' means AP
+        return 'ap' if 'ap' in self.mode else 'client'
+
+
+@dataclass(frozen=True)
+class DeviceSnapshot:
+    """Immutable view of every device at one point in time."""
+    devices: tuple[DeviceState, ...]
+    taken_at: float = field(default_factory=time.time)
+    _index: MappingProxyType = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, '_index', MappingProxyType({d.ifname: d for d in self.devices}))
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    def __len__(self):
+        return len(self.devices)
+
+    def get(self, ifname: str) -> DeviceState | None:
+        return self._index.get(ifname)
+
+    def wifi(self) -> list[DeviceState]:
+        return [d for d in self.devices if d.type == 'wifi']
+
+    def as_dict(self) -> dict[str, DeviceState]:
+        return dict(self._index)
+
+    def status(self) -> dict[str, dict]:
+        """{ifname: {'role', 'ssid'}} for every Wi-Fi device."""
+        return {d.ifname: {'role': d.role, 'ssid': d.ssid} for d in self.wifi()}
+
+
+def freq_to_channel(freq: int) -> int:
+    """Wi-Fi channel number of a centre frequency in MHz (2.4, 5 and 6 GHz bands), 0 if unknown."""
+    if freq == 2484:
+        return 14
+    if 2412 <= freq < 2484:
+        return (freq - 2407) // 5
+    if 5955 <= freq <= 7115:
+        return (freq - 5950) // 5
+    if 5000 <= freq < 5925:
+        return (freq - 5000) // 5
+    return 0
+
+
+def _parse_wifi_settings(out: str) -> dict[str, tuple[str, str]]:
+    """Parse `con show uuid A uuid B ...` into {uuid: (mode, ssid)}."""
+    settings, uuid, mode, ssid = {}, None, '', ''
+    for line in out.splitlines():
+        key, _, value = line.partition(':')
+        if key == 'connection.uuid':
+            if uuid:
+                settings[uuid] = (mode, ssid)
+            uuid, mode, ssid = value, '', ''
+        elif key == '802-11-wireless.mode':
+            mode = value
+        elif key == '802-11-wireless.ssid':
+            ssid = value
+    if uuid:
+        settings[uuid] = (mode, ssid)
+    return settings
+
+
+def load_snapshot() -> DeviceSnapshot:
+    """
+    Type, state, connection, mode and SSID of every interface in at most two
+    nmcli calls, however many adapters and connections there are.
+    """
+    out = run_cmd(['nmcli', '-t', '-f', 'DEVICE,TYPE,STATE,CON-UUID,CONNECTION', 'device'], timeout=5)
+    rows = []
+    for line in out.splitlines():
+        parts = split_terse(line)
+        if len(parts) < 5:
+            continue
+        ifname, typ, state, uuid, conn = parts[:5]
+        if conn == '--':
+            uuid = conn = ''
+        rows.append((ifname, typ, state, uuid, conn))
+
+    uuids = [uuid for _, typ, _, uuid, _ in rows if typ == 'wifi' and uuid]
+    settings = {}
+    if uuids:
+        cmd = ['nmcli', '-t', '-f', 'connection.uuid,802-11-wireless.mode,802-11-wireless.ssid', 'con', 'show']
+        for uuid in uuids:
+            cmd += ['uuid', uuid]
+        settings = _parse_wifi_settings(run_cmd(cmd, timeout=5))
+
+    return DeviceSnapshot(tuple(
+        DeviceState(ifname, typ, state, conn, *settings.get(uuid, ('', '')))
+        for ifname, typ, state, uuid, conn in rows
+    ))
+
+
+def load_devices() -> dict[str, DeviceState]:
+    return load_snapshot().as_dict()
+
+
+class NMStateCache:
+    """
+    In-memory model of NetworkManager devices, kept current by a single
+    long-lived `nmcli monitor` reader. Queries never fork; a full resync
+    runs at start-up, whenever the monitor stream drops and shortly after
+    bursts of device events (to pick up mode/SSID of new connections).
+    """
+    def __init__(self, loader=load_devices, settle: float = 0.3):
+        self._loader = loader
+        self._settle = settle
+        self._devices = {}
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._resync_timer = None
+        self._proc = None
+        self._stopped = threading.Event()
+        self.ready = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="nmcli-monitor", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._proc:
+            self._proc.kill()
+
+    def get(self, ifname: str) -> DeviceState | None:
+        with self._lock:
+            return self._devices.get(ifname)
+
+    def devices(self) -> dict[str, DeviceState]:
+        with self._lock:
+            return dict(self._devices)
+
+    def snapshot(self) -> DeviceSnapshot:
+        with self._lock:
+            return DeviceSnapshot(tuple(self._devices.values()))
+
+    def subscribe(self, callback):
+        """callback(ifname, old, new) on every change; old/new may be None. Returns an unsubscribe function."""
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def resync(self):
+        try:
+            fresh = self._loader()
+        except Exception as e:
+            logging.error(f"NM state resync failed: {e}")
+            return
+        with self._lock:
+            old = self._devices
+            self._devices = dict(fresh)
+        self.ready.set()
+        for ifname in old.keys() | fresh.keys():
+            if old.get(ifname) != fresh.get(ifname):
+                self._notify(ifname, old.get(ifname), fresh.get(ifname))
+
+    def _schedule_resync(self):
+        if self._resync_timer:
+            self._resync_timer.cancel()
+        self._resync_timer = threading.Timer(self._settle, self.resync)
+        self._resync_timer.daemon = True
+        self._resync_timer.start()
+
+    def _notify(self, ifname, old, new):
+        for cb in list(self._subscribers):
+            try:
+                cb(ifname, old, new)
+            except Exception:
+                logging.exception("NM state subscriber failed")
+
+    def _update(self, ifname: str, **changes):
+        with self._lock:
+            old = self._devices.get(ifname)
+            if old is None:
+                return
+            new = replace(old, **changes)
+            self._devices[ifname] = new
+        if new != old:
+            self._notify(ifname, old, new)
+
+    def _handle(self, line: str):
+        m = EVENT_RE.match(line.strip())
+        if not m:
+            return
+        ifname, event = m.groups()
+        if event in ('device created', 'device removed'):
+            self._schedule_resync()
+            return
+        if self.get(ifname) is None:
+            # connection profile events, global state lines, ...
+            return
+        using = USING_RE.match(event)
+        if using:
+            self._update(ifname, connection=using.group(1))
+        elif event.startswith('disconnected') or event.startswith('unavailable'):
+            self._update(ifname, state=event, connection='', mode='', ssid='')
+        else:
+            self._update(ifname, state=event)
+        if event.startswith('connected') or using:
+            self._schedule_resync()
+
+    def _run(self):
+        backoff = 1
+        while not self._stopped.is_set():
+            self.resync()
+            started = time.monotonic()
+            try:
+                self._proc = subprocess.Popen(
+                    ['nmcli', 'monitor'], stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL, text=True
+                )
+                for line in self._proc.stdout:
+                    self._handle(line)
+                self._proc.wait()
+            except OSError as e:
+                logging.error(f"nmcli monitor failed to start: {e}")
+            if self._stopped.is_set():
+                break
+            # stream dropped: back off if it keeps dying right away
+            backoff = 1 if time.monotonic() - started > 30 else min(backoff * 2, 60)
+            logging.warning(f"nmcli monitor exited, resyncing in {backoff}s")
+            self._stopped.wait(backoff)
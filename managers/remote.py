@@ -0,0 +1,114 @@
+import logging
+import threading
+from managers.nm_state import DeviceSnapshot, DeviceState
+from utils.rpc import RpcClient, RpcError, RemoteProxy, SOCKET_PATH
+
+# What a call through a proxy raises when minicpd is gone, too slow or refuses it
+DAEMON_ERRORS = (ConnectionError, TimeoutError, RpcError)
+
+
+def connect_daemon(path: str = SOCKET_PATH) -> RpcClient | None:
+    """A client connected to minicpd, or None if the daemon is not running."""
+    try:
+        return RpcClient(path).connect()
+    except OSError as e:
+        logging.info(f"minicpd not reachable at {path} ({e}), running the managers in-process")
+        return None
+
+
+class RemoteWifiManager(RemoteProxy):
+    """WifiManager of minicpd; snapshot() is rebuilt into a DeviceSnapshot."""
+    def __init__(self, client: RpcClient):
+        super().__init__(client, 'wifi')
+
+    def snapshot(self) -> DeviceSnapshot:
+        devices = self._client.call('wifi.snapshot')
+        return DeviceSnapshot(tuple(DeviceState(**dev) for dev in devices.values()))
+
+
+class _RemoteTraffic:
+    def __init__(self, client: RpcClient, ifname: str):
+        self._client = client
+        self.ifname = ifname
+
+    def top_talkers(self, minutes: int = 5, limit: int = 5) -> list[dict]:
+        return self._client.call('router.top_talkers', self.ifname, minutes, limit)
+
+
+class RemoteRouterManager(RemoteProxy):
+    """RouterManager of minicpd; traffic(ifname) answers top_talkers() through the daemon."""
+    def __init__(self, client: RpcClient):
+        super().__init__(client, 'router')
+
+    def traffic(self, ifname: str) -> _RemoteTraffic:
+        return _RemoteTraffic(self._client, ifname)
+
+
+class RemoteThroughput:
+    """The daemon's ThroughputSampler: same ifnames, history and series()."""
+    def __init__(self, client: RpcClient):
+        self._client = client
+        info = client.call('throughput.info')
+        self.ifnames = tuple(info['ifnames'])
+        self.history = info['history']
+
+    def series(self, ifname: str) -> tuple[list[float], list[float]]:
+        rx, tx = self._client.call('throughput.series', ifname)
+        return rx, tx
+
+
+class RemoteScanService:
+    """
+    ScanService API over the daemon's scans, which every client shares:
+    progress arrives as 'scan' events and is handed to the listeners of
+    this process through post (e.g. TkAsyncBridge.post).
+    """
+    def __init__(self, client: RpcClient, bridge):
+        self.client = client
+        self.bridge = bridge
+        self._listeners = {}  # ifname -> [(on_partial, on_done, on_error)]
+        self._lock = threading.Lock()
+        client.subscribe('scan', self._on_event)
+
+    def scan(self, ifname: str, on_partial=None, on_done=None, on_error=None) -> bool:
+        """
+        Start or join the scan on ifname. Returns True if a running scan was
+        joined. Callbacks already waiting for that scan are not added twice.
+        """
+        listener = (on_partial, on_done, on_error)
+        with self._lock:
+            listeners = self._listeners.setdefault(ifname, [])
+            added = listener not in listeners
+            if added:
+                listeners.append(listener)
+        try:
+            return self.client.call('scan.start', ifname)
+        except Exception as e:
+            with self._lock:
+                if added and listener in self._listeners.get(ifname, ()):
+                    self._listeners[ifname].remove(listener)
+            if on_error:
+                self.bridge.post(on_error, e)
+            return False
+
+    def is_scanning(self, ifname: str) -> bool:
+        return self.client.call('scan.is_scanning', ifname)
+
+    def cancel(self, ifname: str) -> bool:
+        with self._lock:
+            self._listeners.pop(ifname, None)
+        return self.client.call('scan.cancel', ifname)
+
+    def _on_event(self, data: dict):
+        ifname, stage = data['ifname'], data['stage']
+        with self._lock:
+            listeners = list(self._listeners.get(ifname, ()))
+            if stage != 'partial':
+                self._listeners.pop(ifname, None)
+        if stage in ('partial', 'done'):
+            slot, value = (0 if stage == 'partial' else 1), data['networks']
+        else:
+            slot, value = 2, RuntimeError(data.get('error') or f"Scan on {ifname} cancelled")
+        for listener in listeners:
+            if listener[slot]:
+                self.bridge.post(listener[slot], value)
@@ -1,8 +1,16 @@
-import json
 import os
 import logging
-import time
 from utils.cmd import run_cmd
+from utils.cache import SHARED, cached, invalidates
+from utils.opqueue import SUPERSEDED, serialized
+from managers import nm_dbus
+from managers.credential_store import get_store
+from managers.client_tracker import ClientTracker
+from managers.traffic import TrafficAccounting
+from managers.firewall import Firewall, check_ifname
+from managers.scan_cache import ScanCache
+from managers.wifi_manager import scan_cmd, parse_bss
+from managers.channel_select import score_channels, best_channel
 
 # Use current user's home directory
 HOME_DIR = os.path.expanduser("~")
@@ -15,10 +23,30 @@ logging.basicConfig(filename=LOG_FILE, level=logging.DEBUG,
                     format='%(asctime)s %(levelname)s: %(message)s')
 
 class RouterManager:
-    def __init__(self, ifname: str = "wlan1"):
+    def __init__(self, ifname: str = "wlan1", state=None, backend: str = 'nmcli', bus=None, cache=None, firewall=None,
+                 scans=None):
         self.ifname = ifname
-
-    def start_ap(self, ifname: str, ssid: str, psk: str, band: str = 'bg', channel: int = None) -> tuple[bool, str]:
+        # Scan results for channel selection, e.g. WifiManager.scans to share one cache
+        self.scans = scans or ScanCache(self._load_scan, self.is_running)
+        self._channels = {}  # ifname -> (band, channel) the AP was started with
+        self.firewall = firewall or Firewall()  # NAT/forwarding/accounting rules, applied atomically
+        self.cache = cache or SHARED  # QueryCache behind the @cached read methods
+        self.state = state  # optional NMStateCache answering status queries
+        self.credentials = get_store(CRED_FILE)
+        self._trackers = {}  # ifname -> ClientTracker, started on first use
+        self._traffic = {}   # ifname -> TrafficAccounting while the AP runs
+        if state is not None:
+            state.subscribe(self._on_state_change)
+        # 'nmcli', 'dbus' or 'auto'; nmcli stays the fallback for every call
+        self.nm = nm_dbus.open_backend(backend, bus)
+
+    def _on_state_change(self, ifname, old, new):
+        self.cache.invalidate(f'nm:{ifname}', 'nm:devices')
+
+    @invalidates('nm:{ifname}', 'nm:devices')
+    @serialized(supersedes='ap:{ifname}', superseded=(False, SUPERSEDED))
+    def start_ap(self, ifname: str, ssid: str, psk: str, band: str = 'bg', channel: int | str = None) -> tuple[bool, str]:
+        """Start (or restart) the AP; channel 'auto' picks the least congested one from a scan."""
         logging.info(f"Starting AP on {ifname} with SSID {ssid}")
         if not ssid:
             logging.error("SSID cannot be empty")
@@ -26,15 +54,40 @@ class RouterManager:
         if len(psk) < 8:
             logging.error("Password too short")
             return False, "Password must be at least 8 characters"
+        try:
+            check_ifname(ifname)
+        except ValueError as e:
+            return False, str(e)
+        self.credentials.set_disabled(ifname, False)
         conn_name = f"Hotspot_{ifname}"
-        run_cmd(['nmcli', 'con', 'delete', conn_name], timeout=5)
-
         if band == 'a':
             channel = channel or 36  # Default to channel 36 for 5GHz
         else:
             band = 'bg'
             channel = channel or 6   # Default to channel 6 for 2.4GHz
+        if channel == 'auto':
+            channel = self.choose_channel(ifname, band, ssid=ssid)[0]
+
+        ok = False
+        if self.nm is not None:
+            ok, result = nm_dbus.try_call(self.nm, 'replace_and_activate', ifname,
+                                          nm_dbus.ap_settings(ifname, conn_name, ssid, psk, band, channel))
+            if ok and not result[0]:
+                logging.error(f"AP activation failed: {result[1]}")
+                return False, result[1]
+        if not ok:
+            ok, msg = self._start_ap_nmcli(ifname, conn_name, ssid, psk, band, channel)
+            if not ok:
+                return False, msg
+        self._channels[ifname] = (band, channel)
+        self.save_credentials(ifname, ssid, psk)
+        self.enable_internet_sharing(ifname)
+        self.traffic(ifname)
+        logging.info("AP started successfully")
+        return True, ""
 
+    def _start_ap_nmcli(self, ifname, conn_name, ssid, psk, band, channel) -> tuple[bool, str]:
+        run_cmd(['nmcli', 'con', 'delete', conn_name], timeout=5)
         out = run_cmd([
             'nmcli', 'con', 'add', 'type', 'wifi', 'ifname', ifname,
             'con-name', conn_name, 'ssid', ssid,
@@ -51,22 +104,77 @@ class RouterManager:
         if "Error" in out2:
             logging.error(f"AP activation failed: {out2}")
             return False, out2
-        self.save_credentials(ifname, ssid, psk)
-        self.enable_internet_sharing(ifname)
-        logging.info("AP started successfully")
         return True, ""
 
+    def _load_scan(self, ifname: str, rescan: bool) -> list[dict]:
+        return parse_bss(run_cmd(scan_cmd(ifname, 'yes' if rescan else 'no'), timeout=10 if rescan else 5))
+
+    @serialized(coalesce=True)
+    def choose_channel(self, ifname: str = None, band: str = 'bg', scan_ifname: str = None,
+                       ssid: str = None) -> tuple[int, dict[int, float]]:
+        """
+        Least congested channel of band for an AP on ifname, with the score
+        of every candidate. scan_ifname (default ifname) provides the scan;
+        BSSes of our own SSID are left out.
+        """
+        ifname = ifname or self.ifname
+        ssid = ssid or self.load_credentials(ifname)[0]
+        networks = [n for n in self.scans.get(scan_ifname or ifname) if not (ssid and n['ssid'] == ssid)]
+        scores = score_channels(networks, band)
+        channel = best_channel(scores)
+        logging.info(f"Channel scores for {ifname} ({band}, {len(networks)} BSS): {scores}; best {channel}")
+        return channel, scores
+
+    @serialized(coalesce=True)
+    def reevaluate_channel(self, ifname: str = None, scan_ifname: str = None, margin: float = 1.0) -> tuple[bool, int]:
+        """
+        Move a running AP to the best channel if it beats the current one by
+        more than margin (about one extra BSS), since clients have to
+        reassociate. Returns (moved, channel). Scanning from another radio
+        (scan_ifname) gives fresher results than the AP radio itself, which
+        never rescans while it serves clients.
+        """
+        ifname = ifname or self.ifname
+        band, current = self._channels.get(ifname, ('bg', None))
+        if current is None or not self.is_running(ifname):
+            return False, current
+        best, scores = self.choose_channel(ifname, band, scan_ifname)
+        if best == current or scores.get(current, 0) - scores[best] <= margin:
+            return False, current
+        ssid, psk = self.load_credentials(ifname)
+        logging.info(f"Moving AP on {ifname} from channel {current} to {best}")
+        ok, _ = self.start_ap(ifname, ssid, psk, band, best)
+        return ok, best if ok else current
+
+    @invalidates('nm:{ifname}', 'nm:devices')
+    @serialized(supersedes='ap:{ifname}')
     def stop_ap(self, ifname: str = None) -> None:
         ifname = ifname or self.ifname
         logging.info(f"Stopping AP on {ifname}")
+        self.credentials.set_disabled(ifname, True)  # or reconcile would restart it right away
         conn_name = f"Hotspot_{ifname}"
-        run_cmd(['nmcli', 'con', 'down', conn_name], timeout=5)
-        run_cmd(['nmcli', 'con', 'delete', conn_name], timeout=5)
+        traffic = self._traffic.pop(ifname, None)
+        if traffic is not None:
+            traffic.stop(apply=False)
+        self.disable_internet_sharing(ifname)
+        ok, _ = nm_dbus.try_call(self.nm, 'deactivate', conn_name)
+        ok = ok and nm_dbus.try_call(self.nm, 'delete_connection', conn_name)[0]
+        if not ok:
+            run_cmd(['nmcli', 'con', 'down', conn_name], timeout=5)
+            run_cmd(['nmcli', 'con', 'delete', conn_name], timeout=5)
         logging.info("AP stopped")
 
+    @cached(5, 'nm:{ifname}')
+    @serialized(coalesce=True)
     def is_running(self, ifname: str = None) -> bool:
         ifname = ifname or self.ifname
         conn_name = f"Hotspot_{ifname}"
+        if self.state is not None and self.state.ready.is_set():
+            dev = self.state.get(ifname)
+            return dev is not None and dev.connection == conn_name
+        ok, active = nm_dbus.try_call(self.nm, 'active_connection', ifname)
+        if ok:
+            return active == conn_name
         out = run_cmd(['nmcli', '-t', '-f', 'NAME,DEVICE', 'con', 'show', '--active'])
         running = any(
             line.split(':', 1)[0] == conn_name and line.split(':', 1)[1] == ifname
@@ -75,64 +183,65 @@ class RouterManager:
         logging.debug(f"AP running check for {ifname}: {running}")
         return running
 
+    def client_tracker(self, ifname: str = None) -> ClientTracker:
+        """The (started) station tracker of an AP interface, e.g. to subscribe to join/leave events."""
+        ifname = ifname or self.ifname
+        if ifname not in self._trackers:
+            self._trackers[ifname] = ClientTracker(ifname).start()
+        return self._trackers[ifname]
+
+    def traffic(self, ifname: str = None) -> TrafficAccounting:
+        """Per-client traffic accounting of an AP interface, started on first use."""
+        ifname = ifname or self.ifname
+        if ifname not in self._traffic:
+            self._traffic[ifname] = TrafficAccounting(ifname, self.client_tracker(ifname), self.firewall).start()
+        return self._traffic[ifname]
+
     def list_connected_devices(self, ifname: str = None) -> list[dict]:
         ifname = ifname or self.ifname
-        logging.debug(f"Listing devices on {ifname}")
-        out = run_cmd(['arp', '-n', '-i', ifname])
-        devices = []
-        for line in out.splitlines()[1:]:
-            parts = line.split()
-            if len(parts) >= 3:
-                devices.append({'ip': parts[0], 'mac': parts[2]})
-        logging.debug(f"Found devices: {devices}")
+        devices = [c.as_dict() for c in self.client_tracker(ifname).clients()]
+        logging.debug(f"Found devices on {ifname}: {devices}")
         return devices
 
-    def enable_internet_sharing(self, ifname: str, client_ifname: str = "wlan0"):
-        logging.info(f"Enabling internet sharing from {client_ifname} to {ifname}")
-        run_cmd(['sysctl', '-w', 'net.ipv4.ip_forward=1'])
-        run_cmd(['iptables', '-t', 'nat', '-A', 'POSTROUTING', '-o', client_ifname, '-j', 'MASQUERADE'])
-        run_cmd(['iptables', '-A', 'FORWARD', '-i', ifname, '-o', client_ifname, '-j', 'ACCEPT'])
-        run_cmd(['iptables', '-A', 'FORWARD', '-i', client_ifname, '-o', ifname, '-m', 'state', '--state', 'RELATED,ESTABLISHED', '-j', 'ACCEPT'])
-        run_cmd(['sh', '-c', 'iptables-save > /etc/iptables/rules.v4'])
-
-    def _load_credentials(self) -> dict:
-        logging.debug(f"Loading credentials from {CRED_FILE}")
-        if os.path.exists(CRED_FILE):
-            try:
-                with open(CRED_FILE, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                logging.error(f"Failed to load credentials: {e}")
-                return {}
-        return {}
-
-    def _save_credentials(self, data: dict):
-        logging.debug(f"Saving credentials to {CRED_FILE}: {data}")
+    @serialized(supersedes='share:{ifname}', superseded=(False, SUPERSEDED))
+    def enable_internet_sharing(self, ifname: str, client_ifname: str = "wlan0") -> tuple[bool, str]:
+        """NAT ifname's clients out through client_ifname. Idempotent: repeated calls add no rules."""
+        logging.info(f"Enabling internet sharing from {client_ifname!r} to {ifname!r}")
         try:
-            os.makedirs(os.path.dirname(CRED_FILE), exist_ok=True)
-            with open(CRED_FILE, 'w') as f:
-                json.dump(data, f, indent=4)
-        except Exception as e:
-            logging.error(f"Failed to save credentials: {e}")
+            self.firewall.share(ifname, client_ifname)
+        except ValueError as e:
+            logging.error(str(e))
+            return False, str(e)
+        self.firewall.enable_ip_forward()
+        return self.firewall.apply()
+
+    @serialized(supersedes='share:{ifname}', superseded=(False, SUPERSEDED))
+    def disable_internet_sharing(self, ifname: str = None) -> tuple[bool, str]:
+        ifname = ifname or self.ifname
+        logging.info(f"Disabling internet sharing to {ifname}")
+        self.firewall.unshare(ifname)
+        return self.firewall.apply()
 
     def save_credentials(self, ifname: str, ssid: str, psk: str):
         logging.info(f"Saving credentials for {ifname}, SSID: {ssid}")
-        creds = self._load_credentials()
-        creds[ifname] = {'ssid': ssid, 'psk': psk}
-        self._save_credentials(creds)
-
-    def load_credentials(self, ifname: str) -> tuple[str, str]:
-        creds = self._load_credentials()
-        return (
-            creds.get(ifname, {}).get('ssid', ''),
-            creds.get(ifname, {}).get('psk', '')
-        )
+        self.credentials.put(ifname, ssid, psk)
 
-    def monitor(self):
-        while True:
-            if not self.is_running():
-                ssid, psk = self.load_credentials(self.ifname)
-                if ssid and psk:
-                    logging.info(f"Restarting AP {ssid} on {self.ifname}")
-                    self.start_ap(self.ifname, ssid, psk)
-            time.sleep(60)
+    def load_credentials(self, ifname: str, ssid: str = None) -> tuple[str, str]:
+        return self.credentials.get(ifname, ssid)
+
+    @serialized(coalesce=True)
+    def reconcile(self, ifname: str = None) -> bool:
+        """One supervision step: restart the saved AP if it is not running."""
+        ifname = ifname or self.ifname
+        if self.credentials.is_disabled(ifname):
+            return True
+        if self.is_running(ifname):
+            self.traffic(ifname)  # AP may have outlived a restart of MiniCP
+            return True
+        ssid, psk = self.load_credentials(ifname)
+        if not (ssid and psk):
+            return True
+        logging.info(f"Restarting AP {ssid} on {ifname}")
+        band, channel = self._channels.get(ifname, ('bg', 'auto'))
+        ok, _ = self.start_ap(ifname, ssid, psk, band, channel)
+        return ok
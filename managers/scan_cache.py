@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+
+
+class ScanCache:
+    """
+    Wi-Fi scan results per interface, so the radio is not rescanned on
+    every call.
+
+    get() answers from memory while the last result is younger than
+    max_age, otherwise from NetworkManager's own BSS list (no radio
+    scan, e.g. `--rescan no`), and schedules a real rescan in the
+    background at most once per min_interval. Only when nothing is known
+    yet does get() wait for a rescan. Rescans are never started while the
+    radio serves an access point, since going off-channel stalls its
+    clients; they are deferred until resume() finds the AP gone.
+
+    loader(ifname, rescan) -> networks does the actual work;
+    serving_ap(ifname) tells whether the radio behind ifname runs an AP.
+    """
+    def __init__(self, loader, serving_ap, max_age: float = 30, min_interval: float = 60):
+        self.loader = loader
+        self.serving_ap = serving_ap
+        self.max_age = max_age
+        self.min_interval = min_interval
+        self._entries = {}       # ifname -> (monotonic time, networks)
+        self._last_rescan = {}   # ifname -> monotonic time a rescan was last started
+        self._running = set()    # ifnames with a radio scan in progress, ours or a caller's
+        self._deferred = set()
+        self._lock = threading.Lock()
+
+    def peek(self, ifname: str, max_age: float = None) -> list[dict] | None:
+        """Cached networks younger than max_age, or None."""
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(ifname)
+        if entry and time.monotonic() - entry[0] <= max_age:
+            return entry[1]
+        return None
+
+    def get(self, ifname: str, max_age: float = None) -> list[dict]:
+        networks = self.peek(ifname, max_age)
+        if networks is not None:
+            return networks
+        networks = self.loader(ifname, False)
+        if not networks and self.start_rescan(ifname):
+            try:
+                networks = self.loader(ifname, True)
+            finally:
+                self.finish_rescan(ifname)
+        self.store(ifname, networks)
+        self.request_rescan(ifname)
+        return networks
+
+    def store(self, ifname: str, networks: list[dict]):
+        with self._lock:
+            self._entries[ifname] = (time.monotonic(), networks)
+
+    def may_rescan(self, ifname: str, min_interval: float = None) -> bool:
+        """Whether a radio scan on ifname is allowed now; records the start if it is."""
+        return self._allow(ifname, min_interval, claim=False)
+
+    def start_rescan(self, ifname: str, min_interval: float = None) -> bool:
+        """
+        may_rescan(), and if allowed also mark ifname as scanning until
+        finish_rescan(), so no other rescan of the radio overlaps this one.
+        """
+        return self._allow(ifname, min_interval, claim=True)
+
+    def finish_rescan(self, ifname: str):
+        with self._lock:
+            self._running.discard(ifname)
+
+    def _allow(self, ifname: str, min_interval: float, claim: bool) -> bool:
+        min_interval = self.min_interval if min_interval is None else min_interval
+        if self.serving_ap(ifname):
+            with self._lock:
+                if ifname not in self._deferred:
+                    logging.info(f"Radio of {ifname} is serving an access point, deferring its rescan")
+                self._deferred.add(ifname)
+            return False
+        with self._lock:
+            self._deferred.discard(ifname)
+            if ifname in self._running or time.monotonic() - self._last_rescan.get(ifname, -min_interval) < min_interval:
+                return False
+            self._last_rescan[ifname] = time.monotonic()
+            if claim:
+                self._running.add(ifname)
+            return True
+
+    def request_rescan(self, ifname: str) -> bool:
+        """Start a background rescan if the policy allows it. Returns True if one was started."""
+        if not self.start_rescan(ifname):
+            return False
+        threading.Thread(target=self._rescan, args=(ifname,), name=f"rescan-{ifname}", daemon=True).start()
+        return True
+
+    def resume(self, ifname: str):
+        """Run the rescan deferred on ifname, if any, now that the AP may be gone."""
+        with self._lock:
+            deferred = ifname in self._deferred
+        if deferred:
+            self.request_rescan(ifname)
+
+    def _rescan(self, ifname: str):
+        try:
+            self.store(ifname, self.loader(ifname, True))
+            logging.debug(f"Background rescan on {ifname} done")
+        except Exception as e:
+            logging.error(f"Background rescan on {ifname} failed: {e}")
+        finally:
+            self.finish_rescan(ifname)
@@ -0,0 +1,114 @@
+import logging
+import threading
+from utils.cmd import run_cmd_async
+from managers.wifi_manager import scan_cmd, parse_bss, best_per_ssid
+
+
+class _Scan:
+    def __init__(self):
+        self.future = None
+        self.listeners = []  # (on_partial, on_done, on_error)
+        self.partial = None
+
+
+class ScanService:
+    """
+    Wi-Fi scans off the Tk thread. A scan first reports the networks
+    NetworkManager already knows (partial), then the result of a fresh
+    rescan (final). Callbacks are delivered through post, e.g.
+    TkAsyncBridge.post, so they run on the Tk thread. Asking for a scan on
+    an interface that is already scanning joins the running scan.
+
+    With a ScanCache (scans), the partial result comes from the cache when
+    fresh, the rescan obeys its policy (user scans are limited to one per
+    min_interval seconds and refused while the radio serves an AP, in
+    which case the known networks are final) and results are stored back.
+    """
+    def __init__(self, bridge, timeout: float = 10, scans=None, min_interval: float = 5):
+        self.bridge = bridge
+        self.timeout = timeout
+        self.scans = scans
+        self.min_interval = min_interval
+        self._scans = {}  # ifname -> _Scan
+        self._lock = threading.Lock()
+
+    def scan(self, ifname: str, on_partial=None, on_done=None, on_error=None) -> bool:
+        """
+        Start or join a scan on ifname. Returns True if a running scan was
+        joined. Callbacks already waiting for that scan are not added twice.
+        """
+        listener = (on_partial, on_done, on_error)
+        with self._lock:
+            scan = self._scans.get(ifname)
+            joined = scan is not None
+            if not joined:
+                scan = self._scans[ifname] = _Scan()
+            if listener not in scan.listeners:
+                scan.listeners.append(listener)
+            if joined and scan.partial is not None and on_partial:
+                self.bridge.post(on_partial, scan.partial)
+            if not joined:
+                scan.future = self.bridge.loop_thread.submit(self._run(ifname, scan))
+        return joined
+
+    def is_scanning(self, ifname: str) -> bool:
+        with self._lock:
+            return ifname in self._scans
+
+    def cancel(self, ifname: str) -> bool:
+        """Cancel a running scan; its nmcli process is killed and no listener is called."""
+        with self._lock:
+            scan = self._scans.pop(ifname, None)
+        if scan is None:
+            return False
+        scan.future.cancel()
+        logging.info(f"Scan on {ifname} cancelled")
+        return True
+
+    async def _run(self, ifname: str, scan: _Scan):
+        try:
+            known = self.scans.peek(ifname) if self.scans else None
+            if known is None:
+                cached = await run_cmd_async(scan_cmd(ifname, 'no'), timeout=5)
+                known = parse_bss(cached.stdout) if cached.ok else None
+            if known is not None:
+                self._emit(ifname, scan, 0, best_per_ssid(known))
+            if self.scans and not self.scans.start_rescan(ifname, self.min_interval):
+                logging.debug(f"Rescan on {ifname} not allowed now, keeping known networks")
+                self._finish(ifname, scan, 1, best_per_ssid(known or []))
+                return
+            try:
+                fresh = await run_cmd_async(scan_cmd(ifname, 'yes'), timeout=self.timeout)
+            finally:
+                if self.scans:
+                    self.scans.finish_rescan(ifname)  # also on cancel, which raises CancelledError here
+            if fresh.timed_out:
+                raise TimeoutError(f"Scan on {ifname} timed out after {self.timeout}s")
+            if not fresh.ok:
+                raise RuntimeError(fresh.output.strip() or f"nmcli exited with {fresh.rc}")
+            found = parse_bss(fresh.stdout)
+            if self.scans:
+                self.scans.store(ifname, found)
+            networks = best_per_ssid(found)
+            logging.debug(f"Scan on {ifname} found {len(networks)} networks")
+            self._finish(ifname, scan, 1, networks)
+        except Exception as e:
+            self._finish(ifname, scan, 2, e)
+
+    def _emit(self, ifname: str, scan: _Scan, slot: int, value):
+        with self._lock:
+            if slot == 0:
+                if self._scans.get(ifname) is not scan:
+                    return
+                scan.partial = value
+            listeners = list(scan.listeners)
+        for listener in listeners:
+            if listener[slot]:
+                self.bridge.post(listener[slot], value)
+
+    def _finish(self, ifname: str, scan: _Scan, slot: int, value):
+        with self._lock:
+            if self._scans.get(ifname) is not scan:
+                return  # cancelled meanwhile
+            del self._scans[ifname]
+        self._emit(ifname, scan, slot, value)
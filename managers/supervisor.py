@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import random
+import time
+from utils.aio import get_loop_thread
+
+
+class _Task:
+    def __init__(self, name: str, ifname: str, reconcile):
+        self.name = name
+        self.ifname = ifname
+        self.reconcile = reconcile
+        self.failures = 0
+        self.next_run = time.time()
+        self.last_run = None
+        self.last_error = ''
+        self.running = False
+        self.wake = None  # asyncio.Event, created on the loop
+
+
+class Supervisor:
+    """
+    Runs the reconciliation of every interface (reconnect the client,
+    restart the AP, ...) as tasks on one asyncio loop instead of one
+    sleeping thread per manager.
+
+    A task runs every `interval` seconds while healthy, immediately when a
+    state-change event arrives for its interface, and with exponential
+    backoff plus jitter while its reconcile keeps failing. Events do not
+    bypass a running backoff, so a persistently broken link is not
+    hammered.
+    """
+    def __init__(self, loop_thread=None, interval: float = 60, base_backoff: float = 5,
+                 max_backoff: float = 600, jitter: float = 0.2):
+        self.loop_thread = loop_thread or get_loop_thread()
+        self.interval = interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self._tasks = {}
+
+    def add(self, name: str, ifname: str, reconcile):
+        """reconcile() is a blocking callable returning True when the interface is where it should be."""
+        task = self._tasks[name] = _Task(name, ifname, reconcile)
+        self.loop_thread.submit(self._start(task))
+        return self
+
+    def watch(self, nm_state):
+        """Kick the tasks of an interface as soon as NetworkManager reports a change on it."""
+        nm_state.subscribe(lambda ifname, old, new: self.kick(ifname=ifname))
+        return self
+
+    def kick(self, name: str = None, ifname: str = None):
+        """Ask for an immediate run of matching tasks. Safe from any thread."""
+        for task in self._tasks.values():
+            if (name is None or task.name == name) and (ifname is None or task.ifname == ifname):
+                if task.wake is not None:
+                    self.loop_thread.call_soon(task.wake.set)
+
+    def status(self) -> dict:
+        """Next run time (epoch seconds), failure count and last error of every task."""
+        return {
+            t.name: {
+                'ifname': t.ifname, 'running': t.running, 'failures': t.failures,
+                'next_run': t.next_run, 'last_run': t.last_run, 'last_error': t.last_error,
+            }
+            for t in self._tasks.values()
+        }
+
+    def _backoff(self, failures: int) -> float:
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (failures - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def _start(self, task: _Task):
+        task.wake = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(task.wake.wait(), max(0, task.next_run - time.time()))
+            except asyncio.TimeoutError:
+                pass
+            if task.wake.is_set():
+                task.wake.clear()
+                if task.failures and time.time() < task.next_run:
+                    continue  # backing off, ignore the event
+            task.running = True
+            task.last_run = time.time()
+            try:
+                ok = await loop.run_in_executor(None, task.reconcile)
+                task.last_error = '' if ok else 'reconcile reported failure'
+            except Exception as e:
+                ok = False
+                task.last_error = str(e)
+                logging.exception(f"Reconcile {task.name} failed")
+            finally:
+                task.running = False
+            if ok:
+                task.failures = 0
+                task.next_run = time.time() + self.interval
+            else:
+                task.failures += 1
+                task.next_run = time.time() + self._backoff(task.failures)
+                logging.warning(f"Reconcile {task.name} failed {task.failures}x, next try in "
+                                f"{task.next_run - time.time():.0f}s")
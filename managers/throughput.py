@@ -0,0 +1,76 @@
+import logging
+import threading
+import time
+from utils.ring import RingBuffer
+
+PROC_NET_DEV = '/proc/net/dev'
+
+
+def parse_proc_net_dev(text: str) -> dict[str, tuple[int, int]]:
+    """{ifname: (rx_bytes, tx_bytes)} from /proc/net/dev."""
+    counters = {}
+    for line in text.splitlines()[2:]:
+        name, _, fields = line.partition(':')
+        fields = fields.split()
+        if len(fields) >= 9:
+            counters[name.strip()] = int(fields[0]), int(fields[8])
+    return counters
+
+
+class ThroughputSampler:
+    """
+    rx/tx bytes per second of a few interfaces, sampled once per interval
+    from /proc/net/dev (one read covers every interface) into rings
+    preallocated for `history` samples. An interface that is missing, e.g.
+    an unplugged dongle, just reads as 0.
+    """
+    def __init__(self, ifnames=('wlan0', 'wlan1', 'eth0'), interval: float = 1.0, history: int = 60):
+        self.ifnames = tuple(ifnames)
+        self.interval = interval
+        self.history = history
+        self.rx = {ifname: RingBuffer(history) for ifname in self.ifnames}
+        self.tx = {ifname: RingBuffer(history) for ifname in self.ifnames}
+        self._last = {}
+        self._last_time = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="throughput", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def sample(self):
+        try:
+            with open(PROC_NET_DEV) as f:
+                counters = parse_proc_net_dev(f.read())
+        except OSError as e:
+            logging.error(f"Failed to read {PROC_NET_DEV}: {e}")
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._last_time is not None:
+                elapsed = now - self._last_time
+                for ifname in self.ifnames:
+                    rx, tx = counters.get(ifname, (0, 0))
+                    last_rx, last_tx = self._last.get(ifname, (rx, tx))
+                    # Counters restart from 0 when an interface is re-created
+                    self.rx[ifname].append(max(rx - last_rx, 0) / elapsed)
+                    self.tx[ifname].append(max(tx - last_tx, 0) / elapsed)
+            self._last, self._last_time = counters, now
+
+    def series(self, ifname: str) -> tuple[list[float], list[float]]:
+        """(rx, tx) bytes per second, oldest first."""
+        with self._lock:
+            return self.rx[ifname].values(), self.tx[ifname].values()
+
+    def _run(self):
+        self.sample()
+        next_run = time.monotonic()
+        while True:
+            next_run += self.interval
+            if self._stopped.wait(max(0, next_run - time.monotonic())):
+                return
+            self.sample()
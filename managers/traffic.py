@@ -0,0 +1,164 @@
+import logging
+import threading
+import time
+from utils.cmd import run_cmd
+from utils.ring import RingBuffer
+from managers.firewall import ACCT_CHAIN
+
+WINDOWS = (1, 5, 15)  # minutes offered for top talkers
+
+
+def parse_counters(out: str) -> dict[str, list[int]]:
+    """
+    Parse `iptables -v -S <chain>` into {ip: [up_pkts, up_bytes, down_pkts, down_bytes]};
+    -s rules count what a client sends, -d rules what it receives.
+    """
+    counters = {}
+    for line in out.splitlines():
+        parts = line.split()
+        if not parts or parts[0] != '-A' or '-c' not in parts:
+            continue
+        c = parts.index('-c')
+        pkts, nbytes = int(parts[c + 1]), int(parts[c + 2])
+        for flag, offset in (('-s', 0), ('-d', 2)):
+            if flag in parts:
+                ip = parts[parts.index(flag) + 1].split('/', 1)[0]
+                row = counters.setdefault(ip, [0, 0, 0, 0])
+                row[offset], row[offset + 1] = pkts, nbytes
+    return counters
+
+
+class _Counters:
+    """Cumulative per-client counters sampled into fixed-size rings."""
+    __slots__ = ('times', 'series', 'raw', 'totals')
+
+    def __init__(self, capacity: int):
+        self.times = RingBuffer(capacity)
+        self.series = [RingBuffer(capacity) for _ in range(4)]  # up_pkts, up_bytes, down_pkts, down_bytes
+        self.raw = None
+        self.totals = [0, 0, 0, 0]
+
+    def add(self, now: float, raw: list[int]):
+        for i, value in enumerate(raw):
+            previous = self.raw[i] if self.raw else 0
+            # A counter going backwards means the rule was recreated
+            self.totals[i] += value - previous if value >= previous else value
+        self.raw = raw
+        self.times.append(now)
+        for ring, total in zip(self.series, self.totals):
+            ring.append(total)
+
+    def rates(self, seconds: float) -> list[float]:
+        """Per-second rates of the four counters over the last `seconds`."""
+        n = len(self.times)
+        if n < 2:
+            return [0.0] * 4
+        newest = self.times[-1]
+        first = n - 1
+        while first > 0 and newest - self.times[first - 1] <= seconds:
+            first -= 1
+        if first == n - 1:
+            first = n - 2
+        elapsed = newest - self.times[first]
+        return [(ring[-1] - ring[first]) / elapsed for ring in self.series]
+
+
+class TrafficAccounting:
+    """
+    Byte/packet counters per AP client from iptables accounting rules (one
+    -s and one -d rule per client IP in the MINICP-ACCT-<ifname> chain the
+    Firewall maintains), sampled every `interval` seconds. Each client
+    keeps `window` seconds of samples in fixed-size rings and leaves the
+    table when the client tracker reports it gone, so memory stays bounded
+    whatever the uptime.
+    """
+    def __init__(self, ifname: str, tracker, firewall, interval: float = 10, window: float = max(WINDOWS) * 60):
+        self.ifname = ifname
+        self.tracker = tracker
+        self.firewall = firewall
+        self.interval = interval
+        self.chain = ACCT_CHAIN.format(ifname=ifname)
+        self._capacity = int(window / interval) + 1
+        self._counters = {}  # ip -> _Counters
+        self._clients = {}   # ip -> Client
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._unsubscribe = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._stopped.clear()
+        self._unsubscribe = self.tracker.subscribe(self._on_client)
+        for client in self.tracker.clients():
+            self._on_client('join', client, apply=False)
+        self._apply_rules()
+        self._thread = threading.Thread(target=self._run, name=f"traffic-{self.ifname}", daemon=True)
+        self._thread.start()
+        logging.info(f"Traffic accounting started on {self.ifname}")
+        return self
+
+    def stop(self, apply: bool = True):
+        """Stop sampling and drop the accounting rules (with apply=False the caller applies the firewall)."""
+        self._stopped.set()
+        if self._unsubscribe:
+            self._unsubscribe()
+            self._unsubscribe = None
+        self._thread = None
+        with self._lock:
+            self._counters.clear()
+            self._clients.clear()
+        self.firewall.clear_accounting(self.ifname)
+        if apply:
+            self.firewall.apply()
+        logging.info(f"Traffic accounting stopped on {self.ifname}")
+
+    def _on_client(self, event: str, client, apply: bool = True):
+        with self._lock:
+            known = client.ip in self._clients
+            if event == 'join':
+                self._clients[client.ip] = client
+                self._counters.setdefault(client.ip, _Counters(self._capacity))
+            else:
+                self._clients.pop(client.ip, None)
+                self._counters.pop(client.ip, None)
+        if apply and known != (event == 'join'):
+            self._apply_rules()
+
+    def _apply_rules(self):
+        with self._lock:
+            ips = list(self._clients)
+        self.firewall.set_accounting(self.ifname, ips)
+        self.firewall.apply()
+
+    def sample(self):
+        """Read all counters of the chain in one iptables call."""
+        counters = parse_counters(run_cmd(['iptables', '-w', '-v', '-S', self.chain], timeout=5))
+        now = time.monotonic()
+        with self._lock:
+            for ip, raw in counters.items():
+                if ip in self._counters:
+                    self._counters[ip].add(now, raw)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logging.error(f"Traffic sampling on {self.ifname} failed: {e}")
+
+    def top_talkers(self, minutes: int = 5, limit: int = 5) -> list[dict]:
+        """Clients by total rate over the last `minutes`: ip, mac, hostname, up/down bytes and packets per second."""
+        talkers = []
+        with self._lock:
+            for ip, counters in self._counters.items():
+                up_pps, up_bps, down_pps, down_bps = counters.rates(minutes * 60)
+                client = self._clients.get(ip)
+                talkers.append({
+                    'ip': ip, 'mac': client.mac if client else '', 'hostname': client.hostname if client else '',
+                    'up_bps': up_bps, 'down_bps': down_bps, 'up_pps': up_pps, 'down_pps': down_pps,
+                    'total_bytes': counters.totals[1] + counters.totals[3],
+                })
+        talkers.sort(key=lambda t: t['up_bps'] + t['down_bps'], reverse=True)
+        return talkers[:limit]
@@ -1,8 +1,12 @@
-import json
 import os
 import logging
-import time
 from utils.cmd import run_cmd
+from utils.cache import SHARED, cached, invalidates
+from utils.opqueue import SUPERSEDED, serialized
+from managers.nm_state import DeviceSnapshot, load_snapshot, split_terse
+from managers import nm_dbus
+from managers.credential_store import get_store
+from managers.scan_cache import ScanCache
 
 # Use current user's home directory
 HOME_DIR = os.path.expanduser("~")
@@ -14,36 +18,148 @@ os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
 logging.basicConfig(filename=LOG_FILE, level=logging.DEBUG,
                     format='%(asctime)s %(levelname)s: %(message)s')
 
+SCAN_FIELDS = 'SSID,BSSID,SIGNAL,SECURITY,CHAN,FREQ'
+
+
+def scan_cmd(ifname: str, rescan: str = 'auto') -> list[str]:
+    """nmcli wifi list; rescan 'no' returns NetworkManager's current results without scanning."""
+    return ['nmcli', '-t', '-f', SCAN_FIELDS, 'device', 'wifi', 'list',
+            'ifname', ifname, '--rescan', rescan]
+
+
+def best_per_ssid(networks) -> list[dict]:
+    """One entry per SSID, the strongest BSSID, sorted by signal; hidden networks are dropped."""
+    best = {}
+    for net in networks:
+        if net['ssid'] and (net['ssid'] not in best or net['signal'] > best[net['ssid']]['signal']):
+            best[net['ssid']] = net
+    return sorted(best.values(), key=lambda x: x['signal'], reverse=True)
+
+
+def parse_bss(out: str) -> list[dict]:
+    """scan_cmd output as ssid, bssid, signal, security, channel and freq (MHz) of every BSS seen."""
+    networks = []
+    for line in out.splitlines():
+        if line.strip():
+            parts = split_terse(line)
+            if len(parts) >= 6:
+                freq = parts[5].split()[0] if parts[5].strip() else ''
+                networks.append({
+                    'ssid': parts[0].strip(),
+                    'bssid': parts[1],
+                    'signal': int(parts[2]) if parts[2].isdigit() else 0,
+                    'security': parts[3].strip(),
+                    'channel': int(parts[4]) if parts[4].isdigit() else 0,
+                    'freq': int(freq) if freq.isdigit() else 0,
+                })
+    return networks
+
+
+def parse_networks(out: str) -> list[dict]:
+    return best_per_ssid(parse_bss(out))
+
+
+def wiphy(ifname: str) -> str:
+    """Name of the radio (e.g. phy0) behind a wireless interface, '' if unknown."""
+    try:
+        with open(f'/sys/class/net/{ifname}/phy80211/name') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+# Profile settings connect() manages; anything else in the profile is left alone
+PROFILE_FIELDS = ('connection.interface-name', '802-11-wireless.ssid',
+                  '802-11-wireless-security.key-mgmt', '802-11-wireless-security.psk')
+
+
+def profile_settings(conn_id: str) -> dict[str, str] | None:
+    """PROFILE_FIELDS of the saved profile conn_id (secrets included), or None if there is none."""
+    out = run_cmd(['nmcli', '-s', '-t', '-f', ','.join(('connection.id',) + PROFILE_FIELDS),
+                   'con', 'show', 'id', conn_id], timeout=5)
+    settings = {}
+    for line in out.splitlines():
+        key, sep, value = line.partition(':')
+        if sep:
+            settings[key] = value
+    return settings if settings.get('connection.id') == conn_id else None
+
+
+def parse_active_ap(out: str) -> tuple[str, int] | None:
+    """(BSSID, MHz) of the in-use line of `nmcli -t -f IN-USE,BSSID,FREQ device wifi list`."""
+    for line in out.splitlines():
+        parts = split_terse(line)
+        if len(parts) >= 3 and parts[0] == '*':
+            freq = parts[2].split()[0]
+            return parts[1], int(freq) if freq.isdigit() else 0
+    return None
+
+
 class WifiManager:
-    def __init__(self, ifname: str = "wlan0"):
+    def __init__(self, ifname: str = "wlan0", state=None, backend: str = 'nmcli', bus=None, cache=None,
+                 pin_bssid: bool = True, scan_max_age: float = 30, rescan_interval: float = 60):
         self.ifname = ifname
+        # Reconnects go straight to the access point used last time (falling back to any)
+        self.pin_bssid = pin_bssid
+        self._last_ap = {}  # (ifname, ssid) -> (bssid, MHz)
+        self.cache = cache or SHARED  # QueryCache behind the @cached read methods
+        self.state = state  # optional NMStateCache answering status queries
+        self.credentials = get_store(CRED_FILE)
+        # Scans answer from cache; rescans run in the background and never on a radio serving an AP
+        self.scans = ScanCache(self._load_scan, self._radio_serves_ap, scan_max_age, rescan_interval)
+        if state is not None:
+            state.subscribe(self._on_state_change)
+        # 'nmcli', 'dbus' or 'auto'; nmcli stays the fallback for every call
+        self.nm = nm_dbus.open_backend(backend, bus)
+
+    def _cached_device(self, ifname: str):
+        """Return (hit, DeviceState or None) from the state cache, if it is synced."""
+        if self.state is None or not self.state.ready.is_set():
+            return False, None
+        return True, self.state.get(ifname)
+
+    def _on_state_change(self, ifname, old, new):
+        self.cache.invalidate(f'nm:{ifname}', 'nm:devices')
+        if old is None or new is None:
+            self.cache.invalidate('nm:adapters')  # hot-plugged or removed adapter
+        if old is not None and old.role == 'ap' and (new is None or new.role != 'ap'):
+            for dev in self.snapshot().wifi():
+                self.scans.resume(dev.ifname)
 
+    @cached(30, 'nm:adapters')
     def list_adapters(self) -> list[str]:
+        ok, adapters = nm_dbus.try_call(self.nm, 'list_adapters')
+        if ok:
+            return adapters
         out = run_cmd(['nmcli', '-t', '-f', 'DEVICE,TYPE', 'device'])
         adapters = [line.split(':')[0] for line in out.splitlines() if line.endswith(':wifi')]
         logging.debug(f"Found adapters: {adapters}")
         return adapters
 
-    def scan_networks(self, ifname: str = None) -> list[dict]:
+    def scan_networks(self, ifname: str = None, max_age: float = None) -> list[dict]:
+        """Networks seen on ifname, at most max_age seconds old (see ScanCache)."""
         ifname = ifname or self.ifname
-        logging.info(f"Scanning networks on {ifname}")
-        out = run_cmd(
-            ['nmcli', '-t', '-f', 'SSID,SIGNAL,SECURITY', 'device', 'wifi', 'list', 'ifname', ifname],
-            timeout=10
-        )
-        networks = []
-        for line in out.splitlines():
-            if line.strip():
-                parts = line.split(':')
-                if len(parts) >= 3:
-                    networks.append({
-                        'ssid': parts[0].strip(),
-                        'signal': int(parts[1]) if parts[1].isdigit() else 0,
-                        'security': parts[2].strip()
-                    })
-        logging.debug(f"Found networks: {networks}")
-        return sorted(networks, key=lambda x: x['signal'], reverse=True)
+        networks = best_per_ssid(self.scans.get(ifname, max_age))
+        logging.debug(f"Found networks on {ifname}: {networks}")
+        return networks
+
+    @serialized(coalesce=True)
+    def _load_scan(self, ifname: str, rescan: bool) -> list[dict]:
+        """Every BSS seen on ifname; the cache keeps them all, e.g. for channel selection."""
+        logging.info(f"{'Scanning' if rescan else 'Reading scan results'} on {ifname}")
+        ok, networks = nm_dbus.try_call(self.nm, 'scan', ifname, rescan)
+        if ok:
+            return networks
+        return parse_bss(run_cmd(scan_cmd(ifname, 'yes' if rescan else 'no'), timeout=10 if rescan else 5))
 
+    def _radio_serves_ap(self, ifname: str) -> bool:
+        """Whether ifname, or another interface on the same radio, is running an access point."""
+        phy = wiphy(ifname)
+        return any(dev.role == 'ap' and (dev.ifname == ifname or (phy and wiphy(dev.ifname) == phy))
+                   for dev in self.snapshot().wifi())
+
+    @invalidates('nm:{ifname}', 'nm:devices')
+    @serialized(supersedes='link:{ifname}', superseded=(False, SUPERSEDED))
     def connect(self, ifname: str, ssid: str, psk: str) -> tuple[bool, str]:
         logging.info(f"Connecting to SSID {ssid} on {ifname}")
         if not ssid:
@@ -52,35 +168,92 @@ class WifiManager:
         if len(psk) < 8:
             logging.error("Password too short")
             return False, "Password must be at least 8 characters"
-        run_cmd(['nmcli', 'con', 'delete', ssid], timeout=5)
-        out = run_cmd([
-            'nmcli', 'con', 'add', 'type', 'wifi',
-            'ifname', ifname, 'con-name', ssid, 'ssid', ssid,
-            'wifi-sec.key-mgmt', 'wpa-psk', 'wifi-sec.psk', psk
-        ], timeout=15)
-        if "Error" in out or not out:
-            logging.error(f"Connection add failed: {out}")
-            return False, out
-
-        out2 = run_cmd(['nmcli', 'con', 'up', 'id', ssid, 'ifname', ifname], timeout=15)
+        self.credentials.set_disabled(ifname, False)
+        bssid = self._last_ap.get((ifname, ssid), (None, 0))[0] if self.pin_bssid else None
+        if self.nm is not None:
+            ok, result = nm_dbus.try_call(self.nm, 'activate_profile', ifname,
+                                          nm_dbus.wifi_settings(ifname, ssid, ssid, psk), bssid)
+            if ok:
+                success, msg = result
+                if not success:
+                    logging.error(f"Connection failed: {msg}")
+                    self._last_ap.pop((ifname, ssid), None)
+                    return False, msg
+                self._connected(ifname, ssid, psk)
+                return True, ""
+
+        # Reuse the saved profile: a cold delete/add costs NetworkManager a full new activation
+        wanted = dict(zip(PROFILE_FIELDS, (ifname, ssid, 'wpa-psk', psk)))
+        current = profile_settings(ssid)
+        if current is None:
+            out = run_cmd([
+                'nmcli', 'con', 'add', 'type', 'wifi',
+                'ifname', ifname, 'con-name', ssid, 'ssid', ssid,
+                'wifi-sec.key-mgmt', 'wpa-psk', 'wifi-sec.psk', psk
+            ], timeout=15)
+            if "Error" in out or not out:
+                logging.error(f"Connection add failed: {out}")
+                return False, out
+        else:
+            changes = [item for key, value in wanted.items() if current.get(key) != value for item in (key, value)]
+            if changes:
+                logging.info(f"Updating profile {ssid}: {', '.join(changes[::2])}")
+                out = run_cmd(['nmcli', 'con', 'modify', 'id', ssid] + changes, timeout=10)
+                if "Error" in out:
+                    logging.error(f"Connection modify failed: {out}")
+                    return False, out
+
+        up = ['nmcli', 'con', 'up', 'id', ssid, 'ifname', ifname]
+        out2 = run_cmd(up + ['ap', bssid] if bssid else up, timeout=15)
+        if "Error" in out2 and bssid:
+            logging.info(f"Activation pinned to {bssid} failed, retrying on any BSSID")
+            self._last_ap.pop((ifname, ssid), None)
+            out2 = run_cmd(up, timeout=15)
         if "Error" in out2:
             logging.error(f"Connection up failed: {out2}")
             return False, out2
 
+        self._connected(ifname, ssid, psk)
+        return True, ""
+
+    def _connected(self, ifname: str, ssid: str, psk: str):
         self.save_credentials(ifname, ssid, psk)
+        if self.pin_bssid:
+            # Refreshed on every connect, so a roam or a replaced AP never leaves a stale pin behind
+            ok, ap = nm_dbus.try_call(self.nm, 'active_access_point', ifname)
+            if not ok:
+                ap = parse_active_ap(run_cmd(['nmcli', '-t', '-f', 'IN-USE,BSSID,FREQ', 'device', 'wifi', 'list',
+                                              'ifname', ifname, '--rescan', 'no'], timeout=5))
+            if ap:
+                logging.debug(f"{ssid} on {ifname} is served by {ap[0]} at {ap[1]} MHz")
+                self._last_ap[(ifname, ssid)] = ap
+            else:
+                self._last_ap.pop((ifname, ssid), None)
         logging.info("Connection successful")
-        return True, ""
 
+    @invalidates('nm:{ifname}', 'nm:devices')
+    @serialized(supersedes='link:{ifname}')
     def disconnect(self, ifname: str = None) -> None:
         ifname = ifname or self.ifname
         logging.info(f"Disconnecting from {ifname}")
+        self.credentials.set_disabled(ifname, True)  # or reconcile would reconnect right away
         active = self.get_active_connection(ifname)
         if active:
-            run_cmd(['nmcli', 'con', 'down', 'id', active], timeout=5)
+            ok, _ = nm_dbus.try_call(self.nm, 'deactivate', active)
+            if not ok:
+                run_cmd(['nmcli', 'con', 'down', 'id', active], timeout=5)
             logging.info(f"Disconnected from {active}")
 
+    @cached(5, 'nm:{ifname}')
+    @serialized(coalesce=True)
     def get_active_connection(self, ifname: str = None) -> str:
         ifname = ifname or self.ifname
+        hit, dev = self._cached_device(ifname)
+        if hit:
+            return dev.connection if dev else ""
+        ok, name = nm_dbus.try_call(self.nm, 'active_connection', ifname)
+        if ok:
+            return name
         out = run_cmd(['nmcli', '-t', '-f', 'NAME,DEVICE', 'con', 'show', '--active'])
         for line in out.splitlines():
             name, dev = line.split(':', 1)
@@ -89,62 +262,39 @@ class WifiManager:
                 return name
         return ""
 
+    @cached(5, 'nm:devices')
+    def snapshot(self) -> DeviceSnapshot:
+        """Type, state, connection, mode and SSID of every interface at once."""
+        if self.state is not None and self.state.ready.is_set():
+            return self.state.snapshot()
+        ok, snap = nm_dbus.try_call(self.nm, 'snapshot')
+        return snap if ok else load_snapshot()
+
     def get_status(self, ifname: str = None) -> dict:
         ifname = ifname or self.ifname
-        conn = self.get_active_connection(ifname)
-        if conn:
-            details = run_cmd(['nmcli', '-t', '-f', '802-11-wireless.mode,802-11-wireless.ssid', 'con', 'show', conn])
-            mode = ssid = ""
-            for line in details.splitlines():
-                if line.startswith('802-11-wireless.mode:'):
-                    mode = line.split(':', 1)[1]
-                elif line.startswith('802-11-wireless.ssid:'):
-                    ssid = line.split(':', 1)[1]
-            role = 'client' if 'infrastructure' in mode else 'ap'
-            logging.debug(f"Status for {ifname}: role={role}, ssid={ssid}")
-            return {'role': role, 'ssid': ssid}
-        logging.debug(f"Status for {ifname}: idle")
-        return {'role': 'idle', 'ssid': ''}
-
-    def _load_credentials(self) -> dict:
-        logging.debug(f"Loading credentials from {CRED_FILE}")
-        if os.path.exists(CRED_FILE):
-            try:
-                with open(CRED_FILE, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                logging.error(f"Failed to load credentials: {e}")
-                return {}
-        return {}
-
-    def _save_credentials(self, data: dict):
-        logging.debug(f"Saving credentials to {CRED_FILE}: {data}")
-        try:
-            os.makedirs(os.path.dirname(CRED_FILE), exist_ok=True)
-            with open(CRED_FILE, 'w') as f:
-                json.dump(data, f, indent=4)
-        except Exception as e:
-            logging.error(f"Failed to save credentials: {e}")
+        dev = self.snapshot().get(ifname)
+        if dev is None or dev.role == 'idle':
+            logging.debug(f"Status for {ifname}: idle")
+            return {'role': 'idle', 'ssid': ''}
+        logging.debug(f"Status for {ifname}: role={dev.role}, ssid={dev.ssid}")
+        return {'role': dev.role, 'ssid': dev.ssid}
 
     def save_credentials(self, ifname: str, ssid: str, psk: str):
         logging.info(f"Saving credentials for {ifname}, SSID: {ssid}")
-        creds = self._load_credentials()
-        creds[ifname] = {'ssid': ssid, 'psk': psk}
-        self._save_credentials(creds)
-
-    def load_credentials(self, ifname: str) -> tuple[str, str]:
-        creds = self._load_credentials()
-        return (
-            creds.get(ifname, {}).get('ssid', ''),
-            creds.get(ifname, {}).get('psk', '')
-        )
-
-    def monitor(self):
-        while True:
-            status = self.get_status()
-            if status['role'] == 'idle':
-                ssid, psk = self.load_credentials(self.ifname)
-                if ssid and psk:
-                    logging.info(f"Reconnecting to {ssid} on {self.ifname}")
-                    self.connect(self.ifname, ssid, psk)
-            time.sleep(60)
+        self.credentials.put(ifname, ssid, psk)
+
+    def load_credentials(self, ifname: str, ssid: str = None) -> tuple[str, str]:
+        return self.credentials.get(ifname, ssid)
+
+    @serialized(coalesce=True)
+    def reconcile(self, ifname: str = None) -> bool:
+        """One supervision step: reconnect to the saved network if the interface went idle."""
+        ifname = ifname or self.ifname
+        if self.credentials.is_disabled(ifname) or self.get_status(ifname)['role'] != 'idle':
+            return True
+        ssid, psk = self.load_credentials(ifname)
+        if not (ssid and psk):
+            return True
+        logging.info(f"Reconnecting to {ssid} on {ifname}")
+        ok, _ = self.connect(ifname, ssid, psk)
+        return ok
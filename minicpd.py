@@ -0,0 +1,168 @@
+"""
+minicpd: hosts the managers, their caches, the supervisor and the samplers
+in one long-running process and serves them over a Unix socket, so the Tk
+panel, cron jobs and SSH scripts share one set of state and one queue of
+nmcli/iptables/bluetoothctl commands.
+
+    sudo python3 minicpd.py --group caleb      # socket usable by root and group caleb
+
+Protocol: newline-delimited JSON-RPC 2.0 (see utils/rpc.py). Methods are
+'<manager>.<method>' with positional (list) or named (object) params,
+e.g. from a shell:
+
+    echo '{"jsonrpc":"2.0","id":1,"method":"wifi.get_status","params":["wlan0"]}' \\
+        | socat - UNIX-CONNECT:/run/minicp/minicpd.sock
+
+'rpc.methods' lists them all. After 'subscribe' with a list of topics the
+connection also receives {"method":"event","params":{"topic","data"}}:
+  nm       a NetworkManager device changed: ifname, old, new
+  clients  an AP client joined or left: ifname, event, client
+  scan     progress of a shared Wi-Fi scan: ifname, stage, networks/error
+Saved passwords are never served.
+"""
+import argparse
+import functools
+import inspect
+import logging
+import os
+import signal
+import threading
+
+from managers.wifi_manager import WifiManager
+from managers.router_manager import RouterManager
+from managers.bluetooth_manager import BluetoothManager
+from managers.nm_state import NMStateCache
+from managers.scan_service import ScanService
+from managers.supervisor import Supervisor
+from managers.throughput import ThroughputSampler
+from managers.firewall import check_ifname
+from utils.aio import DirectBridge
+from utils.cache import SHARED
+from utils.metrics import METRICS
+from utils.opqueue import LANES
+from utils.rpc import RpcError, RpcServer, INVALID_PARAMS, SOCKET_PATH
+
+METRICS_FILE = os.path.expanduser("~/.config/minicp/metrics.prom")
+
+WIFI_METHODS = ('list_adapters', 'scan_networks', 'connect', 'disconnect', 'get_active_connection',
+                'snapshot', 'get_status', 'save_credentials', 'reconcile')
+ROUTER_METHODS = ('start_ap', 'stop_ap', 'is_running', 'choose_channel', 'reevaluate_channel',
+                  'list_connected_devices', 'enable_internet_sharing', 'disable_internet_sharing',
+                  'save_credentials', 'reconcile')
+BT_METHODS = ('scan', 'pair', 'connect', 'disconnect', 'remove', 'get_paired', 'is_connected')
+
+
+def checked(fn):
+    """Reject malformed interface names (any *ifname argument) before they reach nmcli or iptables."""
+    sig = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        for name, value in sig.bind(*args, **kwargs).arguments.items():
+            if name.endswith('ifname') and value is not None:
+                try:
+                    check_ifname(value)
+                except ValueError as e:
+                    raise RpcError(INVALID_PARAMS, str(e))
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+class Daemon:
+    def __init__(self, socket_path: str = SOCKET_PATH, group: str = None, client_ifname: str = "wlan0",
+                 ap_ifname: str = "wlan1"):
+        self.nm_state   = NMStateCache().start()  # fed by `nmcli monitor`
+        self.wifi_mgr   = WifiManager(ifname=client_ifname, state=self.nm_state, backend="auto")
+        self.router_mgr = RouterManager(ifname=ap_ifname, state=self.nm_state, backend="auto",
+                                        scans=self.wifi_mgr.scans)
+        self.bt_mgr     = BluetoothManager(backend="auto")
+        self.throughput = ThroughputSampler().start()
+        self.supervisor = Supervisor()\
+            .add(f"wifi:{client_ifname}", client_ifname, self.wifi_mgr.reconcile)\
+            .add(f"ap:{ap_ifname}", ap_ifname, self.router_mgr.reconcile)\
+            .watch(self.nm_state)
+        # One scan per interface, whichever client asked for it
+        self.scan_service = ScanService(DirectBridge(), scans=self.wifi_mgr.scans)
+        self._scan_lock = threading.Lock()
+
+        self.server = RpcServer(socket_path, group=group)\
+            .expose('wifi', self.wifi_mgr, WIFI_METHODS)\
+            .expose('router', self.router_mgr, ROUTER_METHODS)\
+            .expose('bt', self.bt_mgr, BT_METHODS)\
+            .register('router.top_talkers', self.top_talkers)\
+            .register('throughput.info', lambda: {'ifnames': self.throughput.ifnames,
+                                                  'history': self.throughput.history})\
+            .register('throughput.series', self.throughput.series)\
+            .register('scan.start', self.start_scan)\
+            .register('scan.cancel', self.cancel_scan)\
+            .register('scan.is_scanning', self.scan_service.is_scanning)\
+            .register('supervisor.status', self.supervisor.status)\
+            .register('supervisor.kick', self.supervisor.kick)\
+            .register('cache.stats', SHARED.stats)\
+            .register('ops.stats', LANES.stats)
+        for name, fn in self.server.handlers.items():
+            self.server.handlers[name] = checked(fn)
+
+        self.nm_state.subscribe(lambda ifname, old, new: self.server.publish(
+            'nm', {'ifname': ifname, 'old': old, 'new': new}))
+        self.router_mgr.client_tracker(ap_ifname).subscribe(lambda event, client: self.server.publish(
+            'clients', {'ifname': ap_ifname, 'event': event, 'client': client}))
+
+    def top_talkers(self, ifname: str, minutes: int = 5, limit: int = 5) -> list[dict]:
+        return self.router_mgr.traffic(ifname).top_talkers(minutes, limit)
+
+    def start_scan(self, ifname: str) -> bool:
+        """Start or join the scan on ifname; results arrive as 'scan' events. True if joined."""
+        with self._scan_lock:
+            if self.scan_service.is_scanning(ifname):
+                return True
+
+            def publish(stage: str, **data):
+                self.server.publish('scan', {'ifname': ifname, 'stage': stage, **data})
+            self.scan_service.scan(
+                ifname,
+                on_partial=lambda networks: publish('partial', networks=networks),
+                on_done=lambda networks: publish('done', networks=networks),
+                on_error=lambda exc: publish('error', error=str(exc)),
+            )
+            return False
+
+    def cancel_scan(self, ifname: str) -> bool:
+        cancelled = self.scan_service.cancel(ifname)
+        if cancelled:
+            self.server.publish('scan', {'ifname': ifname, 'stage': 'cancelled'})
+        return cancelled
+
+    def run(self):
+        stopped = threading.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: stopped.set())
+        self.server.start()
+        try:
+            while not stopped.wait(1):
+                pass
+        finally:
+            logging.info("minicpd shutting down")
+            self.server.stop()
+            self.throughput.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', default=SOCKET_PATH, help="Unix socket path (default $MINICP_SOCKET or %(default)s)")
+    parser.add_argument('--group', help="group allowed to use the socket besides the owner")
+    parser.add_argument('--client-ifname', default="wlan0", help="interface kept connected as Wi-Fi client")
+    parser.add_argument('--ap-ifname', default="wlan1", help="interface serving the access point")
+    args = parser.parse_args()
+
+    # MINICP_METRICS=1 records command timings, MINICP_METRICS_PORT also serves them on localhost
+    if os.environ.get('MINICP_METRICS_PORT'):
+        METRICS.serve(int(os.environ['MINICP_METRICS_PORT']))
+    if METRICS.enabled:
+        signal.signal(signal.SIGUSR1, lambda *_: METRICS.dump(METRICS_FILE))  # kill -USR1 to dump
+
+    Daemon(args.socket, args.group, args.client_ifname, args.ap_ifname).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The managers are imported as top-level packages, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import pytest
+
+from managers.channel_select import best_channel, score_channels
+from managers.router_manager import RouterManager
+from managers.wifi_manager import parse_bss
+
+# Recorded `nmcli -t -f SSID,BSSID,SIGNAL,SECURITY,CHAN,FREQ device wifi list` output
+CAFE = r"""
+CafeGuest:A4\:2B\:B0\:11\:22\:01:82:WPA2:1:2412 MHz
+CafeGuest:A4\:2B\:B0\:11\:22\:02:64:WPA2:1:2412 MHz
+Printer-3F:DC\:A6\:32\:00\:00\:07:40:WPA2:3:2422 MHz
+Office:F0\:9F\:C2\:AA\:BB\:01:71:WPA2 WPA3:6:2437 MHz
+Office-5G:F0\:9F\:C2\:AA\:BB\:02:58:WPA2 WPA3:36:5180 MHz
+"""
+QUIET = r"""
+Neighbour:00\:11\:22\:33\:44\:55:20:WPA2:13:2472 MHz
+"""
+OWN = r"""
+MiniCP:B8\:27\:EB\:00\:00\:01:95:WPA2:6:2437 MHz
+Office:F0\:9F\:C2\:AA\:BB\:01:30:WPA2:1:2412 MHz
+"""
+SIX_GHZ = r"""
+Lab6E:80\:AF\:CA\:00\:00\:01:90:WPA3:1:5955 MHz
+Lab6E:80\:AF\:CA\:00\:00\:02:90:WPA3:149:6695 MHz
+"""
+
+
+def test_parse_bss_keeps_every_bss():
+    networks = parse_bss(CAFE)
+    assert len(networks) == 5
+    assert networks[0] == {'ssid': 'CafeGuest', 'bssid': 'A4:2B:B0:11:22:01', 'signal': 82,
+                           'security': 'WPA2', 'channel': 1, 'freq': 2412}
+
+
+def test_overlap_falls_off_with_distance():
+    scores = score_channels([{'signal': 50, 'freq': 2437}])  # one BSS on channel 6
+    assert scores[6] == pytest.approx(2.0)
+    assert scores[5] == scores[7] == pytest.approx(1.6)
+    assert scores[4] == scores[8] == pytest.approx(1.2)
+    assert scores[2] == scores[10] == pytest.approx(0.4)
+    assert scores[1] == scores[11] == 0.0
+
+
+def test_busy_cafe_picks_far_channel():
+    scores = score_channels(parse_bss(CAFE))
+    assert best_channel(scores) == 11
+    assert scores[1] > scores[6] > scores[11]
+    assert set(score_channels(parse_bss(CAFE), 'a')) == {36, 40, 44, 48, 149, 153, 157, 161, 165}
+    assert best_channel(score_channels(parse_bss(CAFE), 'a')) == 40
+
+
+def test_ties_prefer_non_overlapping_channels():
+    assert best_channel(score_channels([])) == 1
+    # Channel 13 leaves 1..8 untouched; of those, 1 and 6 tie at zero and 1 wins
+    assert best_channel(score_channels(parse_bss(QUIET))) == 1
+    assert best_channel({3: 0.0, 6: 0.0, 9: 0.0}) == 6
+
+
+def test_six_ghz_bss_is_ignored():
+    networks = parse_bss(SIX_GHZ)
+    assert set(score_channels(networks).values()) == {0.0}
+    assert set(score_channels(networks, 'a').values()) == {0.0}
+
+
+def test_own_ssid_is_excluded():
+    router = RouterManager('wlan1', scans=SimpleNamespace(get=lambda ifname: parse_bss(OWN)))
+    channel, scores = router.choose_channel('wlan1', ssid='MiniCP')
+    # Our own AP on channel 6 does not push us off it
+    assert scores[6] == 0.0 < scores[1]
+    assert channel == 6
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+
+dbus = pytest.importorskip('dbus')
+
+from managers import nm_dbus
+from managers.nm_dbus import NMDBusBackend, wifi_settings
+
+
+class FakeConnection:
+    """A saved profile as GetSettings returns it: SSID as an array of dbus.Byte, not a ByteArray."""
+    def __init__(self, ssid: str, psk: str):
+        self.settings = dbus.Dictionary({
+            'connection': dbus.Dictionary({'id': ssid, 'type': '802-11-wireless', 'interface-name': 'wlan0'}),
+            '802-11-wireless': dbus.Dictionary({
+                'ssid': dbus.Array([dbus.Byte(b) for b in ssid.encode()], signature='y'),
+                'mode': 'infrastructure',
+            }),
+            '802-11-wireless-security': dbus.Dictionary({'key-mgmt': 'wpa-psk'}),
+            'ipv4': dbus.Dictionary({'method': 'auto'}),
+            'ipv6': dbus.Dictionary({'method': 'auto'}),
+        })
+        self.psk = psk
+        self.updates = []
+
+    def GetSettings(self, dbus_interface=None):
+        return self.settings
+
+    def GetSecrets(self, setting, dbus_interface=None):
+        return {setting: {'psk': self.psk}}
+
+    def Update(self, settings, dbus_interface=None):
+        self.updates.append(settings)
+
+
+def backend_with(conn: FakeConnection) -> NMDBusBackend:
+    backend = object.__new__(NMDBusBackend)
+    backend.bus = SimpleNamespace(get_object=lambda name, path: conn)
+    backend.nm = SimpleNamespace(ActivateConnection=lambda *args: '/active/1')
+    backend._find_connections = lambda conn_id: ['/settings/1']
+    backend._device_path = lambda ifname: '/devices/wlan0'
+    backend._wait_activated = lambda active, timeout: (True, "")
+    return backend
+
+
+def test_unchanged_profile_is_not_rewritten():
+    conn = FakeConnection('Home', 'password1')
+    ok, _ = backend_with(conn).activate_profile('wlan0', wifi_settings('wlan0', 'Home', 'Home', 'password1'))
+    assert ok
+    assert conn.updates == []
+
+
+def test_changed_password_updates_profile():
+    conn = FakeConnection('Home', 'password1')
+    backend_with(conn).activate_profile('wlan0', wifi_settings('wlan0', 'Home', 'Home', 'password2'))
+    assert len(conn.updates) == 1
+    assert conn.updates[0]['802-11-wireless-security']['psk'] == 'password2'
+
+
+def test_ssid_comparison_normalizes_byte_arrays():
+    assert nm_dbus._same_setting(dbus.Array([dbus.Byte(0x48), dbus.Byte(0x69)], signature='y'), dbus.ByteArray(b'Hi'))
+    assert not nm_dbus._same_setting(dbus.Array([dbus.Byte(0x48)], signature='y'), dbus.ByteArray(b'Hi'))
@@ -1,58 +1,82 @@
 import tkinter as tk
 
+LAYOUTS = {
+    'lowercase': [
+        list("qwertyuiop"),
+        list("asdfghjkl"),
+        ['⇧']+list("zxcvbnm")+['⌫'],
+        ['123','@','.',' ','Enter','Close']
+    ],
+    'uppercase': [
+        list("QWERTYUIOP"),
+        list("ASDFGHJKL"),
+        ['⇧']+list("ZXCVBNM")+['⌫'],
+        ['123','@','.',' ','Enter','Close']
+    ],
+    'symbols': [
+        list("1234567890"),
+        list("!@#$%^&*()"),
+        ['ABC','-','=','_','+','{','}',':',"'",'⌫'],
+        ['"',',','.','<','>','/','?',' ','Enter','Close']
+    ]
+}
+
 class KeyboardPopup(tk.Toplevel):
-    """On‑screen keyboard optimized for 480×240."""
-    def __init__(self, master, target_entry, on_close_callback=None):
+    """
+    On‑screen keyboard optimized for 480×240. All layouts are built once and
+    switched by raising their frame; the window is hidden rather than
+    destroyed, so one instance can be retargeted to any Entry.
+    """
+    def __init__(self, master):
         super().__init__(master)
+        self.withdraw()
         self.title("Keyboard")
         self.geometry("480x240")
         self.resizable(False, False)
-        self.target_entry = target_entry
-        self.on_close_callback = on_close_callback
-        self.input_var = tk.StringVar(value=target_entry.get())
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.target_entry = None
+        self.on_close_callback = None
+        self.input_var = tk.StringVar()
         self.mode = 'lowercase'
 
         tk.Entry(self, textvariable=self.input_var, font=("Arial", 12)).pack(fill=tk.X, padx=5, pady=5)
         self.frame = tk.Frame(self)
         self.frame.pack()
+        self.frame.grid_rowconfigure(0, weight=1)
+        self.frame.grid_columnconfigure(0, weight=1)
 
-        self.layouts = {
-            'lowercase': [
-                list("qwertyuiop"),
-                list("asdfghjkl"),
-                ['⇧']+list("zxcvbnm")+['⌫'],
-                ['123','@','.',' ','Enter','Close']
-            ],
-            'uppercase': [
-                list("QWERTYUIOP"),
-                list("ASDFGHJKL"),
-                ['⇧']+list("ZXCVBNM")+['⌫'],
-                ['123','@','.',' ','Enter','Close']
-            ],
-            'symbols': [
-                list("1234567890"),
-                list("!@#$%^&*()"),
-                ['ABC','-','=','_','+','{','}',':',"'",'⌫'],
-                ['"',',','.','<','>','/','?',' ','Enter','Close']
-            ]
-        }
-        self.render()
+        self.layout_frames = {mode: self.build_layout(rows) for mode, rows in LAYOUTS.items()}
+        self.show_layout(self.mode)
 
-    def render(self):
-        for w in self.frame.winfo_children(): w.destroy()
-        for row in self.layouts[self.mode]:
-            rowf = tk.Frame(self.frame)
+    def build_layout(self, rows) -> tk.Frame:
+        layout = tk.Frame(self.frame)
+        layout.grid(row=0, column=0, sticky="nsew")
+        for row in rows:
+            rowf = tk.Frame(layout)
             rowf.pack(fill=tk.X, pady=1)
             for key in row:
                 tk.Button(
                     rowf, text=key, font=("Arial",10),
                     command=lambda k=key: self.on_key(k)
                 ).pack(side=tk.LEFT, expand=True, fill=tk.BOTH, padx=1, pady=1)
+        return layout
+
+    def show_layout(self, mode: str):
+        self.mode = mode
+        self.layout_frames[mode].tkraise()
+
+    def open(self, target_entry, on_close_callback=None):
+        """Attach to target_entry and show the keyboard."""
+        self.target_entry = target_entry
+        self.on_close_callback = on_close_callback
+        self.input_var.set(target_entry.get())
+        self.show_layout('lowercase')
+        self.deiconify()
+        self.lift()
 
     def on_key(self, key):
         if key in ('⇧','123','ABC'):
-            self.mode = {'⇧':'uppercase','123':'symbols','ABC':'lowercase'}[key]
-            self.render()
+            self.show_layout({'⇧':'uppercase','123':'symbols','ABC':'lowercase'}[key])
         elif key == '⌫':
             self.input_var.set(self.input_var.get()[:-1])
         elif key == 'Enter':
@@ -63,9 +87,21 @@ class KeyboardPopup(tk.Toplevel):
             self.input_var.set(self.input_var.get() + key)
 
     def commit(self):
-        self.target_entry.delete(0,tk.END)
-        self.target_entry.insert(0,self.input_var.get())
+        if self.target_entry is not None and self.target_entry.winfo_exists():
+            self.target_entry.delete(0,tk.END)
+            self.target_entry.insert(0,self.input_var.get())
 
     def close(self):
-        if self.on_close_callback: self.on_close_callback()
-        self.destroy()
+        callback, self.on_close_callback = self.on_close_callback, None
+        self.target_entry = None
+        self.withdraw()
+        if callback: callback()
+
+
+def shared_keyboard(widget) -> KeyboardPopup:
+    """The application's single keyboard, built on first use."""
+    root = widget.winfo_toplevel()._root()
+    keyboard = getattr(root, '_minicp_keyboard', None)
+    if keyboard is None or not keyboard.winfo_exists():
+        keyboard = root._minicp_keyboard = KeyboardPopup(root)
+    return keyboard
@@ -0,0 +1,52 @@
+import logging
+import time
+import tkinter as tk
+from tkinter import ttk
+
+
+def after_paint(widget, fn):
+    """
+    Call fn once widget has been drawn for the first time, so slow data
+    fetches never hold back the first paint of a window or tab.
+    """
+    def on_expose(event=None):
+        widget.unbind('<Expose>', bind_id)
+        # Tk redraws at idle time after the Expose, queue fn behind it
+        widget.after_idle(fn)
+
+    if widget.winfo_viewable():
+        widget.after_idle(fn)
+        return
+    bind_id = widget.bind('<Expose>', on_expose, add='+')
+
+
+class LazyNotebook(ttk.Notebook):
+    """
+    Notebook whose tab frames are built the first time their tab is
+    selected. add_lazy() puts an empty placeholder in the tab; the factory
+    is called with that placeholder as master on <<NotebookTabChanged>>.
+    """
+    def __init__(self, master, **kw):
+        super().__init__(master, **kw)
+        self._factories = {}  # placeholder path -> factory(master) -> frame
+        self.frames = {}      # placeholder path -> built frame
+        self.bind('<<NotebookTabChanged>>', lambda e: self.build(self.select()))
+
+    def add_lazy(self, factory, **kw):
+        placeholder = tk.Frame(self)
+        self.add(placeholder, **kw)
+        self._factories[str(placeholder)] = factory
+        return placeholder
+
+    def build(self, tab_id):
+        """Build the frame of a tab now (no-op if it already exists). Returns the frame."""
+        tab_id = str(tab_id)
+        factory = self._factories.pop(tab_id, None)
+        if factory is None:
+            return self.frames.get(tab_id)
+        start = time.monotonic()
+        frame = factory(self.nametowidget(tab_id))
+        frame.pack(fill=tk.BOTH, expand=True)
+        self.frames[tab_id] = frame
+        logging.debug(f"Built tab {self.tab(tab_id, 'text')!r} in {(time.monotonic() - start) * 1000:.0f} ms")
+        return frame
@@ -1,43 +1,213 @@
+import asyncio
+import logging
+import time
 import tkinter as tk
-from tkinter import ttk
+from tkinter import messagebox, ttk
+from ui.sparkline import Sparkline, fmt_rate
+from managers.remote import DAEMON_ERRORS
 
 class OverviewFrame(tk.Frame):
+    REFRESH_MS = 5000
+    THROUGHPUT_MS = 1000
+
     def __init__(self, master, app):
         super().__init__(master)
         self.app = app
+        self._after_id = None
+        self._fetching = False  # a background fetch is in flight; its callback schedules the next one
+        self.stale = False  # rows show the persisted last-known state, not live data
+        # Keyed widget model: only rows whose data changed are touched on refresh
+        self.wifi_rows = {}  # ifname -> {'frame', 'label', 'detail', 'button', 'data'}
+        self.bt_rows = {}    # mac -> {'label', 'data'}
+
         tk.Label(self, text="Device Status", font=("Arial", 14, "bold")).pack(pady=10)
+        self.stale_lbl = tk.Label(self, font=("Arial", 10), fg="grey")
         self.container = tk.Frame(self)
         self.container.pack(fill=tk.BOTH, expand=True)
-        self.update_status()
+        tk.Label(self.container, text="Wi‑Fi Devices", font=("Arial", 12, "bold")).pack(pady=5)
+        self.wifi_box = tk.Frame(self.container)
+        self.wifi_box.pack(fill=tk.X)
+        tk.Label(self.container, text="Bluetooth Devices", font=("Arial", 12, "bold")).pack(pady=5)
+        self.bt_box = tk.Frame(self.container)
+        self.bt_box.pack(fill=tk.X)
+        tk.Label(self.container, text="Throughput", font=("Arial", 12, "bold")).pack(pady=5)
+        self.rate_rows = {}  # ifname -> (sparkline, rate label)
+        for ifname in self.app.throughput.ifnames:
+            frame = tk.Frame(self.container)
+            frame.pack(fill=tk.X)
+            tk.Label(frame, text=ifname, font=("Arial", 10), width=6, anchor="w").pack(side=tk.LEFT)
+            spark = Sparkline(frame, points=self.app.throughput.history)
+            spark.pack(side=tk.LEFT, padx=5)
+            rate = tk.Label(frame, font=("Arial", 10), anchor="w")
+            rate.pack(side=tk.LEFT)
+            self.rate_rows[ifname] = (spark, rate)
+        self.after(self.THROUGHPUT_MS, self.update_throughput)
+        # The app paints the last known state, then fetches live state in the background after first paint
 
     def update_status(self):
-        for w in self.container.winfo_children():
-            w.destroy()
+        """Refresh in the background: nmcli or the daemon may be slow, the Tk thread must not wait for them."""
+        if self._after_id:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        if self._fetching:
+            return
+        self._fetching = True
+        self.app.bridge.submit(asyncio.to_thread(self.fetch_status), self._fetched, self._fetch_failed)
 
-        # Wi‑Fi
-        tk.Label(self.container, text="Wi‑Fi Devices", font=("Arial", 12, "bold")).pack(pady=5)
-        status = self.app.wifi_mgr.get_status()
+    def _fetched(self, status: tuple[dict, dict]):
+        self._fetching = False
+        self.apply_status(status)
+
+    def _fetch_failed(self, exc: Exception):
+        self._fetching = False
+        self.fetch_failed(exc)
+
+    def fetch_failed(self, exc: Exception):
+        """A status fetch raised: show the daemon as unavailable, or log it, and retry on schedule."""
+        if isinstance(exc, DAEMON_ERRORS):
+            self.show_unavailable(exc)
+            return
+        logging.error(f"Status refresh failed: {exc!r}")
+        self._after_id = self.after(self.REFRESH_MS, self.update_status)
+
+    def fetch_status(self) -> tuple[dict, dict]:
+        """Live (wifi, bluetooth) state; blocking, safe to run off the Tk thread."""
+        wifi = self.app.wifi_mgr.snapshot().status()
+        bluetooth = {
+            mac: (name, self.app.bt_mgr.is_connected(mac))
+            for mac, name in self.app.bt_mgr.get_paired()
+        }
+        return wifi, bluetooth
+
+    def apply_status(self, status: tuple[dict, dict]):
+        """Paint live state, persist it as the last known one and schedule the next refresh."""
+        wifi, bluetooth = status
+        if self.stale:
+            self._set_stale(False)
+        self._sync_wifi(wifi)
+        self._sync_bluetooth(bluetooth)
+        self.app.last_state.save(wifi, bluetooth)
+        if self._after_id:
+            self.after_cancel(self._after_id)
+        self._after_id = self.after(self.REFRESH_MS, self.update_status)
+
+    def show_last_known(self, last: dict):
+        """Paint the persisted state greyed out until the first live refresh arrives."""
+        self._sync_wifi(last['wifi'])
+        self._sync_bluetooth(last['bluetooth'])
+        saved = time.strftime('%H:%M', time.localtime(last['saved_at']))
+        self.stale_lbl.config(text=f"Last known state ({saved}), updating…")
+        self._set_stale(True)
+
+    def show_unavailable(self, exc: Exception):
+        """Grey the rows out while minicpd does not answer and retry on the usual schedule."""
+        logging.warning(f"Status refresh failed: {exc}")
+        self.stale_lbl.config(text="minicpd unavailable, retrying…")
+        self._set_stale(True)
+        self._after_id = self.after(self.REFRESH_MS, self.update_status)
+
+    def _set_stale(self, stale: bool):
+        self.stale = stale
+        if stale:
+            self.stale_lbl.pack(before=self.container)
+        else:
+            self.stale_lbl.pack_forget()
+        fg = "grey" if stale else "black"
+        for row in self.wifi_rows.values():
+            row['label'].config(fg=fg)
+            row['detail'].config(fg=fg)
+            row['button'].config(state="disabled" if stale else "normal")
+        for row in self.bt_rows.values():
+            row['label'].config(fg=fg)
+
+    def update_throughput(self):
+        """Move the rx/tx sparklines to the latest samples; skipped while the tab is hidden."""
+        self.after(self.THROUGHPUT_MS, self.update_throughput)
+        if not self.winfo_ismapped():
+            return
+        for ifname, (spark, rate) in self.rate_rows.items():
+            try:
+                rx, tx = self.app.throughput.series(ifname)
+            except DAEMON_ERRORS:
+                return  # the status refresh reports the daemon as unavailable
+            spark.plot(rx, tx)
+            if rx:
+                rate.config(text=f"↓{fmt_rate(rx[-1])} ↑{fmt_rate(tx[-1])}")
+
+    # Wi‑Fi
+
+    def _sync_wifi(self, status: dict):
+        for ifname in self.wifi_rows.keys() - status.keys():
+            self.wifi_rows.pop(ifname)['frame'].destroy()
         for ifname, info in status.items():
-            frame = tk.Frame(self.container)
-            frame.pack(fill=tk.X, pady=2)
-            # Ensure info is a dict, not a string
-            if isinstance(info, dict):
-                tk.Label(frame, text=f"{ifname}: {info.get('role', 'unknown')}", font=("Arial", 12)).pack(side=tk.LEFT)
-                if info.get('role') == 'client':
-                    tk.Label(frame, text=f"Connected to {info.get('ssid', 'unknown')}", font=("Arial", 12)).pack(side=tk.LEFT, padx=5)
-                    tk.Button(frame, text="Disconnect", command=lambda i=ifname: self.app.wifi_mgr.disconnect(i), font=("Arial", 12), width=10, height=2)\
-                        .pack(side=tk.RIGHT)
-                elif info.get('role') == 'ap':
-                    tk.Label(frame, text=f"AP SSID: {info.get('ssid', 'unknown')}", font=("Arial", 12)).pack(side=tk.LEFT, padx=5)
-                    tk.Button(frame, text="Stop AP", command=lambda i=ifname: self.app.router_mgr.stop_ap(i), font=("Arial", 12), width=10, height=2)\
-                        .pack(side=tk.RIGHT)
-            else:
-                # fallback for string info
-                tk.Label(frame, text=f"{ifname}: {info}", font=("Arial", 12)).pack(side=tk.LEFT)
-
-        # Bluetooth
-        tk.Label(self.container, text="Bluetooth Devices", font=("Arial", 12, "bold")).pack(pady=5)
-        paired = self.app.bt_mgr.get_paired()
-        for mac, name in paired:
-            connected = self.app.bt_mgr.is_connected(mac)
-            tk.Label(self.container, text=f"{name} ({mac}): {'✔' if connected else '✘'}", font=("Arial", 12)).pack()
+            data = (info.get('role', 'unknown'), info.get('ssid', ''))
+            row = self.wifi_rows.get(ifname) or self._add_wifi_row(ifname)
+            if row['data'] != data:
+                self._render_wifi_row(ifname, row, *data)
+                row['data'] = data
+
+    def _add_wifi_row(self, ifname: str) -> dict:
+        frame = tk.Frame(self.wifi_box)
+        frame.pack(fill=tk.X, pady=2)
+        row = {
+            'frame': frame,
+            'label': tk.Label(frame, font=("Arial", 12)),
+            'detail': tk.Label(frame, font=("Arial", 12)),
+            'button': tk.Button(frame, font=("Arial", 12), width=10, height=2,
+                                command=lambda i=ifname: self._wifi_action(i)),
+            'data': None,
+        }
+        row['label'].pack(side=tk.LEFT)
+        self.wifi_rows[ifname] = row
+        return row
+
+    def _render_wifi_row(self, ifname: str, row: dict, role: str, ssid: str):
+        row['label'].config(text=f"{ifname}: {role}")
+        if role in ('client', 'ap'):
+            text = f"Connected to {ssid or 'unknown'}" if role == 'client' else f"AP SSID: {ssid or 'unknown'}"
+            row['detail'].config(text=text)
+            row['detail'].pack(side=tk.LEFT, padx=5)
+            row['button'].config(text="Disconnect" if role == 'client' else "Stop AP")
+            row['button'].pack(side=tk.RIGHT)
+        else:
+            row['detail'].pack_forget()
+            row['button'].pack_forget()
+
+    def _wifi_action(self, ifname: str):
+        """Disconnect or stop the AP in the background, then refresh; the button is off meanwhile."""
+        row = self.wifi_rows[ifname]
+        role = row['data'][0]
+        if role == 'client':
+            action = lambda: self.app.wifi_mgr.disconnect(ifname)
+        elif role == 'ap':
+            action = lambda: self.app.router_mgr.stop_ap(ifname)
+        else:
+            return
+        row['button'].config(state="disabled")
+        self.app.bridge.submit(asyncio.to_thread(action),
+                               lambda _: self._action_done(ifname),
+                               lambda exc: self._action_done(ifname, exc))
+
+    def _action_done(self, ifname: str, exc: Exception = None):
+        row = self.wifi_rows.get(ifname)
+        if row is not None:
+            row['button'].config(state="normal")
+        if exc is not None:
+            logging.error(f"Wi‑Fi action on {ifname} failed: {exc!r}")
+            messagebox.showerror("Wi‑Fi Error", str(exc))
+        self.update_status()
+
+    # Bluetooth
+
+    def _sync_bluetooth(self, devices: dict):
+        for mac in self.bt_rows.keys() - devices.keys():
+            self.bt_rows.pop(mac)['label'].destroy()
+        for mac, data in devices.items():
+            row = self.bt_rows.get(mac)
+            if row is None:
+                row = self.bt_rows[mac] = {'label': tk.Label(self.bt_box, font=("Arial", 12)), 'data': None}
+                row['label'].pack()
+            if row['data'] != data:
+                name, connected = data
+                row['label'].config(text=f"{name} ({mac}): {'✔' if connected else '✘'}")
+                row['data'] = data
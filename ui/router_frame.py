@@ -1,12 +1,19 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
-from ui.keyboard import KeyboardPopup
+from ui.keyboard import shared_keyboard
+from ui.lazy import after_paint
+from ui.sparkline import fmt_rate
+from managers.traffic import WINDOWS
+from managers.channel_select import CHANNELS
+from managers.remote import DAEMON_ERRORS
+
 
 class RouterSetupFrame(tk.Frame):
+    TALKERS_MS = 5000
+
     def __init__(self, master, app):
         super().__init__(master)
         self.app = app
-        self.keyboard_popup = None
         self.keyboard_lock = False
         self.build_ui()
 
@@ -26,8 +33,6 @@ class RouterSetupFrame(tk.Frame):
         tk.Button(self, text="Refresh", command=self.refresh_ifaces, font=("Arial", 10), width=10, height=2)\
             .grid(row=1, column=2, sticky="ew", padx=5, pady=5)
 
-        self.refresh_ifaces()
-
         # SSID & PSK
         tk.Label(self, text="SSID:", font=("Arial", 10)).grid(row=2, column=0, sticky="w", padx=5, pady=5)
         self.ssid_entry = tk.Entry(self, font=("Arial", 10))
@@ -38,7 +43,13 @@ class RouterSetupFrame(tk.Frame):
         tk.Label(self, text="Band:", font=("Arial", 10)).grid(row=4, column=0, sticky="w", padx=5, pady=5)
         self.band_var = tk.StringVar(value="bg")
         self.band_cb = ttk.Combobox(self, textvariable=self.band_var, values=["bg", "a"], state="readonly", font=("Arial", 10))
-        self.band_cb.grid(row=4, column=1, columnspan=2, sticky="ew", padx=5, pady=5)
+        self.band_cb.grid(row=4, column=1, sticky="ew", padx=5, pady=5)
+        self.band_cb.bind("<<ComboboxSelected>>", lambda e: self._band_changed())
+        # 'auto' scores every channel of the band from a scan and takes the least congested
+        self.channel_var = tk.StringVar(value="auto")
+        self.channel_cb = ttk.Combobox(self, textvariable=self.channel_var, state="readonly", font=("Arial", 10), width=6)
+        self.channel_cb.grid(row=4, column=2, sticky="ew", padx=5, pady=5)
+        self._band_changed()
         self.psk_entry = tk.Entry(self, show="*", font=("Arial", 10))
         self.psk_entry.grid(row=3, column=1, columnspan=2, sticky="ew", padx=5, pady=5)
         self.psk_entry.bind('<FocusIn>', lambda e: self.open_keyboard(self.psk_entry))
@@ -49,9 +60,23 @@ class RouterSetupFrame(tk.Frame):
         tk.Button(self, text="Stop AP", bg="red", fg="white", command=self.stop_ap, font=("Arial", 10), width=10, height=2)\
             .grid(row=5, column=1, columnspan=2, padx=5, pady=5, sticky="ew")
 
+        # Top talkers
+        tk.Label(self, text="Top talkers:", font=("Arial", 10)).grid(row=6, column=0, sticky="w", padx=5, pady=5)
+        self.window_var = tk.StringVar(value=f"{WINDOWS[1]} min")
+        ttk.Combobox(self, textvariable=self.window_var, values=[f"{m} min" for m in WINDOWS],
+                     state="readonly", font=("Arial", 10), width=8)\
+            .grid(row=6, column=1, sticky="w", padx=5, pady=5)
+        self.window_var.trace_add('write', lambda *_: self.refresh_talkers(reschedule=False))
+        self.talkers = tk.Listbox(self, height=4, font=("Arial", 10))
+        self.talkers.grid(row=7, column=0, columnspan=3, sticky="ew", padx=5, pady=5)
+        self._talkers_after = None
+
         for c in range(3):
             self.grid_columnconfigure(c, weight=1)
 
+        after_paint(self, self.refresh_ifaces)  # nmcli runs after the tab is drawn
+        after_paint(self, self.refresh_talkers)
+
     def refresh_ifaces(self):
         adapters = self.app.wifi_mgr.list_adapters()
         self.iface_cb['values'] = adapters
@@ -68,13 +93,19 @@ class RouterSetupFrame(tk.Frame):
         if not (ifname and ssid and psk):
             messagebox.showwarning("Input Error", "Adapter, SSID and Password required.")
             return
-        ok, msg = self.app.router_mgr.start_ap(ifname, ssid, psk)
+        channel = self.channel_var.get()
+        ok, msg = self.app.router_mgr.start_ap(ifname, ssid, psk, self.band_var.get(),
+                                               'auto' if channel == 'auto' else int(channel))
         if not ok:
             messagebox.showerror("AP Error", msg)
         else:
             messagebox.showinfo("Access Point", f"AP started on {ifname}")
         self.update_status()
 
+    def _band_changed(self):
+        self.channel_cb['values'] = ['auto'] + [str(c) for c in CHANNELS[self.band_var.get()]]
+        self.channel_var.set('auto')
+
     def stop_ap(self):
         ifname = self.iface_var.get()
         self.app.router_mgr.stop_ap(ifname)
@@ -84,22 +115,47 @@ class RouterSetupFrame(tk.Frame):
     def update_status(self):
         ifname = self.iface_var.get()
         if ifname:
-            running = self.app.router_mgr.is_running(ifname)
+            try:
+                running = self.app.router_mgr.is_running(ifname)
+            except DAEMON_ERRORS:
+                self.status_lbl.config(text="Daemon unavailable")
+                return
             self.status_lbl.config(text="Running" if running else "Stopped")
         else:
             self.status_lbl.config(text="No Adapter")
 
+    def refresh_talkers(self, reschedule: bool = True):
+        """Show the busiest AP clients; polls only while the tab is visible."""
+        if reschedule:
+            self._talkers_after = self.after(self.TALKERS_MS, self.refresh_talkers)
+        ifname = self.iface_var.get()
+        if not (self.winfo_ismapped() and ifname):
+            return
+        minutes = int(self.window_var.get().split()[0])
+        try:
+            if not self.app.router_mgr.is_running(ifname):
+                return
+            talkers = self.app.router_mgr.traffic(ifname).top_talkers(minutes)
+        except DAEMON_ERRORS:
+            return  # tried again on the next poll
+        rows = [
+            f"{t['hostname'] or t['ip']:<16} ↓{fmt_rate(t['down_bps'])} ↑{fmt_rate(t['up_bps'])}"
+            for t in talkers
+        ]
+        if list(self.talkers.get(0, tk.END)) != rows:
+            self.talkers.delete(0, tk.END)
+            for row in rows:
+                self.talkers.insert(tk.END, row)
+
     def open_keyboard(self, entry):
         if self.keyboard_lock:
             return
-        if self.keyboard_popup and self.keyboard_popup.winfo_exists():
-            self.keyboard_popup.destroy()
 
         def unlock():
             self.keyboard_lock = False
 
-        self.keyboard_popup = KeyboardPopup(
-            self.master, entry,
+        shared_keyboard(self).open(
+            entry,
             on_close_callback=lambda: [
                 self.master.focus_set(), setattr(self, 'keyboard_lock', True),
                 self.master.after(500, unlock)
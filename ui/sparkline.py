@@ -0,0 +1,40 @@
+import tkinter as tk
+
+
+def fmt_rate(bps: float) -> str:
+    """Bytes per second for humans, e.g. 1.5 kB/s."""
+    for unit in ('B/s', 'kB/s', 'MB/s'):
+        if bps < 1000 or unit == 'MB/s':
+            return f"{bps:.0f} {unit}" if unit == 'B/s' else f"{bps:.1f} {unit}"
+        bps /= 1000
+
+
+class Sparkline(tk.Canvas):
+    """
+    Tiny line chart of one or more series sharing a y scale. The line
+    items are created once with a fixed number of points; plot() only
+    moves their coordinates, so redrawing every second stays cheap.
+    """
+    def __init__(self, master, points: int = 60, colors=('#1f77b4', '#ff7f0e'), floor: float = 1000,
+                 width: int = 180, height: int = 28, **kw):
+        super().__init__(master, width=width, height=height, highlightthickness=0, **kw)
+        self.points = points
+        self.floor = floor  # y scale never zooms in below this, so idle links stay flat
+        self._height = height
+        self._xs = [i * (width - 1) / (points - 1) for i in range(points)]
+        flat = self._coords([0] * points, 1)
+        self.lines = [self.create_line(*flat, fill=color, width=1) for color in colors]
+
+    def _coords(self, values, scale) -> list[float]:
+        coords = []
+        for x, v in zip(self._xs, values):
+            coords += (x, self._height - 1 - v / scale * (self._height - 2))
+        return coords
+
+    def plot(self, *series):
+        """One list of values per line, oldest first; shorter lists are padded on the left."""
+        scale = max([self.floor] + [max(s) for s in series if s])
+        for line, values in zip(self.lines, series):
+            values = values[-self.points:]
+            values = [0] * (self.points - len(values)) + values
+            self.coords(line, *self._coords(values, scale))
@@ -3,6 +3,7 @@ from tkinter import messagebox
 import os
 import subprocess
 import re
+import json
 
 class UsbManagerFrame(tk.Frame):
     def __init__(self, master, app):
@@ -53,7 +54,7 @@ class UsbManagerFrame(tk.Frame):
         devices = []
         try:
             output = subprocess.check_output(["lsblk", "-o", "NAME,LABEL,TYPE,MOUNTPOINT", "-J"]).decode()
-            data = eval(output)  # Parse JSON-like output
+            data = json.loads(output)
             for dev in data['blockdevices']:
                 if dev['type'] == 'disk' and any(p['type'] == 'part' for p in dev.get('children', [])):
                     for part in dev.get('children', []):
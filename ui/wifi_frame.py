@@ -1,12 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from ui.keyboard import KeyboardPopup
+from ui.keyboard import shared_keyboard
+from ui.lazy import after_paint
 
 class WifiManagerFrame(tk.Frame):
     def __init__(self, master, app):
         super().__init__(master)
         self.app = app
-        self.keyboard_popup = None
         self.keyboard_lock = False
         self.build_ui()
 
@@ -19,11 +19,11 @@ class WifiManagerFrame(tk.Frame):
         tk.Button(self, text="Refresh", command=self.refresh_ifaces, font=("Arial", 10), width=10, height=1)\
             .grid(row=0, column=2, sticky="ew", padx=5, pady=5)
 
-        self.refresh_ifaces()
-
         # Scan button and list
-        tk.Button(self, text="Scan", command=self.scan, font=("Arial", 10), width=10, height=1)\
-            .grid(row=1, column=0, padx=5, pady=5)
+        self.scan_btn = tk.Button(self, text="Scan", command=self.scan, font=("Arial", 10), width=10, height=1)
+        self.scan_btn.grid(row=1, column=0, padx=5, pady=5)
+        self.cancel_btn = tk.Button(self, text="Cancel", command=self.cancel_scan, font=("Arial", 10), width=10, height=1, state="disabled")
+        self.cancel_btn.grid(row=1, column=1, padx=5, pady=5)
         self.lst = tk.Listbox(self, height=3, font=("Arial", 10))
         self.lst.grid(row=2, column=0, columnspan=3, sticky="ew", padx=5, pady=5)
         self.lst.bind('<<ListboxSelect>>', self.on_select)  # Bind selection event
@@ -47,6 +47,8 @@ class WifiManagerFrame(tk.Frame):
         for c in range(3):
             self.grid_columnconfigure(c, weight=1)
 
+        after_paint(self, self.refresh_ifaces)  # nmcli runs after the tab is drawn
+
     def refresh_ifaces(self):
         adapters = self.app.wifi_mgr.list_adapters()
         self.iface_cb['values'] = adapters
@@ -56,16 +58,41 @@ class WifiManagerFrame(tk.Frame):
             self.iface_var.set('')
 
     def scan(self):
-        self.lst.delete(0, tk.END)
         ifname = self.iface_var.get()
         if not ifname:
             messagebox.showwarning("No Adapter", "Please select a Wi-Fi adapter.")
             return
-        nets = self.app.wifi_mgr.scan_networks(ifname)
-        print(f"Found {len(nets)} networks")
+        # Taps while a scan is running join it instead of starting another; the callbacks are registered once
+        joined = self.app.scan_service.scan(
+            ifname, on_partial=self.show_networks,
+            on_done=self._scan_done, on_error=self._scan_failed
+        )
+        if not joined:
+            self.lst.delete(0, tk.END)
+            self.lst.insert(tk.END, "Scanning...")
+        self.scan_btn.config(text="Scanning...")
+        self.cancel_btn.config(state="normal")
+
+    def cancel_scan(self):
+        self.app.scan_service.cancel(self.iface_var.get())
+        self._scan_finished()
+
+    def show_networks(self, nets):
+        self.lst.delete(0, tk.END)
         for net in nets:
-            self.lst.insert(tk.END, f"{net['ssid']} ({net['signal']}%)")
-            print(f"Network: {net['ssid']}, Signal: {net['signal']}%")
+            self.lst.insert(tk.END, f"{net['ssid']} ({net['signal']}%, ch {net['channel']})")
+
+    def _scan_done(self, nets):
+        self.show_networks(nets)
+        self._scan_finished()
+
+    def _scan_failed(self, exc):
+        self._scan_finished()
+        messagebox.showerror("Scan Error", str(exc))
+
+    def _scan_finished(self):
+        self.scan_btn.config(text="Scan")
+        self.cancel_btn.config(state="disabled")
 
     def on_select(self, event):
         """Autofill SSID when a network is selected from the list."""
@@ -92,14 +119,12 @@ class WifiManagerFrame(tk.Frame):
     def open_keyboard(self, entry):
         if self.keyboard_lock:
             return
-        if self.keyboard_popup and self.keyboard_popup.winfo_exists():
-            self.keyboard_popup.destroy()
 
         def unlock():
             self.keyboard_lock = False
 
-        self.keyboard_popup = KeyboardPopup(
-            self.master, entry,
+        shared_keyboard(self).open(
+            entry,
             on_close_callback=lambda: [
                 self.master.focus_set(), setattr(self, 'keyboard_lock', True),
                 self.master.after(500, unlock)
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import queue
+import threading
+
+
+class LoopThread:
+    """An asyncio event loop running in a daemon thread."""
+    def __init__(self, name: str = "minicp-asyncio"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine from any thread, return a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, fn, *args):
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=2)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def get_loop_thread() -> LoopThread:
+    """Process-wide loop shared by every background service."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LoopThread()
+        return _shared
+
+
+class DirectBridge:
+    """TkAsyncBridge stand-in for processes without Tk: post() calls fn right away, on the calling thread."""
+    def __init__(self, loop_thread: LoopThread = None):
+        self.loop_thread = loop_thread or get_loop_thread()
+
+    def post(self, fn, *args):
+        fn(*args)
+
+
+class TkAsyncBridge:
+    """
+    Lets the Tk mainloop and an asyncio loop run side by side. Coroutines run
+    on the loop thread; their callbacks are handed back to the Tk thread via
+    a queue drained with after(), since Tk must only be touched from there.
+    """
+    def __init__(self, root, loop_thread: LoopThread = None, poll_ms: int = 30):
+        self.root = root
+        self.loop_thread = loop_thread or get_loop_thread()
+        self.poll_ms = poll_ms
+        self._pending = queue.SimpleQueue()
+        self.root.after(self.poll_ms, self._drain)
+
+    @property
+    def loop(self):
+        return self.loop_thread.loop
+
+    def post(self, fn, *args):
+        """Run fn(*args) on the Tk thread. Safe to call from any thread."""
+        self._pending.put((fn, args))
+
+    def submit(self, coro, callback=None, errback=None):
+        """
+        Run coro on the asyncio loop. callback(result) or errback(exc) is
+        called on the Tk thread; cancellation calls neither.
+        """
+        fut = self.loop_thread.submit(coro)
+
+        def done(f):
+            if f.cancelled():
+                return
+            exc = f.exception()
+            if exc is not None:
+                if errback:
+                    self.post(errback, exc)
+                else:
+                    logging.error(f"Background task failed: {exc!r}")
+            elif callback:
+                self.post(callback, f.result())
+        fut.add_done_callback(done)
+        return fut
+
+    def _drain(self):
+        while True:
+            try:
+                fn, args = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception:
+                logging.exception("Tk callback failed")
+        self.root.after(self.poll_ms, self._drain)
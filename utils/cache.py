@@ -0,0 +1,124 @@
+import functools
+import inspect
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+class QueryCache:
+    """
+    Bounded LRU cache of read results with a TTL per entry. Every entry
+    carries tags such as 'nm:wlan0' so a mutating call can drop exactly the
+    entries it affects. A value whose tags were invalidated while it was
+    being fetched is returned to its caller but not stored, since it may
+    predate the change.
+    """
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (expires, tags, value)
+        self._lock = threading.Lock()
+        self._generations = Counter()  # tag -> invalidations so far
+        self._epoch = 0                # clears so far
+        self.hits = Counter()
+        self.misses = Counter()
+        self.invalidations = Counter()
+
+    def get_or_call(self, name: str, key, ttl: float, tags: tuple, fn):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits[name] += 1
+                return entry[2]
+            self.misses[name] += 1
+            before = (self._epoch, [self._generations[tag] for tag in tags])
+        value = fn()
+        with self._lock:
+            if (self._epoch, [self._generations[tag] for tag in tags]) != before:
+                return value
+            self._data[key] = (time.monotonic() + ttl, frozenset(tags), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, *tags: str):
+        tags = set(tags)
+        with self._lock:
+            stale = [k for k, (_, entry_tags, _) in self._data.items() if entry_tags & tags]
+            for k in stale:
+                del self._data[k]
+            for tag in tags:
+                self._generations[tag] += 1
+                self.invalidations[tag] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._epoch += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters per method, for tuning the TTLs."""
+        with self._lock:
+            methods = {
+                name: {'hits': self.hits[name], 'misses': self.misses[name]}
+                for name in self.hits.keys() | self.misses.keys()
+            }
+            return {'size': len(self._data), 'maxsize': self.maxsize,
+                    'methods': methods, 'invalidations': dict(self.invalidations)}
+
+
+# One cache shared by every manager unless they are given their own
+SHARED = QueryCache()
+
+
+def _call_args(sig, self, args, kwargs) -> dict:
+    bound = sig.bind(self, *args, **kwargs)
+    bound.apply_defaults()
+    values = dict(bound.arguments)
+    del values['self']
+    # `ifname=None` means "the manager's own interface"
+    if 'ifname' in values and values['ifname'] is None:
+        values['ifname'] = getattr(self, 'ifname', None)
+    return values
+
+
+def cached(ttl: float, *tags: str):
+    """
+    Cache a manager read method for ttl seconds, keyed on its arguments.
+    Tags are str.format templates over the arguments, e.g. 'nm:{ifname}'.
+    """
+    def decorator(method):
+        sig = inspect.signature(method)
+        name = method.__qualname__
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            values = _call_args(sig, self, args, kwargs)
+            cache = getattr(self, 'cache', None) or SHARED
+            key = (name, tuple(values.items()))
+            return cache.get_or_call(
+                name, key, ttl, [t.format(**values) for t in tags],
+                lambda: method(self, *args, **kwargs)
+            )
+        wrapper.uncached = method
+        return wrapper
+    return decorator
+
+
+def invalidates(*tags: str):
+    """Drop the cache entries carrying any of these tags once the mutating method returns."""
+    def decorator(method):
+        sig = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            values = _call_args(sig, self, args, kwargs)
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                cache = getattr(self, 'cache', None) or SHARED
+                cache.invalidate(*(t.format(**values) for t in tags))
+        return wrapper
+    return decorator
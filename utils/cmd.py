@@ -1,17 +1,143 @@
+import asyncio
+import os
+import signal
 import subprocess
+import time
+import weakref
+from dataclasses import dataclass
+from utils.metrics import METRICS, command_name
 
-def run_cmd(cmd, timeout=None):
+def run_cmd(cmd, timeout=None, input=None):
     """Run a shell command safely, return stdout or combined stderr, never hang."""
+    if not METRICS.enabled:
+        return _run(cmd, timeout, input)[0]
+    start = time.monotonic()
+    try:
+        output, timed_out, failed = _run(cmd, timeout, input)
+    except OSError:
+        METRICS.observe(cmd_family(cmd), command_name(cmd), time.monotonic() - start, failed=True)
+        raise
+    METRICS.observe(cmd_family(cmd), command_name(cmd), time.monotonic() - start, timed_out, failed)
+    return output
+
+
+def _run(cmd, timeout, input=None) -> tuple[str, bool, bool]:
+    """(output, timed out, exited non-zero)"""
     try:
         result = subprocess.run(
             cmd,
+            input=input,
             capture_output=True,
             text=True,
             timeout=timeout,
             check=True
         )
-        return result.stdout
+        return result.stdout, False, False
     except subprocess.TimeoutExpired:
-        return ""
+        return "", True, False
     except subprocess.CalledProcessError as e:
-        return (e.stdout or "") + (e.stderr or "")
+        return (e.stdout or "") + (e.stderr or ""), False, True
+
+
+# Max number of concurrent children per command family. NetworkManager and
+# bluez serialise most requests internally anyway, so piling more processes
+# on top of them only adds fork cost and lock contention.
+CONCURRENCY_LIMITS = {
+    'nmcli': 2,
+    'bluetoothctl': 1,
+    'iptables': 1,
+}
+DEFAULT_CONCURRENCY = 4
+
+# One semaphore set per event loop, dropped together with the loop
+_semaphores = weakref.WeakKeyDictionary()
+
+
+@dataclass(frozen=True)
+class CmdResult:
+    cmd: tuple
+    rc: int
+    stdout: str
+    stderr: str
+    duration: float
+    timed_out: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.rc == 0 and not self.timed_out
+
+    @property
+    def output(self) -> str:
+        """Same text run_cmd would have returned for this command."""
+        if self.timed_out:
+            return ""
+        if self.rc == 0:
+            return self.stdout
+        return self.stdout + self.stderr
+
+
+def cmd_family(cmd) -> str:
+    """Group a command by binary, e.g. iptables-restore -> iptables."""
+    return os.path.basename(cmd[0]).split('-', 1)[0]
+
+
+def _semaphore(family: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sems = _semaphores.setdefault(loop, {})
+    if family not in sems:
+        sems[family] = asyncio.Semaphore(CONCURRENCY_LIMITS.get(family, DEFAULT_CONCURRENCY))
+    return sems[family]
+
+
+def _kill_group(proc):
+    """Kill the child and anything it spawned (it leads its own session)."""
+    if proc.returncode is not None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def run_cmd_async(cmd, timeout=None) -> CmdResult:
+    """
+    Awaitable counterpart of run_cmd. Waits for a free slot of the command
+    family, never hangs past timeout and kills the whole process group when
+    the awaiting task is cancelled.
+    """
+    cmd = tuple(cmd)
+    result = await _run_cmd_async(cmd, timeout)
+    if METRICS.enabled:
+        METRICS.observe(cmd_family(cmd), command_name(cmd), result.duration, result.timed_out,
+                        not result.timed_out and result.rc != 0)
+    return result
+
+
+async def _run_cmd_async(cmd: tuple, timeout) -> CmdResult:
+    async with _semaphore(cmd_family(cmd)):
+        start = time.monotonic()
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True
+            )
+        except OSError as e:
+            return CmdResult(cmd, 127, "", str(e), time.monotonic() - start)
+        try:
+            out, err = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            _kill_group(proc)
+            await proc.wait()
+            return CmdResult(cmd, proc.returncode, "", "", time.monotonic() - start, timed_out=True)
+        except asyncio.CancelledError:
+            _kill_group(proc)
+            await asyncio.shield(proc.wait())
+            raise
+        return CmdResult(
+            cmd, proc.returncode,
+            out.decode(errors='replace'), err.decode(errors='replace'),
+            time.monotonic() - start
+        )
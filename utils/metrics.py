@@ -0,0 +1,151 @@
+import bisect
+import logging
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds; nmcli calls cluster around 20-200 ms, scans and
+# bluetooth pairing run into seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# nmcli global options that take a value, skipped when naming a command
+_NMCLI_VALUE_OPTS = {'-f', '--fields', '-g', '--get-values', '-w', '--wait', '-e', '--escape', '-c', '--colors'}
+
+
+def command_name(cmd) -> str:
+    """
+    Subcommand used as metrics label, e.g. ['nmcli', '-t', 'con', 'up', ...]
+    -> 'con up'. Only nmcli is split up; other argv carry IPs, MACs and
+    rule specs that would explode the number of series.
+    """
+    if os.path.basename(cmd[0]) != 'nmcli':
+        return ''
+    words, skip = [], False
+    for arg in cmd[1:]:
+        if skip:
+            skip = False
+        elif arg in _NMCLI_VALUE_OPTS:
+            skip = True
+        elif not arg.startswith('-'):
+            words.append(arg)
+            if len(words) == 2:
+                break
+    return ' '.join(words)
+
+
+class _Series:
+    __slots__ = ('buckets', 'count', 'total', 'timeouts', 'failures')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.timeouts = 0
+        self.failures = 0
+
+
+class Registry:
+    """
+    Process-wide latency histograms, call counts, timeouts and non-zero
+    exits per (command family, subcommand). Disabled unless MINICP_METRICS
+    is set or enable() is called; callers check `enabled` before timing
+    anything, so the disabled cost is one attribute read.
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._series = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def enable(self):
+        self.enabled = True
+        return self
+
+    def observe(self, family: str, command: str, duration: float, timed_out: bool = False, failed: bool = False):
+        key = (family, command)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            series.buckets[bisect.bisect_left(BUCKETS, duration)] += 1
+            series.count += 1
+            series.total += duration
+            series.timeouts += timed_out
+            series.failures += failed
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        with self._lock:
+            items = sorted(
+                (key, list(s.buckets), s.count, s.total, s.timeouts, s.failures)
+                for key, s in self._series.items()
+            )
+        hist = ["# HELP minicp_command_duration_seconds Wall time of external commands.",
+                "# TYPE minicp_command_duration_seconds histogram"]
+        calls = ["# HELP minicp_command_calls_total External commands run.",
+                 "# TYPE minicp_command_calls_total counter"]
+        timeouts = ["# HELP minicp_command_timeouts_total External commands that hit their timeout.",
+                    "# TYPE minicp_command_timeouts_total counter"]
+        failures = ["# HELP minicp_command_failures_total External commands that exited non-zero or failed to start.",
+                    "# TYPE minicp_command_failures_total counter"]
+        for (family, command), buckets, count, total, n_timeouts, n_failures in items:
+            labels = f'family="{_escape(family)}",command="{_escape(command)}"'
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ('+Inf',), buckets):
+                cumulative += n
+                hist.append(f'minicp_command_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            hist.append(f'minicp_command_duration_seconds_sum{{{labels}}} {total:.6f}')
+            hist.append(f'minicp_command_duration_seconds_count{{{labels}}} {count}')
+            calls.append(f'minicp_command_calls_total{{{labels}}} {count}')
+            timeouts.append(f'minicp_command_timeouts_total{{{labels}}} {n_timeouts}')
+            failures.append(f'minicp_command_failures_total{{{labels}}} {n_failures}')
+        return '\n'.join(hist + calls + timeouts + failures) + '\n'
+
+    def dump(self, path: str):
+        """Write the current metrics to path (atomically, so scrapers of the file never see half of it)."""
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix='.metrics-', dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+        logging.info(f"Dumped command metrics to {path}")
+
+    def serve(self, port: int = 9108, host: str = '127.0.0.1'):
+        """Expose /metrics over HTTP on a daemon thread. Enables the registry."""
+        if self._server is not None:
+            return self._server
+        registry = self.enable()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        logging.info(f"Serving command metrics on http://{host}:{port}/metrics")
+        return self._server
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+METRICS = Registry(enabled=bool(os.environ.get('MINICP_METRICS')))
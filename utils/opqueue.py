@@ -0,0 +1,129 @@
+import functools
+import inspect
+import logging
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future
+from utils.cache import _call_args
+
+SUPERSEDED = "Superseded by a newer request"
+
+
+class _Op:
+    __slots__ = ('name', 'fn', 'key', 'group', 'superseded', 'future')
+
+    def __init__(self, name, fn, key, group, superseded):
+        self.name = name
+        self.fn = fn
+        self.key = key
+        self.group = group
+        self.superseded = superseded
+        self.future = Future()
+
+
+class OpQueue:
+    """
+    One serialized queue ("lane") per interface, so that e.g. stop_ap can
+    not race start_ap or a disconnect run in the middle of a connect. Each
+    lane runs its operations one at a time on a worker thread that exists
+    only while the lane has work.
+
+    A read submitted with a key joins an identical read still waiting in
+    the lane instead of running again. A write submitted with a group
+    drops the writes of that group still waiting (their callers get the
+    `superseded` value), since only the newest request matters. Operations
+    already running are never dropped or joined.
+
+    Calls made from a lane's own worker run inline, so operations can call
+    each other; waiting on another lane from a worker is allowed as long
+    as no two lanes wait on each other.
+    """
+    def __init__(self):
+        self._lanes = {}  # lane -> deque of waiting _Op
+        self._busy = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.coalesced = Counter()
+        self.superseded = Counter()
+
+    def submit(self, lane: str, name: str, fn, key=None, group: str = None, superseded=None) -> Future:
+        with self._lock:
+            waiting = self._lanes.setdefault(lane, deque())
+            if key is not None:
+                for op in waiting:
+                    if op.key == key:
+                        self.coalesced[name] += 1
+                        return op.future
+            if group is not None:
+                for op in [op for op in waiting if op.group == group]:
+                    waiting.remove(op)
+                    op.future.set_result(op.superseded)
+                    self.superseded[op.name] += 1
+                    logging.info(f"Dropped queued {op.name} on {lane}, superseded by {name}")
+            op = _Op(name, fn, key, group, superseded)
+            waiting.append(op)
+            if lane not in self._busy:
+                self._busy.add(lane)
+                threading.Thread(target=self._work, args=(lane,), name=f"ops-{lane}", daemon=True).start()
+        return op.future
+
+    def call(self, lane: str, name: str, fn, key=None, group: str = None, superseded=None):
+        """Run fn in the lane and wait for its result."""
+        if getattr(self._local, 'lane', None) == lane:
+            return fn()
+        return self.submit(lane, name, fn, key, group, superseded).result()
+
+    def pending(self, lane: str) -> int:
+        with self._lock:
+            return len(self._lanes.get(lane, ()))
+
+    def _work(self, lane: str):
+        self._local.lane = lane
+        while True:
+            with self._lock:
+                waiting = self._lanes[lane]
+                if not waiting:
+                    self._busy.discard(lane)
+                    return
+                op = waiting.popleft()
+            try:
+                op.future.set_result(op.fn())
+            except BaseException as e:
+                op.future.set_exception(e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'busy': sorted(self._busy), 'waiting': {lane: len(q) for lane, q in self._lanes.items() if q},
+                    'coalesced': dict(self.coalesced), 'superseded': dict(self.superseded)}
+
+
+# One queue shared by every manager, so managers of the same interface serialize with each other
+LANES = OpQueue()
+
+
+def serialized(lane: str = '{ifname}', coalesce: bool = False, supersedes: str = None, superseded=None):
+    """
+    Run a manager method in the OpQueue lane named by the lane template
+    (by default its interface). coalesce=True shares identical waiting
+    calls; supersedes is a group template (e.g. 'link:{ifname}') whose
+    waiting calls this one replaces, returning `superseded` to them.
+    """
+    def decorator(method):
+        sig = inspect.signature(method)
+        name = method.__qualname__
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            values = _call_args(sig, self, args, kwargs)
+            key = None
+            if coalesce:
+                key = (id(self), name, tuple(values.items()))
+                try:
+                    hash(key)
+                except TypeError:
+                    key = None
+            ops = getattr(self, 'ops', None) or LANES
+            return ops.call(lane.format(**values), name, lambda: method(self, *args, **kwargs), key,
+                            supersedes.format(**values) if supersedes else None, superseded)
+        return wrapper
+    return decorator
@@ -0,0 +1,44 @@
+from array import array
+
+
+class RingBuffer:
+    """
+    Fixed-capacity numeric ring backed by an array.array, so long-running
+    samplers use the same memory after a minute as after a month.
+    Index 0 is the oldest sample, -1 the newest.
+    """
+    __slots__ = ('capacity', '_data', '_start', '_len')
+
+    def __init__(self, capacity: int, typecode: str = 'd'):
+        self.capacity = capacity
+        self._data = array(typecode, bytes(array(typecode).itemsize * capacity))
+        self._start = 0
+        self._len = 0
+
+    def append(self, value):
+        end = (self._start + self._len) % self.capacity
+        self._data[end] = value
+        if self._len < self.capacity:
+            self._len += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def clear(self):
+        self._start = self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("ring index out of range")
+        return self._data[(self._start + i) % self.capacity]
+
+    def values(self) -> list:
+        """All samples, oldest first."""
+        end = self._start + self._len
+        if end <= self.capacity:
+            return self._data[self._start:end].tolist()
+        return self._data[self._start:].tolist() + self._data[:end - self.capacity].tolist()
@@ -0,0 +1,321 @@
+import asyncio
+import dataclasses
+import inspect
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import Future
+from utils.aio import get_loop_thread
+
+SOCKET_PATH = os.environ.get('MINICP_SOCKET', '/run/minicp/minicpd.sock')
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR, INVALID_REQUEST, METHOD_NOT_FOUND, INVALID_PARAMS, SERVER_ERROR = -32700, -32600, -32601, -32602, -32000
+
+MAX_BUFFER = 1 << 20  # a subscriber this far behind is disconnected instead of buffering forever
+
+
+class RpcError(RuntimeError):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def _encode(obj):
+    """JSON fallback for manager results: as_dict() objects, dataclasses, sets."""
+    if hasattr(obj, 'as_dict'):
+        return obj.as_dict()
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def dumps(message: dict) -> bytes:
+    """One message on the wire: compact JSON and a newline."""
+    return json.dumps(message, default=_encode, separators=(',', ':')).encode() + b'\n'
+
+
+class _Connection:
+    def __init__(self, writer):
+        self.writer = writer
+        self.topics = set()
+
+    def send(self, message: dict) -> bool:
+        transport = self.writer.transport
+        if transport.is_closing():
+            return False
+        if transport.get_write_buffer_size() > MAX_BUFFER:
+            logging.warning("RPC client not reading, disconnecting it")
+            transport.abort()
+            return False
+        self.writer.write(dumps(message))
+        return True
+
+
+class RpcServer:
+    """
+    Newline-delimited JSON-RPC 2.0 over a Unix socket. Handlers are plain
+    blocking callables registered by name (e.g. 'wifi.connect'); each
+    request runs in a worker thread, so one client's slow connect does not
+    hold up another's status query. Params are a list (positional) or an
+    object (keyword arguments).
+
+    The built-in 'subscribe'/'unsubscribe' methods take a list of topics;
+    publish(topic, data) then sends {"method": "event", "params": {"topic",
+    "data"}} notifications to every subscribed client.
+    """
+    def __init__(self, path: str = SOCKET_PATH, loop_thread=None, mode: int = 0o660, group: str = None):
+        self.path = path
+        self.mode = mode
+        self.group = group
+        self.loop_thread = loop_thread or get_loop_thread()
+        self.handlers = {}
+        self._conns = set()
+        self._server = None
+
+    def register(self, name: str, fn):
+        self.handlers[name] = fn
+        return self
+
+    def expose(self, prefix: str, obj, names):
+        """Register obj.<name> as '<prefix>.<name>' for every name."""
+        for name in names:
+            self.register(f"{prefix}.{name}", getattr(obj, name))
+        return self
+
+    def start(self):
+        self.loop_thread.submit(self._start()).result()
+        logging.info(f"RPC server listening on {self.path}")
+        return self
+
+    async def _start(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # left over by a daemon that did not shut down cleanly
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path)
+        os.chmod(self.path, self.mode)
+        if self.group:
+            import grp
+            os.chown(self.path, -1, grp.getgrnam(self.group).gr_gid)
+
+    def stop(self):
+        async def close():
+            self._server.close()
+            for conn in list(self._conns):
+                conn.writer.close()
+        if self._server is not None:
+            self.loop_thread.submit(close()).result(timeout=5)
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def publish(self, topic: str, data):
+        """Send an event to the subscribers of topic. Safe to call from any thread."""
+        self.loop_thread.call_soon(self._broadcast, topic, data)
+
+    def _broadcast(self, topic: str, data):
+        message = {'jsonrpc': '2.0', 'method': 'event', 'params': {'topic': topic, 'data': data}}
+        for conn in list(self._conns):
+            if topic in conn.topics:
+                conn.send(message)
+
+    async def _serve(self, reader, writer):
+        conn = _Connection(writer)
+        self._conns.add(conn)
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError) as e:  # ValueError: line over the stream limit
+                    logging.warning(f"RPC connection dropped: {e}")
+                    break
+                if not line:
+                    break
+                task = asyncio.ensure_future(self._handle(conn, line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            self._conns.discard(conn)
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _handle(self, conn: _Connection, line: bytes):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            conn.send({'jsonrpc': '2.0', 'id': None, 'error': {'code': PARSE_ERROR, 'message': str(e)}})
+            return
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            conn.send({'jsonrpc': '2.0', 'id': None, 'error': {'code': INVALID_REQUEST, 'message': "Invalid request"}})
+            return
+        request_id, method, params = request.get('id'), request['method'], request.get('params', [])
+        try:
+            result = await self._dispatch(conn, method, params)
+            response = {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+        except RpcError as e:
+            response = {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': e.code, 'message': str(e)}}
+        except Exception as e:
+            logging.exception(f"RPC {method} failed")
+            response = {'jsonrpc': '2.0', 'id': request_id,
+                        'error': {'code': SERVER_ERROR, 'message': f"{type(e).__name__}: {e}"}}
+        if request_id is not None:  # no id: a notification, nobody waits for the answer
+            try:
+                conn.send(response)
+            except TypeError as e:
+                conn.send({'jsonrpc': '2.0', 'id': request_id, 'error': {'code': SERVER_ERROR, 'message': str(e)}})
+
+    async def _dispatch(self, conn: _Connection, method: str, params):
+        if method in ('subscribe', 'unsubscribe'):
+            topics = set(params)
+            if method == 'subscribe':
+                conn.topics |= topics
+            else:
+                conn.topics -= topics
+            return sorted(conn.topics)
+        if method == 'rpc.methods':
+            return sorted(self.handlers)
+        fn = self.handlers.get(method)
+        if fn is None:
+            raise RpcError(METHOD_NOT_FOUND, f"Unknown method {method}")
+        if not isinstance(params, (list, dict)):
+            raise RpcError(INVALID_PARAMS, "params must be a list or an object")
+        args, kwargs = (params, {}) if isinstance(params, list) else ([], params)
+        try:
+            inspect.signature(fn).bind(*args, **kwargs)
+        except TypeError as e:
+            raise RpcError(INVALID_PARAMS, str(e))
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+class RpcClient:
+    """
+    Blocking client of an RpcServer, usable from any thread: calls share
+    one connection and are matched to their answers by id on a reader
+    thread, which also hands events to the subscribe() callbacks. A lost
+    connection fails the calls in flight with ConnectionError; the next
+    call reconnects and renews the subscriptions.
+    """
+    def __init__(self, path: str = SOCKET_PATH, timeout: float = 60):
+        self.path = path
+        self.timeout = timeout
+        self._sock = None
+        self._ids = itertools.count(1)
+        self._pending = {}      # id -> Future
+        self._listeners = {}    # topic -> [callback(data)]
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Open the connection; raises OSError when no daemon is listening."""
+        with self._lock:
+            self._connect()
+        return self
+
+    def _connect(self):
+        if self._sock is not None:
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        threading.Thread(target=self._read, args=(sock,), name="rpc-client", daemon=True).start()
+        if self._listeners:
+            self._send(None, 'subscribe', sorted(self._listeners))
+
+    def _send(self, request_id, method: str, params) -> Future | None:
+        fut = None
+        if request_id is not None:
+            fut = self._pending[request_id] = Future()
+        self._sock.sendall(dumps({'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params}))
+        return fut
+
+    def call(self, method: str, *args, **kwargs):
+        if args and kwargs:
+            raise TypeError("JSON-RPC params are either positional or named, not both")
+        with self._lock:
+            try:
+                self._connect()
+                fut = self._send(next(self._ids), method, kwargs or list(args))
+            except OSError as e:
+                self._disconnect()
+                raise ConnectionError(f"minicpd not reachable at {self.path}: {e}") from e
+        return fut.result(self.timeout)
+
+    def subscribe(self, topic: str, callback):
+        """
+        callback(data) for every event of topic. It runs on the reader
+        thread, so it must hand work off (e.g. TkAsyncBridge.post) rather
+        than call the daemon itself.
+        """
+        with self._lock:
+            new = topic not in self._listeners
+            self._listeners.setdefault(topic, []).append(callback)
+            if new and self._sock is not None:
+                self._send(None, 'subscribe', [topic])
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+    def _disconnect(self, sock=None):
+        if sock is not None and sock is not self._sock:
+            return  # an older connection, already replaced
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+        pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            fut.set_exception(ConnectionError("Connection to minicpd lost"))
+
+    def _read(self, sock):
+        with sock.makefile('rb') as stream:
+            try:
+                for line in stream:
+                    self._dispatch(json.loads(line))
+            except (OSError, ValueError) as e:
+                logging.warning(f"RPC connection closed: {e}")
+        with self._lock:
+            self._disconnect(sock)
+
+    def _dispatch(self, message: dict):
+        if message.get('method') == 'event':
+            params = message['params']
+            for callback in list(self._listeners.get(params['topic'], ())):
+                try:
+                    callback(params['data'])
+                except Exception:
+                    logging.exception(f"Event callback for {params['topic']} failed")
+            return
+        with self._lock:
+            fut = self._pending.pop(message.get('id'), None)
+        if fut is None:
+            return
+        if 'error' in message:
+            fut.set_exception(RpcError(message['error']['code'], message['error']['message']))
+        else:
+            fut.set_result(message.get('result'))
+
+
+class RemoteProxy:
+    """Attribute access turns into calls of '<prefix>.<name>' on the daemon."""
+    def __init__(self, client: RpcClient, prefix: str):
+        self._client = client
+        self._prefix = prefix
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        method = f"{self._prefix}.{name}"
+        return lambda *args, **kwargs: self._client.call(method, *args, **kwargs)
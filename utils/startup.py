@@ -0,0 +1,35 @@
+import logging
+import os
+import time
+
+
+def process_age() -> float | None:
+    """Seconds since this process was started by the kernel (Linux only)."""
+    try:
+        with open('/proc/self/stat') as f:
+            # field 22, counted after the parenthesised command name
+            started = int(f.read().rsplit(')', 1)[1].split()[19]) / os.sysconf('SC_CLK_TCK')
+        with open('/proc/uptime') as f:
+            return float(f.read().split()[0]) - started
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimeline:
+    """
+    Logs how long each startup stage (imports, Tk init, first paint, first
+    data) took to reach, counted from process start, so boot-to-usable
+    time can be compared between builds on the Pi.
+    """
+    def __init__(self):
+        age = process_age()
+        self.start = time.monotonic() - (age or 0)
+        self.marks = {}
+
+    def mark(self, stage: str):
+        """Record the first time stage is reached; later calls are ignored."""
+        if stage in self.marks:
+            return
+        elapsed = time.monotonic() - self.start
+        self.marks[stage] = elapsed
+        logging.info(f"Startup: {stage} at {elapsed * 1000:.0f} ms")